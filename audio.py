@@ -0,0 +1,220 @@
+import os
+import time
+import queue
+import shutil
+import threading
+import subprocess
+import http.client
+from segmented import default_pool
+
+# codec -> (ffmpeg encoder, muxer, file extension)
+CODECS = {
+    'mp3': ('libmp3lame', 'mp3', 'mp3'),
+}
+
+# ffmpeg processes running at once across every job: one per CPU
+default_slots = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+
+class TranscodeError(IOError):
+    pass
+
+
+class AudioTranscoder:
+    """
+    Streams an audio format straight into ffmpeg while it downloads.
+    The network stage reads the media URL over the shared connection pool and
+    hands chunks to the encode stage through a bounded queue; the encode stage
+    feeds them to an ffmpeg process on stdin. Each file is read once, and
+    network and CPU time overlap instead of adding up. Encoders are capped at
+    one per CPU, shared by all entries and jobs; while they are all busy the
+    queue fills up and the download waits.
+    """
+
+    def __init__(self, codec='mp3', quality=192, slots=None, queue_chunks=32, chunk_size=256 * 1024, retries=3, ffmpeg=None):
+        if codec not in CODECS:
+            raise ValueError(f"unsupported audio codec: {codec}")
+        self.codec = codec
+        self.quality = quality  # kbit/s
+        self.slots = slots or default_slots
+        self.queue_chunks = queue_chunks  # Bounds buffered audio to queue_chunks * chunk_size
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg')
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    def postprocessor(self):
+        # yt-dlp's two-pass conversion, for formats that can't be streamed
+        return {'key': 'FFmpegExtractAudio', 'preferredcodec': self.codec, 'preferredquality': str(self.quality)}
+
+    def can_stream(self, info):
+        return (self.available and not info.get('requested_formats') and not info.get('fragments')
+                and info.get('protocol') in ('http', 'https') and bool(info.get('url')))
+
+    def output_path(self, filename):
+        return os.path.splitext(filename)[0] + '.' + CODECS[self.codec][2]
+
+    @staticmethod
+    def request_headers(ydl, info):
+        headers = dict(info.get('http_headers') or {})
+        headers.pop('Accept-Encoding', None)  # ffmpeg needs the raw body
+        cookie = ydl.cookiejar.get_cookie_header(info['url'])
+        if cookie:
+            headers['Cookie'] = cookie
+        return headers
+
+    def transcode(self, info, filename, headers, progress_hook=None):
+        """
+        Download info['url'] into ffmpeg; filename is the name yt-dlp would have used.
+        Returns (output path, stage timings in seconds).
+        """
+        destination = self.output_path(filename)
+        timings = {'download': 0.0, 'queue_wait': 0.0, 'encoder_wait': 0.0, 'encode': 0.0, 'total': 0.0}
+        if os.path.exists(destination):
+            return destination, timings  # Finished on an earlier run
+
+        started = time.perf_counter()
+        tmp_destination = destination + '.part'
+        chunks = queue.Queue(maxsize=self.queue_chunks)
+        failed = threading.Event()
+        errors = []
+        encoder = threading.Thread(
+            target=self._encode, args=(chunks, tmp_destination, timings, failed, errors), daemon=True
+        )
+        encoder.start()
+        error = None
+        try:
+            downloaded = self._download(info, headers, chunks, timings, failed, destination, progress_hook)
+        except BaseException as e:
+            failed.set()  # Stops the encoder; covers pause/cancel raised from the hook too
+            error = e
+        self._put(chunks, None, failed, timings)
+        encoder.join()
+        if failed.is_set():
+            if os.path.exists(tmp_destination):
+                os.remove(tmp_destination)
+            if error is None or (errors and isinstance(error, TranscodeError)):
+                error = errors[0]  # The encoder failed first; the download only stopped because of it
+            raise error
+
+        os.replace(tmp_destination, destination)
+        timings['total'] = time.perf_counter() - started
+        if progress_hook:
+            progress_hook({
+                'status': 'finished',
+                'downloaded_bytes': downloaded,
+                'total_bytes': downloaded,
+                'filename': destination,
+                'elapsed': timings['download'],
+                'info_dict': info,
+            })
+        return destination, timings
+
+    def _put(self, chunks, chunk, failed, timings):
+        waited = time.perf_counter()
+        try:
+            while not failed.is_set():
+                try:
+                    chunks.put(chunk, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            timings['queue_wait'] += time.perf_counter() - waited  # The encoder is the bottleneck
+
+    def _download(self, info, headers, chunks, timings, failed, destination, progress_hook):
+        url = info['url']
+        total = info.get('filesize') or info.get('filesize_approx')
+        downloaded = 0
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            request_headers = dict(headers, Range=f'bytes={downloaded}-') if downloaded else headers
+            try:
+                _, key, conn, response = default_pool.open(url, request_headers)
+            except (OSError, http.client.HTTPException) as e:
+                attempt = self._retry(attempt, e)
+                continue
+            reusable = False
+            try:
+                if downloaded and response.status != 206:
+                    raise TranscodeError(f"HTTP {response.status} when resuming at byte {downloaded}")
+                if response.status not in (200, 206):
+                    raise TranscodeError(f"HTTP {response.status}")
+                if response.length is not None and not downloaded:
+                    total = response.length
+                while True:
+                    try:
+                        data = response.read(self.chunk_size)
+                    except (OSError, http.client.HTTPException) as e:
+                        attempt = self._retry(attempt, e)
+                        break  # Reconnect and continue from the last byte handed to ffmpeg
+                    if not data:
+                        timings['download'] = time.perf_counter() - started
+                        reusable = not response.will_close
+                        return downloaded
+                    if not self._put(chunks, data, failed, timings):
+                        raise TranscodeError("encoder stopped")
+                    downloaded += len(data)
+                    if progress_hook:
+                        elapsed = time.perf_counter() - started
+                        speed = downloaded / elapsed if elapsed > 0 else None
+                        progress_hook({
+                            'status': 'downloading',
+                            'downloaded_bytes': downloaded,
+                            'total_bytes': total,
+                            'filename': destination,
+                            'tmpfilename': destination + '.part',
+                            'speed': speed,
+                            'eta': (total - downloaded) / speed if total and speed else None,
+                            'elapsed': elapsed,
+                        })
+            finally:
+                default_pool.release(key, conn, reusable)
+
+    def _retry(self, attempt, error):
+        if attempt >= self.retries:
+            raise TranscodeError(f"download failed: {error}")
+        time.sleep(min(0.5 * 2 ** attempt, 5))
+        return attempt + 1
+
+    def _encode(self, chunks, tmp_destination, timings, failed, errors):
+        encoder, muxer, _ = CODECS[self.codec]
+        waited = time.perf_counter()
+        with self.slots:
+            timings['encoder_wait'] = time.perf_counter() - waited
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [self.ffmpeg, '-hide_banner', '-y', '-loglevel', 'error', '-i', 'pipe:0',
+                 '-vn', '-c:a', encoder, '-b:a', f'{self.quality}k', '-f', muxer, tmp_destination],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+            try:
+                while not failed.is_set():
+                    try:
+                        chunk = chunks.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+                    if chunk is None:
+                        break
+                    process.stdin.write(chunk)
+            except OSError as e:
+                errors.append(TranscodeError(f"ffmpeg stopped reading: {e}"))
+                failed.set()
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+                if failed.is_set():
+                    process.kill()
+                stderr = process.stderr.read().decode(errors='replace').strip()
+                process.wait()
+            timings['encode'] = time.perf_counter() - started
+        if process.returncode != 0 and not failed.is_set():
+            errors.append(TranscodeError(f"ffmpeg exited with {process.returncode}: {stderr[-500:]}"))
+            failed.set()
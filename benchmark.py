@@ -0,0 +1,754 @@
+"""
+Local benchmarks for the download pipeline.
+Media is served from a throttled fixture HTTP server on 127.0.0.1, so runs are
+repeatable and never touch YouTube.
+
+    python benchmark.py scheduler --entries 8 --workers 1 4
+    python benchmark.py import-time
+    python benchmark.py export /mnt/nas
+    python benchmark.py segmented --connections 1 4 8
+    python benchmark.py fragments --concurrency 1 4 8
+    python benchmark.py playlist-memory --sizes 1000 10000
+    python benchmark.py keepalive --clips 20 --connect-ms 50
+    python benchmark.py suite --output before.json
+    python benchmark.py compare before.json after.json
+
+The tests in tests/ run against the same fixture server:
+
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    # Keep-alive, byte ranges and a per-connection cap, emulating a CDN edge
+    protocol_version = "HTTP/1.1"
+    chunk_size = 64 * 1024
+    bytes_per_second = None
+    connect_delay = None  # Seconds each new connection waits, standing in for a remote TCP+TLS handshake
+    range_pattern = re.compile(r"bytes=(\d*)-(\d*)$")
+
+    def setup(self):
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        super().setup()
+
+    def send_head(self):
+        self.remaining = None
+        path = self.translate_path(self.path)
+        match = self.range_pattern.match(self.headers.get("Range", "").strip())
+        if not match or not os.path.isfile(path) or match.groups() == ("", ""):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last) if last else size - 1, size - 1)
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        if start >= size or start > end:
+            self.send_error(416)
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        self.remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = self.remaining
+        try:
+            while remaining is None or remaining > 0:
+                chunk = source.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                outputfile.write(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+                if self.bytes_per_second:
+                    time.sleep(len(chunk) / self.bytes_per_second)
+        except ConnectionError:
+            self.close_connection = True  # Extractors probe a URL and hang up early
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureHTTPServer(ThreadingHTTPServer):
+    accepted = 0  # Connections opened by clients (get_request runs on the serving thread only)
+
+    def get_request(self):
+        self.accepted += 1
+        return super().get_request()
+
+    def handle_error(self, request, client_address):
+        # Pooled clients hang up mid-body on kept-alive connections (e.g. an extractor sniffing a file)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FixtureServer:
+    """Serves generated media fixtures from a temporary directory."""
+
+    def __init__(self, bytes_per_second=None, connect_delay=None):
+        self.root = tempfile.mkdtemp(prefix="fixtures_")
+        handler = type("Handler", (ThrottledHandler,), {"bytes_per_second": bytes_per_second, "connect_delay": connect_delay})
+        self.httpd = FixtureHTTPServer(
+            ("127.0.0.1", 0), lambda *args, **kwargs: handler(*args, directory=self.root, **kwargs)
+        )
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def add_file(self, name, size):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return f"{self.base_url}/{name}"
+
+    def add_text(self, name, text):
+        with open(os.path.join(self.root, name), "w", encoding="utf-8") as f:
+            f.write(text)
+        return f"{self.base_url}/{name}"
+
+    def add_page(self, name, size):
+        """Web page with an HTML5 <video>: one page request plus one media request, like a video site."""
+        self.add_file(f"{name}/{name}.mp4", size)
+        return self.add_text(
+            f"{name}/index.html",
+            f'<html><head><title>{name}</title></head><body><video src="{name}.mp4"></video></body></html>'
+        )
+
+    def add_hls(self, name, fragments=10, fragment_size=256 * 1024):
+        """Media playlist of synthetic .ts fragments (yt-dlp's native HLS path)."""
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for i in range(fragments):
+            self.add_file(f"{name}/seg{i}.ts", fragment_size)
+            lines += ["#EXTINF:4.0,", f"seg{i}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return self.add_text(f"{name}/{name}.m3u8", "\n".join(lines) + "\n")
+
+    def add_dash(self, name, fragments=10, fragment_size=256 * 1024):
+        """Static MPD with a muxed SegmentList representation."""
+        self.add_file(f"{name}/init.mp4", 1024)
+        segment_urls = "".join(
+            f'<SegmentURL media="{os.path.basename(self.add_file(f"{name}/seg{i}.m4s", fragment_size))}"/>'
+            for i in range(fragments)
+        )
+        mpd = (
+            '<?xml version="1.0"?>'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT2S" '
+            f'mediaPresentationDuration="PT{fragments * 4}S" profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">'
+            '<Period><AdaptationSet mimeType="video/mp4">'
+            '<Representation id="1" bandwidth="500000" codecs="avc1.4d401e,mp4a.40.2" width="640" height="360">'
+            f'<SegmentList duration="4" timescale="1"><Initialization sourceURL="init.mp4"/>{segment_urls}</SegmentList>'
+            '</Representation></AdaptationSet></Period></MPD>'
+        )
+        return self.add_text(f"{name}/{name}.mpd", mpd)
+
+    def add_playlist(self, name, entries=10, size=64 * 1024):
+        """
+        Playlist page as an RSS feed, which yt-dlp's generic extractor flattens into
+        url entries, so playlists run through the real metadata pass unmodified.
+        """
+        items = []
+        for i in range(entries):
+            url = self.add_file(f"{name}/video{i + 1}.mp4", size)
+            items.append(f'<item><title>video{i + 1}</title><link>{url}</link>'
+                         f'<enclosure url="{url}" type="video/mp4" length="{size}"/></item>')
+        feed = (f'<?xml version="1.0"?><rss version="2.0"><channel><title>{name}</title>'
+                f'{"".join(items)}</channel></rss>')
+        return self.add_text(f"{name}/feed.xml", feed)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def bench_scheduler(entries=8, size=2 * 1024 * 1024, workers=(1, 4), per_connection=1024 * 1024, rate_limit=None):
+    from downloader import YouTubeDownloader
+    from scheduler import PlaylistEntry
+
+    results = {}
+    with FixtureServer(bytes_per_second=per_connection) as server:
+        playlist = [PlaylistEntry(i + 1, server.add_file(f"video{i + 1}.mp4", size), f"video{i + 1}") for i in range(entries)]
+        for max_workers in workers:
+            output_dir = tempfile.mkdtemp(prefix="bench_")
+            try:
+                downloader = YouTubeDownloader(
+                    output_dir, prefix_index=True, total_videos=entries,
+                    max_workers=max_workers, rate_limit=rate_limit
+                )
+                start = time.perf_counter()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # yt-dlp's progress lines
+                    success = downloader.download_entries(playlist, "best")[0]
+                elapsed = time.perf_counter() - start
+                results[max_workers] = {
+                    "success": success,
+                    "seconds": elapsed,
+                    "mb_per_s": entries * size / elapsed / (1024 * 1024),
+                    "download_count": downloader.download_count,
+                }
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def bench_segmented(size=16 * 1024 * 1024, per_connection=2 * 1024 * 1024, connections=(1, 4, 8)):
+    """Native yt-dlp HTTP download versus the segmented engine on one throttled file."""
+    from downloader import YouTubeDownloader
+    from scheduler import PlaylistEntry
+    from segmented import default_pool
+
+    results = {}
+    with FixtureServer(bytes_per_second=per_connection) as server:
+        entry = PlaylistEntry(1, server.add_file("progressive.mp4", size), "progressive")
+        runs = [("native", 1)] + [("segmented", count) for count in connections]
+        for engine, count in runs:
+            output_dir = tempfile.mkdtemp(prefix="bench_")
+            try:
+                downloader = YouTubeDownloader(output_dir, http_engine=engine, connections=count, noprogress=True)
+                created = default_pool.created
+                start = time.perf_counter()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    success = downloader.download_entries([entry], "best")[0]
+                elapsed = time.perf_counter() - start
+                results[f"{engine}x{count}"] = {
+                    "success": success,
+                    "seconds": elapsed,
+                    "mb_per_s": size / elapsed / (1024 * 1024),
+                    "connections_opened": default_pool.created - created if engine == "segmented" else None,
+                }
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def bench_fragments(fragments=60, fragment_size=256 * 1024, per_connection=2 * 1024 * 1024, concurrency=(1, 4, 8)):
+    """
+    One HLS stream: stock yt-dlp (fragment temp files, default concurrency 1)
+    versus the in-memory fragment pipeline at several concurrencies.
+    """
+    import yt_dlp
+    from downloader import YouTubeDownloader
+    from scheduler import PlaylistEntry
+
+    results = {}
+    with FixtureServer(bytes_per_second=per_connection) as server:
+        entry = PlaylistEntry(1, server.add_hls("stream", fragments, fragment_size), "stream")
+        runs = [("yt-dlp", 1)] + [("pipeline", count) for count in concurrency]
+        for engine, count in runs:
+            output_dir = tempfile.mkdtemp(prefix="bench_")
+            rates = []
+            try:
+                downloader = YouTubeDownloader(output_dir, fragment_concurrency=count, noprogress=True)
+                if engine == "yt-dlp":
+                    downloader.ydl_class = lambda: yt_dlp.YoutubeDL
+                progress_hook = downloader.progress_hook
+
+                def hook(d, entry_index=None):
+                    if d.get("fragments_per_second"):
+                        rates.append(d["fragments_per_second"])
+                    progress_hook(d, entry_index=entry_index)
+
+                downloader.progress_hook = hook
+                start = time.perf_counter()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    success = downloader.download_entries([entry], "best")[0]
+                elapsed = time.perf_counter() - start
+                results[f"{engine}x{count}"] = {
+                    "success": success,
+                    "seconds": elapsed,
+                    "mb_per_s": fragments * fragment_size / elapsed / (1024 * 1024),
+                    "fragments_per_s": rates[-1] if rates else fragments / elapsed,
+                }
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def synthetic_playlist(entries):
+    """Flat entries produced one at a time, like a paging playlist extractor."""
+    from scheduler import PlaylistEntry
+
+    for i in range(1, entries + 1):
+        yield PlaylistEntry(i, f"https://www.youtube.com/watch?v={i:011d}", f"Synthetic video {i}")
+
+
+def bench_playlist_memory(sizes=(1000, 10000), workers=8, modes=("list", "stream")):
+    """
+    Peak traced memory of the playlist pipeline for synthetic playlists.
+    "list" flattens the whole playlist first and keeps every result, as
+    download_playlist does; "stream" pages entries in and reports results as
+    they finish. Each entry still runs through the real scheduler, progress
+    hooks, aggregator and result bookkeeping; yt-dlp itself is replaced by a
+    stand-in that writes a 1 KiB file, so 10k entries finish in seconds and
+    the numbers measure only what the pipeline keeps per entry.
+    """
+    import gc
+    import tracemalloc
+    from downloader import YouTubeDownloader
+
+    class SyntheticYoutubeDL:
+        def __init__(self, params):
+            self.params = params
+            self._progress_hooks = params.get("progress_hooks") or []
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def prepare_filename(self, info):
+            return self.params["outtmpl"] % info
+
+    def fake_process_url(ydl, url, download=True):
+        video_id = url.rsplit("=", 1)[1]
+        filename = ydl.prepare_filename({"id": video_id, "title": f"Synthetic video {video_id}", "ext": "mp4"})
+        with open(filename, "wb") as f:
+            f.write(b"\0" * 1024)
+        for hook in ydl._progress_hooks:
+            for status in ("downloading", "finished"):
+                hook({"status": status, "filename": filename, "downloaded_bytes": 1024, "total_bytes": 1024, "elapsed": 0.001})
+        return {"title": video_id, "requested_downloads": [{"filepath": filename}]}
+
+    results = {}
+    tracemalloc.start()
+    try:
+        for size in sizes:
+            for mode in modes:
+                output_dir = tempfile.mkdtemp(prefix="bench_")
+                try:
+                    downloader = YouTubeDownloader(output_dir, prefix_index=True, total_videos=size, max_workers=workers, noprogress=True)
+                    downloader.ydl_class = lambda: SyntheticYoutubeDL
+                    downloader.process_url = fake_process_url
+                    gc.collect()
+                    tracemalloc.reset_peak()
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    start = time.perf_counter()
+                    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                        if mode == "stream":
+                            success = downloader.stream_entries(synthetic_playlist(size), "best")[0]
+                        else:
+                            entries = list(synthetic_playlist(size))
+                            success = downloader.download_entries(entries, "best")[0]
+                    elapsed = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1] - baseline
+                    results[f"{mode}@{size}"] = {
+                        "success": success,
+                        "seconds": elapsed,
+                        "peak_mb": peak / (1024 * 1024),
+                        "bytes_per_entry": peak / size,
+                    }
+                    entries = downloader = None
+                finally:
+                    shutil.rmtree(output_dir, ignore_errors=True)
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def bench_keepalive(clips=20, size=256 * 1024, connect_delay=0.05, workers=1):
+    """
+    Per-clip overhead for many short clips: stock yt-dlp (new extractor table,
+    opener and connection per request for every entry) versus YoutubeDLs on the
+    shared NetworkSession. connect_delay is charged on every new connection.
+    """
+    import yt_dlp
+    from downloader import YouTubeDownloader
+    from scheduler import PlaylistEntry
+    from network import default_session
+
+    results = {}
+    with FixtureServer(connect_delay=connect_delay) as server:
+        playlist = [PlaylistEntry(i + 1, server.add_page(f"clip{i + 1}", size), f"clip{i + 1}") for i in range(clips)]
+        for mode in ("yt-dlp", "session"):
+            output_dir = tempfile.mkdtemp(prefix="bench_")
+            try:
+                downloader = YouTubeDownloader(output_dir, max_workers=workers, noprogress=True)
+                if mode == "yt-dlp":
+                    downloader.ydl_class = lambda: yt_dlp.YoutubeDL
+                else:
+                    default_session.pool.close()  # Start cold, so the first clip pays its handshake
+                accepted = server.httpd.accepted
+                start = time.perf_counter()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    success = downloader.download_entries(playlist, "best")[0]
+                elapsed = time.perf_counter() - start
+                results[mode] = {
+                    "success": success,
+                    "seconds": elapsed,
+                    "ms_per_clip": elapsed / clips * 1000,
+                    "connections": server.httpd.accepted - accepted,
+                }
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def bench_import_time(modules=("cli", "main"), repeat=5):
+    """
+    Cold-import cost of the headless entry point versus the GUI, each measured in
+    a fresh interpreter so nothing is already in sys.modules.
+    """
+    import subprocess
+
+    results = {}
+    for module in modules:
+        timings = []
+        error = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-c", f"import {module}"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True
+            )
+            timings.append(time.perf_counter() - start)
+            if completed.returncode != 0:
+                error = completed.stderr.strip().splitlines()[-1]
+                break
+        results[module] = {"seconds": min(timings), "error": error}
+    return results
+
+
+def bench_export(destination, files=8, size=64 * 1024 * 1024, max_workers=4):
+    """Export throughput into destination; point it at another filesystem to test the copy path."""
+    from export import ExportEngine
+
+    source_dir = tempfile.mkdtemp(prefix="export_src_")
+    export_dir = tempfile.mkdtemp(prefix="export_dst_", dir=destination)
+    try:
+        for i in range(files):
+            with open(os.path.join(source_dir, f"video{i + 1}.mp4"), "wb") as f:
+                f.write(os.urandom(size))
+        engine = ExportEngine(export_dir, max_workers=max_workers)
+        try:
+            results = engine.export_directory(source_dir)
+        finally:
+            engine.close()
+        stats = engine.stats()
+        stats["methods"] = sorted({result.method for result in results if result.method})
+        return stats
+    finally:
+        shutil.rmtree(source_dir, ignore_errors=True)
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+
+# Metric name -> True when higher is better; used by compare
+METRICS = {
+    "ttfb_s": False,
+    "metadata_s": False,
+    "seconds": False,
+    "mb_per_s": True,
+    "cpu_s_per_mb": False,
+    "peak_rss_mb": False,
+    "hook_us_per_call": False,
+}
+
+
+def suite_cases(playlist_sizes=(10, 100, 1000)):
+    cases = [
+        {"name": "progressive", "kind": "progressive", "size": 32 * 1024 * 1024},
+        {"name": "hls", "kind": "hls", "fragments": 40, "fragment_size": 256 * 1024},
+        {"name": "dash", "kind": "dash", "fragments": 40, "fragment_size": 256 * 1024},
+    ]
+    for entries in playlist_sizes:
+        cases.append({"name": f"playlist-{entries}", "kind": "playlist", "entries": entries, "size": 64 * 1024})
+    return cases
+
+
+def build_fixture(server, case):
+    name = case["name"]
+    if case["kind"] == "progressive":
+        return server.add_file(f"{name}/{name}.mp4", case["size"])
+    if case["kind"] == "hls":
+        return server.add_hls(name, case["fragments"], case["fragment_size"])
+    if case["kind"] == "dash":
+        return server.add_dash(name, case["fragments"], case["fragment_size"])
+    return server.add_playlist(name, case["entries"], case["size"])
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(case):
+    """Runs one case in this (fresh) process and returns its metrics."""
+    from downloader import YouTubeDownloader
+
+    timings = {}
+    hook_calls = 0
+    hook_seconds = 0.0
+    output_dir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        downloader = YouTubeDownloader(
+            output_dir, max_workers=case["workers"], http_engine=case["engine"], noprogress=True,
+            timing_callback=lambda stage, seconds: timings.setdefault(stage, seconds)
+        )
+        progress_hook = downloader.progress_hook
+
+        def timed_hook(d, entry_index=None):
+            nonlocal hook_calls, hook_seconds
+            start = time.perf_counter()
+            progress_hook(d, entry_index=entry_index)
+            hook_seconds += time.perf_counter() - start
+            hook_calls += 1
+
+        downloader.progress_hook = timed_hook
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        success = downloader.download_playlist(case["url"], "best")[0]
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+        total_bytes = sum(
+            os.path.getsize(os.path.join(root, filename))
+            for root, _, filenames in os.walk(output_dir) for filename in filenames
+        )
+        megabytes = total_bytes / (1024 * 1024)
+        return {
+            "success": success,
+            "entries": len(downloader.results),
+            "bytes": total_bytes,
+            "seconds": elapsed,
+            "ttfb_s": timings.get("first_byte"),
+            "metadata_s": timings.get("metadata"),
+            "mb_per_s": megabytes / elapsed if elapsed else None,
+            "cpu_s_per_mb": cpu / megabytes if megabytes else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "hook_calls": hook_calls,
+            "hook_us_per_call": hook_seconds / hook_calls * 1e6 if hook_calls else None,
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench_suite(playlist_sizes=(10, 100, 1000), workers=4, engine="native", per_connection=None, cases=None):
+    """
+    Runs every case in its own interpreter (clean peak RSS, no warm caches)
+    against one shared fixture server, and returns a JSON-ready report.
+    """
+    import json
+    import platform
+    import subprocess
+    import yt_dlp
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "yt_dlp": yt_dlp.version.__version__,
+        "engine": engine,
+        "workers": workers,
+        "per_connection": per_connection,
+        "cases": {},
+    }
+    with FixtureServer(bytes_per_second=per_connection) as server:
+        for case in suite_cases(playlist_sizes):
+            if cases and case["name"] not in cases:
+                continue
+            case = dict(case, url=build_fixture(server, case), workers=workers, engine=engine)
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "run-case", json.dumps(case)],
+                cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+            )
+            lines = completed.stdout.strip().splitlines()
+            try:
+                result = json.loads(lines[-1])
+            except (IndexError, ValueError):
+                result = {"success": False, "error": (completed.stderr.strip().splitlines() or ["no output"])[-1]}
+            report["cases"][case["name"]] = result
+    return report
+
+
+def compare_reports(baseline, current, threshold=0.10):
+    """Returns (rows, regressions); a regression is a metric worse by more than threshold."""
+    rows = []
+    regressions = 0
+    for name, base_case in baseline["cases"].items():
+        case = current["cases"].get(name)
+        if not case:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = base_case.get(metric), case.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            regressed = worse > threshold
+            regressions += regressed
+            rows.append((name, metric, before, after, change, regressed))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scheduler_parser = subparsers.add_parser("scheduler", help="playlist scheduler throughput")
+    scheduler_parser.add_argument("--entries", type=int, default=8)
+    scheduler_parser.add_argument("--size-mb", type=float, default=2)
+    scheduler_parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    scheduler_parser.add_argument("--per-connection-mb", type=float, default=1, help="fixture server cap per connection")
+    scheduler_parser.add_argument("--rate-limit-mb", type=float, default=None, help="global bandwidth cap")
+
+    import_parser = subparsers.add_parser("import-time", help="headless vs GUI import time")
+    import_parser.add_argument("--repeat", type=int, default=5)
+
+    export_parser = subparsers.add_parser("export", help="export engine throughput")
+    export_parser.add_argument("destination", help="directory to export into")
+    export_parser.add_argument("--files", type=int, default=8)
+    export_parser.add_argument("--size-mb", type=float, default=64)
+    export_parser.add_argument("--workers", type=int, default=4)
+
+    segmented_parser = subparsers.add_parser("segmented", help="native vs multi-connection HTTP engine")
+    segmented_parser.add_argument("--size-mb", type=float, default=16)
+    segmented_parser.add_argument("--per-connection-mb", type=float, default=2)
+    segmented_parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 8])
+
+    fragments_parser = subparsers.add_parser("fragments", help="stock yt-dlp vs the HLS fragment pipeline")
+    fragments_parser.add_argument("--fragments", type=int, default=60)
+    fragments_parser.add_argument("--fragment-kb", type=int, default=256)
+    fragments_parser.add_argument("--per-connection-mb", type=float, default=2)
+    fragments_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+
+    memory_parser = subparsers.add_parser("playlist-memory", help="peak memory of list vs streaming playlist mode")
+    memory_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    memory_parser.add_argument("--workers", type=int, default=8)
+
+    keepalive_parser = subparsers.add_parser("keepalive", help="per-clip overhead: stock yt-dlp vs the shared session")
+    keepalive_parser.add_argument("--clips", type=int, default=20)
+    keepalive_parser.add_argument("--size-kb", type=int, default=256)
+    keepalive_parser.add_argument("--connect-ms", type=float, default=50, help="delay charged on every new connection")
+    keepalive_parser.add_argument("--workers", type=int, default=1)
+
+    suite_parser = subparsers.add_parser("suite", help="full pipeline suite, saved as JSON")
+    suite_parser.add_argument("--output", default="bench_results.json")
+    suite_parser.add_argument("--playlist-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    suite_parser.add_argument("--cases", nargs="+", help="only run these case names")
+    suite_parser.add_argument("--workers", type=int, default=4)
+    suite_parser.add_argument("--engine", choices=("native", "segmented"), default="native")
+    suite_parser.add_argument("--per-connection-mb", type=float, default=None, help="fixture server cap per connection")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two suite JSON files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown")
+
+    case_parser = subparsers.add_parser("run-case")  # Internal: one suite case in a fresh process
+    case_parser.add_argument("case")
+
+    args = parser.parse_args(argv)
+    if args.command == "run-case":
+        import json
+
+        case = json.loads(args.case)
+        with contextlib.redirect_stdout(sys.stderr):  # Keep stdout for the result line
+            result = run_case(case)
+        print(json.dumps(result))
+    elif args.command == "suite":
+        import json
+
+        per_connection = int(args.per_connection_mb * 1024 * 1024) if args.per_connection_mb else None
+        report = bench_suite(args.playlist_sizes, args.workers, args.engine, per_connection, args.cases)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        for name, result in report["cases"].items():
+            if not result.get("success"):
+                print(f"{name}: FAILED {result.get('error', '')}")
+                continue
+            print(f"{name}: {result['seconds']:.2f}s, ttfb {result['ttfb_s'] or 0:.3f}s, {result['mb_per_s']:.1f} MB/s, "
+                  f"{result['cpu_s_per_mb'] or 0:.3f} cpu-s/MB, rss {result['peak_rss_mb'] or 0:.0f} MB, "
+                  f"hook {result['hook_us_per_call'] or 0:.0f} us x {result['hook_calls']}")
+        print(f"saved {args.output}")
+    elif args.command == "compare":
+        import json
+
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        rows, regressions = compare_reports(baseline, current, args.threshold)
+        for name, metric, before, after, change, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:16} {metric:18} {before:12.4f} -> {after:12.4f} ({change:+.1%}){flag}")
+        return 1 if regressions else 0
+    elif args.command == "keepalive":
+        results = bench_keepalive(args.clips, args.size_kb * 1024, args.connect_ms / 1000, args.workers)
+        for name, result in results.items():
+            print(f"{name}: {result['seconds']:.2f}s, {result['ms_per_clip']:.0f} ms/clip, "
+                  f"{result['connections']} connections, success={result['success']}")
+    elif args.command == "playlist-memory":
+        for name, result in bench_playlist_memory(args.sizes, args.workers).items():
+            print(f"{name}: peak {result['peak_mb']:.2f} MB ({result['bytes_per_entry']:.0f} B/entry), "
+                  f"{result['seconds']:.2f}s, success={result['success']}")
+    elif args.command == "fragments":
+        results = bench_fragments(
+            fragments=args.fragments, fragment_size=args.fragment_kb * 1024,
+            per_connection=int(args.per_connection_mb * 1024 * 1024), concurrency=args.concurrency
+        )
+        for name, result in results.items():
+            print(f"{name}: {result['seconds']:.2f}s, {result['mb_per_s']:.2f} MB/s, "
+                  f"{result['fragments_per_s']:.1f} fragments/s, success={result['success']}")
+    elif args.command == "segmented":
+        results = bench_segmented(
+            size=int(args.size_mb * 1024 * 1024), per_connection=int(args.per_connection_mb * 1024 * 1024),
+            connections=args.connections
+        )
+        for name, result in results.items():
+            print(f"{name}: {result['seconds']:.2f}s, {result['mb_per_s']:.2f} MB/s, success={result['success']}")
+    elif args.command == "export":
+        stats = bench_export(args.destination, files=args.files, size=int(args.size_mb * 1024 * 1024), max_workers=args.workers)
+        print(f"{stats['files']} files, {stats['bytes'] / (1024 * 1024):.0f} MB in {stats['seconds']:.2f}s: "
+              f"{stats['mb_per_s']:.1f} MB/s via {', '.join(stats['methods'])}")
+    elif args.command == "import-time":
+        for module, result in bench_import_time(repeat=args.repeat).items():
+            if result["error"]:
+                print(f"import {module}: failed ({result['error']})")
+            else:
+                print(f"import {module}: {result['seconds'] * 1000:.0f} ms")
+    elif args.command == "scheduler":
+        rate_limit = int(args.rate_limit_mb * 1024 * 1024) if args.rate_limit_mb else None
+        results = bench_scheduler(
+            entries=args.entries, size=int(args.size_mb * 1024 * 1024), workers=args.workers,
+            per_connection=int(args.per_connection_mb * 1024 * 1024), rate_limit=rate_limit
+        )
+        for max_workers, result in results.items():
+            print(f"workers={max_workers}: {result['seconds']:.2f}s, {result['mb_per_s']:.2f} MB/s, "
+                  f"{result['download_count']} finished, success={result['success']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
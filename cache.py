@@ -0,0 +1,171 @@
+import os
+import re
+import copy
+import json
+import time
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+import yt_dlp
+from metrics import logger
+
+
+# Query parameters that carry a unix expiry timestamp on signed media URLs
+EXPIRY_PARAMS = ('expire', 'expires', 'Expires')
+EXPIRY_PATH = re.compile(r'/expire/(\d+)')
+EXPIRY_MARGIN = 5 * 60  # Treat signed URLs as expired a little early
+
+
+@lru_cache(maxsize=1024)
+def cache_key(url):
+    """
+    Key a URL by extractor and video/playlist ID without touching the network,
+    so e.g. youtu.be/x and youtube.com/watch?v=x share one entry.
+    """
+    for ie in yt_dlp.extractor.gen_extractor_classes():
+        if ie.ie_key() == 'Generic' or not ie.suitable(url):
+            continue
+        temp_id = ie.get_temp_id(url)
+        if temp_id:
+            return f"{ie.ie_key()}:{temp_id}"
+        break
+    return url
+
+
+def url_expiry(url):
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    for name in EXPIRY_PARAMS:
+        if name in query and query[name][0].isdigit():
+            return int(query[name][0])
+    if 'X-Amz-Date' in query and 'X-Amz-Expires' in query:
+        signed = time.mktime(time.strptime(query['X-Amz-Date'][0], '%Y%m%dT%H%M%SZ')) - time.timezone
+        return int(signed) + int(query['X-Amz-Expires'][0])
+    match = EXPIRY_PATH.search(parsed.path)
+    return int(match.group(1)) if match else None
+
+
+def info_expiry(info):
+    """Earliest expiry among the signed media URLs in an info_dict, if any."""
+    expiries = []
+    for fmt in info.get('formats') or [info]:
+        for key in ('url', 'manifest_url'):
+            if fmt.get(key):
+                try:
+                    expiry = url_expiry(fmt[key])
+                except (ValueError, OverflowError):
+                    expiry = None
+                if expiry:
+                    expiries.append(expiry)
+    return min(expiries) if expiries else None
+
+
+class MetadataCache:
+    """
+    Extractor results keyed by video/playlist ID, with a TTL, size-bounded LRU
+    eviction and JSON persistence. Entries whose signed media URLs expire sooner
+    than the TTL are dropped at that expiry instead. Playlist listings change as
+    videos are added, so they get the much shorter listing_ttl.
+    """
+
+    def __init__(self, path=None, ttl=6 * 60 * 60, max_entries=500, listing_ttl=10 * 60):
+        self.path = os.path.abspath(path) if path else None
+        self.ttl = ttl
+        self.listing_ttl = listing_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> {'expires': ts, 'info': info_dict}, oldest first
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # One writer of the shared .tmp file at a time
+        self._dirty = False
+        if self.path:
+            self.load()
+
+    def get(self, url):
+        """Return a private copy of the cached info_dict for url, or None."""
+        key = cache_key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry['expires'] <= time.time():
+                del self._entries[key]
+                self._dirty = True
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            info = entry['info']
+        # yt-dlp mutates the dict while processing it
+        return copy.deepcopy(info)
+
+    def put(self, url, info, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        signed_expiry = info_expiry(info)
+        if signed_expiry:
+            expires = min(expires, signed_expiry - EXPIRY_MARGIN)
+        if expires <= time.time():
+            return
+        key = cache_key(url)
+        with self._lock:
+            self._entries[key] = {'expires': expires, 'info': info}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+            }
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error("Error loading metadata cache: %s", e)
+            return
+        now = time.time()
+        with self._lock:
+            for key, entry in stored.items():
+                if entry.get('expires', 0) > now:
+                    self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        # Jobs finish on several threads; serialised, so the newest snapshot is the one left on disk
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                now = time.time()
+                snapshot = {key: entry for key, entry in self._entries.items() if entry['expires'] > now}
+                self._dirty = False
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)  # Never leave a half-written cache behind
+            except OSError as e:
+                logger.error("Error saving metadata cache: %s", e)
@@ -0,0 +1,245 @@
+"""
+Headless command line front end for the downloader core. Never imports PyQt6.
+
+    python -m cli URL [URL ...] [-i urls.txt] [-o downloads] [-j 4] [--jsonl]
+    python -m cli --sync -i playlists.txt -o mirror     # nightly mirror
+
+Exit codes: 0 all downloads succeeded, 1 some downloads failed,
+2 bad arguments, 130 interrupted.
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+from downloader import YouTubeDownloader
+from metadata import fetch_playlist_info, stream_playlist_info
+from jobstore import JobStore, RUNNING, DONE, FAILED
+from store import MediaStore
+from formats import FormatPolicy, FormatTarget, ThroughputModel
+from metrics import SamplingProfiler, configure_logging, default_registry
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+VIDEO_FORMAT = "bestvideo+bestaudio/best"
+AUDIO_FORMAT = "bestaudio/best"
+
+
+class JsonLinesWriter:
+    """Writes one JSON object per line; safe to call from worker threads."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, kind, **fields):
+        line = json.dumps(dict(event=kind, **fields), ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def read_urls(args):
+    urls = list(args.urls)
+    if args.input_file == "-":
+        lines = sys.stdin.read().splitlines()
+    elif args.input_file:
+        with open(args.input_file, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    else:
+        lines = []
+    urls.extend(line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#"))
+    return urls
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Download videos and playlists without the GUI")
+    parser.add_argument("urls", nargs="*", help="video or playlist URLs")
+    parser.add_argument("-i", "--input-file", help="file with one URL per line ('-' for stdin)")
+    parser.add_argument("-o", "--output-dir", default="downloads")
+    parser.add_argument("-f", "--format", help="yt-dlp format string (default: best video+audio)")
+    parser.add_argument("--audio", action="store_true", help="download audio only")
+    parser.add_argument("--audio-codec", choices=("mp3", "keep"), default="mp3",
+                        help="with --audio: transcode while downloading, or keep the original format")
+    parser.add_argument("--prefix-index", action="store_true", help="prefix file names with the playlist index")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="concurrent playlist entries")
+    parser.add_argument("--engine", choices=("native", "segmented"), default="native",
+                        help="HTTP engine for progressive formats")
+    parser.add_argument("--connections", type=int, default=4, help="connections per file for --engine segmented")
+    parser.add_argument("--fragments", type=int, default=4, help="HLS/DASH fragments fetched at once per stream")
+    parser.add_argument("--max-seconds", type=float, help="pick the best format expected to download within this time")
+    parser.add_argument("--max-mb", type=float, help="pick the best format no larger than this")
+    parser.add_argument("--max-height", type=int, help="pick the best format no taller than this (e.g. 720)")
+    parser.add_argument("--throughput-db", help="JSON file that keeps per-host download speeds between runs")
+    parser.add_argument("--rate-limit", type=float, help="global bandwidth cap in MB/s")
+    parser.add_argument("--progress-hz", type=float, default=2, help="max progress lines per second")
+    parser.add_argument("--jsonl", action="store_true", help="emit JSON-lines events on stdout")
+    parser.add_argument("--export", action="store_true", help="move each file to Playlists/<title> as soon as it finishes")
+    parser.add_argument("--sync", action="store_true",
+                        help="mirror mode: download only entries missing from the folder, renumber moved ones")
+    parser.add_argument("--prune", action="store_true", help="with --sync: delete files of entries removed from the playlist")
+    parser.add_argument("--stream", action="store_true",
+                        help="page huge playlists in lazily and report entries as they finish (flat memory)")
+    parser.add_argument("--media-store", help="directory of a dedup store shared across playlists")
+    parser.add_argument("--jobs-db", help="SQLite job queue for resuming interrupted runs")
+    parser.add_argument("--log-file", help="write yt-dlp's log (debug level) to this file")
+    parser.add_argument("--metrics-file", help="write Prometheus metrics here after every URL")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--profile", metavar="PATH", help="sample stacks while running and write folded stacks to PATH")
+    return parser
+
+
+def write_entry(writer, url, result):
+    writer.write(
+        "entry", url=url, index=result.index, success=result.success, title=result.title,
+        filepath=result.filepath, error=result.error, seconds=round(result.elapsed, 3),
+        timings={stage: round(seconds, 3) for stage, seconds in result.timings.items()},
+        format=result.format,
+    )
+
+
+def run_url(url, args, format_type, job_store, media_store, writer, format_policy=None, throughput=None):
+    job_id = job_store.add_job(
+        url, format_type, os.path.abspath(args.output_dir), args.prefix_index,
+        format_policy.target.as_dict() if format_policy else None
+    ) if job_store else None
+    job = job_store.get_job(job_id) if job_store else None
+
+    def report_timing(stage, seconds):
+        if writer:
+            writer.write("timing", url=url, stage=stage, seconds=round(seconds, 3))
+
+    playlist_info = None
+    if job and job["playlist_dir"]:
+        playlist_title, output_dir = job["playlist_title"], job["playlist_dir"]
+    else:
+        if args.stream:
+            playlist_info = stream_playlist_info(url, timing_callback=report_timing)
+        else:
+            playlist_info = fetch_playlist_info(url, timing_callback=report_timing)
+        playlist_title = playlist_info.title if playlist_info.is_playlist and playlist_info.title else "قائمة تشغيل"
+        output_dir = os.path.join(args.output_dir, playlist_title) if playlist_info.is_playlist else args.output_dir
+        if job:
+            job_store.set_job_playlist(job_id, playlist_title, os.path.abspath(output_dir))
+    if job:
+        job_store.set_job_state(job_id, RUNNING)
+
+    def status_callback(message):
+        if writer:
+            writer.write("status", url=url, message=message)
+        else:
+            print(message)
+
+    downloader = YouTubeDownloader(
+        output_dir,
+        prefix_index=args.prefix_index,
+        status_callback=status_callback,
+        total_videos=(playlist_info.count or 1) if playlist_info else 1,
+        playlist_title=playlist_title,
+        max_workers=args.workers,
+        rate_limit=int(args.rate_limit * 1024 * 1024) if args.rate_limit else None,
+        job_store=job_store,
+        timing_callback=report_timing,
+        progress_hz=args.progress_hz,
+        noprogress=True,  # yt-dlp's own progress lines would interleave with ours
+        stream_export=args.export,
+        media_store=media_store,
+        http_engine=args.engine,
+        connections=args.connections,
+        fragment_concurrency=args.fragments,
+        audio_codec=args.audio_codec if args.audio and args.audio_codec != "keep" else None,
+        format_policy=format_policy,
+        throughput=throughput,
+    )
+    if writer:
+        downloader.status_callback = None  # Structured progress replaces the text lines
+        downloader.progress_events.subscribe(lambda event: writer.write(
+            "progress", url=url, state=event.state, entry=event.entry_index,
+            downloaded_bytes=event.downloaded_bytes, total_bytes=event.total_bytes,
+            speed=event.speed, eta=event.eta, fragments_per_second=event.fragments_per_second,
+            percent=downloader.aggregator.percent(),
+        ))
+
+    if args.stream:
+        if writer:
+            downloader.result_callback = lambda result: write_entry(writer, url, result)
+        success, output_dir, total_videos, playlist_title = downloader.stream_playlist(
+            url, format_type, job_id=job_id, playlist_stream=playlist_info
+        )
+    elif args.sync:
+        success, output_dir, total_videos, playlist_title = downloader.sync_playlist(
+            url, format_type, playlist_info=playlist_info, prune=args.prune
+        )
+        if writer and downloader.sync_plan is not None:
+            writer.write("sync", url=url, **downloader.sync_plan.as_dict())
+    else:
+        success, output_dir, total_videos, playlist_title = downloader.download_playlist(
+            url, format_type, job_id=job_id, playlist_info=playlist_info
+        )
+    if job:
+        job_store.set_job_state(job_id, DONE if success else FAILED)
+
+    if writer:
+        for result in downloader.results:
+            write_entry(writer, url, result)
+        writer.write("job", url=url, success=success, output_dir=output_dir,
+                     playlist_title=playlist_title, total_videos=total_videos)
+    return success
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        urls = read_urls(args)
+    except OSError as e:
+        parser.error(f"cannot read {args.input_file}: {e}")
+    if not urls:
+        parser.error("no URLs given")
+    if args.stream and (args.sync or args.export):
+        parser.error("--stream can't be combined with --sync or --export")
+
+    format_type = args.format or (AUDIO_FORMAT if args.audio else VIDEO_FORMAT)
+    writer = JsonLinesWriter(sys.stdout) if args.jsonl else None
+    job_store = JobStore(args.jobs_db) if args.jobs_db else None
+    media_store = MediaStore(args.media_store, link_dir=args.output_dir) if args.media_store else None
+    target = FormatTarget(
+        max_seconds=args.max_seconds,
+        max_bytes=int(args.max_mb * 1024 * 1024) if args.max_mb else None,
+        max_height=args.max_height,
+    )
+    throughput = ThroughputModel(args.throughput_db)  # Learns from every run, target or not
+    format_policy = FormatPolicy(target, throughput) if target else None
+
+    configure_logging(args.log_file)
+    metrics_server = default_registry.serve(args.metrics_port) if args.metrics_port else None
+    profiler = SamplingProfiler().start() if args.profile else None
+
+    failed = 0
+    try:
+        for url in urls:
+            with default_registry.job(url) as usage:
+                usage['success'] = run_url(url, args, format_type, job_store, media_store, writer, format_policy, throughput)
+            if not usage['success']:
+                failed += 1
+            if args.metrics_file:
+                default_registry.write(args.metrics_file)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    finally:
+        if profiler:
+            profiler.stop()
+            profiler.dump(args.profile)
+        if metrics_server:
+            metrics_server.shutdown()
+        if job_store:
+            job_store.close()
+        if media_store:
+            media_store.close()
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
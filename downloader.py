@@ -1,11 +1,18 @@
 import os
-import yt_dlp
-import shutil
-from PyQt6.QtWidgets import QProgressBar
+import time
+import threading
+from scheduler import PlaylistEntry, PlaylistScheduler
+from metadata import fetch_playlist_info, stream_playlist_info
+from export import ExportEngine
+from sync import SyncIndex
+from metrics import RATE_BUCKETS, HOOK_BUCKETS, YdlLogger, default_registry, logger
+from audio import AudioTranscoder
+from fragments import FragmentYoutubeDL, SegmentedFragmentYoutubeDL
+from progress import DOWNLOADING, ProgressAggregator, ProgressEvent, ProgressPublisher
 
 
 class YouTubeDownloader:
-    def __init__(self, output_dir, prefix_index=False, progress_callback=None, status_callback=None, total_videos=1, playlist_title="قائمة تشغيل"):
+    def __init__(self, output_dir, prefix_index=False, progress_callback=None, status_callback=None, total_videos=1, playlist_title="قائمة تشغيل", max_workers=1, rate_limit=None, job_store=None, timing_callback=None, metadata_cache=None, progress_hz=10, noprogress=False, stream_export=False, media_store=None, http_engine='native', connections=4, fragment_concurrency=4, audio_codec=None, control=None, pool=None, limiter=None, connection_limiter=None, format_policy=None, throughput=None):
         self.base_dir = os.path.abspath(output_dir)  # Make path absolute
         self.output_dir = self.base_dir  # Initialize output_dir
         self.prefix_index = prefix_index
@@ -16,36 +23,169 @@ class YouTubeDownloader:
         self.playlist_title = playlist_title  # Initialize playlist_title
         os.makedirs(self.base_dir, exist_ok=True)
         self.download_count = 0  # Add counter for downloaded files
+        self.max_workers = max_workers  # Concurrent entries in playlist mode
+        self.rate_limit = rate_limit  # Global bandwidth cap in bytes/s (None = unlimited)
+        self.results = []  # Per-entry results of the last playlist download
+        self.sync_plan = None  # SyncPlan of the last sync_playlist run
+        self.result_callback = None  # result_callback(EntryResult) for each entry of stream_playlist
+        self.index_total = None  # Entry count that sets the index prefix width (None = total_videos)
+        self.job_store = job_store  # Optional JobStore for crash-safe resume
+        self.timing_callback = timing_callback  # timing_callback(stage, seconds) for latency checks
+        self._download_started = None
+        self.metadata_cache = metadata_cache  # Optional MetadataCache shared across jobs
+        self.noprogress = noprogress  # Silence yt-dlp's console progress (headless use)
+        self.stream_export = stream_export  # Export each entry to the playlist folder as soon as it finishes
+        self.exporter = None  # ExportEngine while a streaming export is running
+        self.media_store = media_store  # Optional MediaStore that dedups videos across playlists
+        self.http_engine = http_engine  # 'native' (yt-dlp) or 'segmented' (multi-connection ranges)
+        self.connections = connections  # Connections per file for the segmented engine
+        self.fragment_concurrency = fragment_concurrency  # HLS/DASH fragments fetched at once per stream
+        self.transcoder = None  # AudioTranscoder when audio_codec is set (e.g. 'mp3') and ffmpeg is installed
+        if audio_codec:
+            transcoder = AudioTranscoder(audio_codec)
+            if transcoder.available:
+                self.transcoder = transcoder
+            else:
+                logger.warning("ffmpeg not found; keeping the original audio instead of converting to %s", audio_codec)
+        self.control = control  # Optional JobControl (cancel/pause/priority) set by a JobManager
+        self.pool = pool  # Optional PriorityPool shared with other jobs
+        self.limiter = limiter  # Optional BandwidthLimiter shared with other jobs (overrides rate_limit)
+        self.connection_limiter = connection_limiter  # Optional ConnectionLimiter shared with other jobs
+        self.format_policy = format_policy  # Optional FormatPolicy that picks formats per entry under a target
+        # Optional ThroughputModel fed by every finished file, with or without a format target
+        self.throughput = throughput or (format_policy.model if format_policy is not None else None)
+        self._count_lock = threading.Lock()
+        self.aggregator = ProgressAggregator(total_videos)  # Overall percentage for progress_callback
+        self.progress_events = ProgressPublisher(max_rate=progress_hz)  # Subscribe for typed ProgressEvents
+        self.progress_events.subscribe(self.render_progress)
 
-    def progress_hook(self, d):
-        if d['status'] == 'downloading':
-            try:
-                # Calculate percentage
-                total_bytes = d.get('total_bytes', d.get('total_bytes_estimate', 0))
-                downloaded_bytes = d.get('downloaded_bytes', 0)
-                speed = d.get('speed', 0)
-                
-                if total_bytes > 0:
-                    # Convert bytes to MB for better readability
-                    total_mb = total_bytes / (1024 * 1024) if total_bytes else 0
-                    downloaded_mb = downloaded_bytes / (1024 * 1024) if downloaded_bytes else 0
-                    speed_mb = speed / (1024 * 1024) if speed else 0
-                    
-                    if self.status_callback:
-                        status_text = f"تحميل الفيديو {self.download_count + 1} من {self.total_videos}\n"
-                        status_text += f"جارٍ تحميل {downloaded_mb:.1f} MB من {total_mb:.1f} MB - السرعة: {speed_mb:.1f} MB/s"
-                        self.status_callback(status_text)
-                    
-            except Exception as e:
-                print(f"Error in progress_hook: {e}")
-                
-        elif d['status'] == 'finished':
+    def progress_hook(self, d, entry_index=None):
+        started = time.perf_counter()
+        try:
+            self._progress_hook(d, entry_index)
+        finally:
+            default_registry.inc('ytdl_hook_calls_total', status=d['status'])
+            default_registry.observe('ytdl_hook_seconds', time.perf_counter() - started, buckets=HOOK_BUCKETS)
+
+    def _progress_hook(self, d, entry_index):
+        if self._download_started is not None and d['status'] == 'downloading':
+            # Time from the start of the job to the first media byte
+            with self._count_lock:
+                started, self._download_started = self._download_started, None
+            if started is not None and self.timing_callback:
+                self.timing_callback('first_byte', time.perf_counter() - started)
+
+        # Entries finish out of order in playlist mode, so use the entry's own index
+        video_number = entry_index if entry_index is not None else self.download_count + 1
+        try:
+            # Only structured data here; formatting happens at the coalesced UI rate
+            event = ProgressEvent.from_hook(d, video_number)
+            self.aggregator.update(event)
+            self.progress_events.publish(event)
+        except Exception as e:
+            logger.error("Error in progress_hook: %s", e)
+
+        if d['status'] == 'finished':
+            nbytes = d.get('total_bytes') or d.get('downloaded_bytes')
+            if nbytes and d.get('elapsed'):
+                default_registry.inc('ytdl_transfer_bytes_total', nbytes)
+                default_registry.observe('ytdl_transfer_bytes_per_second', nbytes / d['elapsed'], buckets=RATE_BUCKETS)
+            if self.throughput is not None and d.get('info_dict'):
+                # Every finished file is a throughput sample for its CDN host
+                self.throughput.observe(d['info_dict'].get('url'), nbytes, d.get('elapsed'))
+            # In playlist mode the scheduler counts whole entries, not individual format files
+            if entry_index is None:
+                self.mark_finished(video_number)
+
+    def render_progress(self, event):
+        if event.state != DOWNLOADING:
+            return
+        if event.total_bytes and self.status_callback:
+            # Convert bytes to MB for better readability
+            total_mb = event.total_bytes / (1024 * 1024)
+            downloaded_mb = event.downloaded_bytes / (1024 * 1024)
+            speed_mb = event.speed / (1024 * 1024) if event.speed else 0
+            status_text = f"تحميل الفيديو {event.entry_index} من {self.total_videos}\n"
+            status_text += f"جارٍ تحميل {downloaded_mb:.1f} MB من {total_mb:.1f} MB - السرعة: {speed_mb:.1f} MB/s"
+            self.status_callback(status_text)
+        if self.progress_callback:
+            self.progress_callback(self.aggregator.percent())
+
+    def reset_progress(self):
+        self.download_count = 0
+        self.aggregator = ProgressAggregator(self.total_videos)
+
+    def mark_finished(self, entry_index):
+        with self._count_lock:
             self.download_count += 1
-            if self.status_callback:
-                if self.download_count >= self.total_videos:
-                    self.status_callback("تم الانتهاء من التحميل بالكامل!")
-                else:
-                    self.status_callback(f"تم الانتهاء من تحميل الفيديو {self.download_count} من {self.total_videos}")
+            download_count = self.download_count
+        self.aggregator.finish_entry(entry_index)
+        self.progress_events.flush()
+        if self.progress_callback:
+            self.progress_callback(self.aggregator.percent())
+        if self.status_callback:
+            if download_count >= self.total_videos:
+                self.status_callback("تم الانتهاء من التحميل بالكامل!")
+            else:
+                self.status_callback(f"تم الانتهاء من تحميل الفيديو {download_count} من {self.total_videos}")
+
+    def index_format(self):
+        # Determine the appropriate index width based on total_videos
+        total = self.index_total or self.total_videos
+        if total < 10:
+            return '%(autonumber)d_'
+        elif total < 100:
+            return '%(autonumber)02d_'
+        elif total < 1000:
+            return '%(autonumber)03d_'
+        return '%%(autonumber)0%dd_' % len(str(total))
+
+    def index_prefix(self, index):
+        # Literal version of index_format for entries downloaded one at a time,
+        # where yt-dlp's autonumber would restart at 1 for every entry
+        return self.index_format().replace('(autonumber)', '') % index
+
+    def ydl_class(self):
+        # HLS/DASH always go through the fragment pipeline; progressive formats through SegmentedFD if asked
+        return SegmentedFragmentYoutubeDL if self.http_engine == 'segmented' else FragmentYoutubeDL
+
+    def build_ydl_opts(self, format_type, is_playlist=False, outtmpl=None, progress_hooks=None):
+        if outtmpl is None:
+            outtmpl = (self.index_format() + '%(title)s.%(ext)s') if self.prefix_index else '%(title)s.%(ext)s'
+        ydl_opts = {
+            'format': format_type,
+            'progress_hooks': progress_hooks if progress_hooks is not None else [self.progress_hook],
+            'outtmpl': os.path.join(self.output_dir, outtmpl),
+            'ignoreerrors': True,
+            'no_warnings': False,  # Warnings go to the logger, not the console
+            'quiet': True,
+            'extract_flat': False,
+            'writethumbnail': False,
+            'writeinfojson': False,
+            'write_description': False,
+            'write_annotations': False,
+            'logger': YdlLogger(),
+            'retries': 3,
+            'fragment_retries': 3,
+            'skip_download': False,
+            'overwrites': False,  # Keep finished files, so reruns and resumed jobs skip them
+            'continuedl': True,  # Pick .part files up at their current offset
+            'noprogress': self.noprogress,
+            'logtostderr': False,
+            'consoletitle': False,
+            'prefer_ffmpeg': False,
+            'hls_prefer_native': True,
+            'concurrent_fragment_downloads': self.fragment_concurrency,
+            'no_playlist': not is_playlist,
+        }
+        if self.http_engine == 'segmented':
+            ydl_opts['segmented_connections'] = self.connections
+        if self.transcoder is not None:
+            ydl_opts['postprocessors'] = [self.transcoder.postprocessor()]  # Only for formats that can't be streamed
+        return ydl_opts
+
+    def export_folder(self):
+        return os.path.join(self.base_dir, "Playlists", self.sanitize_filename(self.playlist_title))
 
     def export_to_playlist_folder(self, source_dir):
         """
@@ -54,74 +194,75 @@ class YouTubeDownloader:
         """
         try:
             # Create the export folder path
-            export_folder = os.path.join(self.base_dir, "Playlists", self.sanitize_filename(self.playlist_title))
-            os.makedirs(export_folder, exist_ok=True)
+            export_folder = self.export_folder()
+            engine = ExportEngine(export_folder, max_workers=self.max_workers)
 
-            # Move all video files from source directory to export folder
-            for filename in os.listdir(source_dir):
-                source_file = os.path.join(source_dir, filename)
-                if os.path.isfile(source_file):
-                    destination_file = os.path.join(export_folder, filename)
-                    shutil.move(source_file, destination_file)
+            # Rename on the same device, parallel chunked copies across devices
+            try:
+                with default_registry.span('export'):
+                    results = engine.export_directory(source_dir)
+            finally:
+                engine.close()
+            failed = [result for result in results if not result.success]
+            if failed:
+                raise IOError(failed[0].error)
 
             if self.status_callback:
-                self.status_callback(f"تم نقل الملفات إلى مجلد القائمة: {self.playlist_title}")
+                stats = engine.stats()
+                self.status_callback(f"تم نقل الملفات إلى مجلد القائمة: {self.playlist_title} - {stats['mb_per_s']:.1f} MB/s")
 
             return export_folder
         except Exception as e:
-            print(f"Error exporting files: {e}")
+            logger.error("Error exporting files: %s", e)
             if self.status_callback:
                 self.status_callback(f"خطأ في نقل الملفات: {str(e)}")
             return None
 
+    def process_url(self, ydl, url, download=True):
+        """
+        Extract url and download it, reusing a cached extractor result when possible.
+        Returns the processed info_dict (None if extraction failed).
+        With download=False the format is selected but nothing is fetched.
+        """
+        if self.metadata_cache is None:
+            return ydl.extract_info(url, download=download)
+
+        info = self.metadata_cache.get(url)
+        if info is None:
+            # Raw extractor result: formats are known but nothing is selected or downloaded yet
+            info = ydl.extract_info(url, download=False, process=False)
+            if not info:
+                return None
+            if info.get('_type', 'video') == 'video':
+                self.metadata_cache.put(url, ydl.sanitize_info(info))
+        return ydl.process_ie_result(info, download=download)
+
+    def start_timing(self, started=None):
+        # Callers that did their own metadata pass pass its start time, so it is counted
+        if started is not None or self._download_started is None:
+            self._download_started = started if started is not None else time.perf_counter()
+
     def download(self, url, format_type, is_playlist=False):
         try:
-            self.download_count = 0  # Reset counter at start of download
-            
-            # Determine the appropriate format string based on total_videos
-            if self.total_videos < 10:
-                index_format = '%(autonumber)d_'
-            elif self.total_videos < 100:
-                index_format = '%(autonumber)02d_'
-            else:
-                index_format = '%(autonumber)03d_'
+            self.start_timing()
+            self.reset_progress()  # Reset counters at start of download
             
             # Download options
-            ydl_opts = {
-                'format': format_type,
-                'progress_hooks': [self.progress_hook],
-               'outtmpl': os.path.join(self.output_dir, (index_format + '%(title)s.%(ext)s') if self.prefix_index else '%(title)s.%(ext)s'),
-                'ignoreerrors': True,
-                'no_warnings': True,
-                'quiet': True,
-                'extract_flat': False,
-                'writethumbnail': False,
-                'writeinfojson': False,
-                'write_description': False,
-                'write_annotations': False,
-                'logger': None,
-                'retries': 3,
-                'fragment_retries': 3,
-                'skip_download': False,
-                'force_overwrites': True,
-                'continue_dl': True,
-                'noprogress': False,
-                'logtostderr': False,
-                'consoletitle': False,
-                'prefer_ffmpeg': False,
-                'hls_prefer_native': True,
-                'no_playlist': not is_playlist,
-            }
+            ydl_opts = self.build_ydl_opts(format_type, is_playlist=is_playlist)
 
             if self.status_callback:
                 self.status_callback(f"جارٍ التحميل... {self.current_video_index + 1} من {self.total_videos}")
 
             error = False
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with self.ydl_class()(ydl_opts) as ydl:
                 try:
-                    ydl.download([url])
+                    if self.metadata_cache is not None:
+                        self.process_url(ydl, url)
+                        self.metadata_cache.save()
+                    else:
+                        ydl.download([url])
                 except Exception as e:
-                    print(f"Download error: {e}")
+                    logger.error("Download error: %s", e)
                     if self.status_callback:
                         self.status_callback(f"حدث خطأ: {str(e)}")
                     error = True
@@ -129,10 +270,210 @@ class YouTubeDownloader:
             return not error, self.output_dir, self.total_videos, self.playlist_title
                 
         except Exception as e:
-            print(f"Error downloading: {e}")
+            logger.error("Error downloading: %s", e)
             if self.status_callback:
                 self.status_callback(f"حدث خطأ: {str(e)}")
             return False, self.output_dir, self.total_videos, self.playlist_title
 
+    def download_playlist(self, url, format_type, job_id=None, playlist_info=None):
+        """
+        Flatten the playlist once, then download its entries on a bounded worker pool.
+        Returns the same tuple as download(); per-entry results are kept in self.results.
+        Pass the PlaylistInfo already fetched for directory naming to skip a second lookup.
+        With a job store, a resumed job reuses its recorded entries instead of a new lookup.
+        """
+        try:
+            self.start_timing()
+            entries = None
+            if self.job_store and job_id is not None:
+                stored = self.job_store.get_entries(job_id)
+                if stored:
+                    entries = [PlaylistEntry(row['idx'], row['url'], row['title']) for row in stored]
+
+            if entries is None:
+                if playlist_info is None:
+                    playlist_info = fetch_playlist_info(
+                        url, timing_callback=self.timing_callback, cache=self.metadata_cache
+                    )
+                entries = playlist_info.entries
+                if playlist_info.is_playlist and playlist_info.title and self.playlist_title == "قائمة تشغيل":
+                    self.playlist_title = playlist_info.title
+                if self.job_store and job_id is not None:
+                    self.job_store.set_entries(job_id, entries)
+
+            self.total_videos = max(len(entries), 1)
+            return self.download_entries(entries, format_type, job_id=job_id)
+        except Exception as e:
+            logger.error("Error downloading playlist: %s", e)
+            if self.status_callback:
+                self.status_callback(f"حدث خطأ: {str(e)}")
+            return False, self.output_dir, self.total_videos, self.playlist_title
+
+    def sync_playlist(self, url, format_type, playlist_info=None, prune=False):
+        """
+        Mirror a playlist into output_dir incrementally.
+        Only the flat entry list is fetched; entries already in the folder's
+        SyncIndex are not looked at again, reordered ones are renumbered in
+        place, and only new entries are downloaded. With prune, files of entries
+        removed from the playlist are deleted.
+        Returns the same tuple as download(); the diff is kept in self.sync_plan.
+        """
+        try:
+            self.start_timing()
+            if playlist_info is None:
+                playlist_info = fetch_playlist_info(url, timing_callback=self.timing_callback, cache=self.metadata_cache)
+            if playlist_info.is_playlist and playlist_info.title and self.playlist_title == "قائمة تشغيل":
+                self.playlist_title = playlist_info.title
+            entries = playlist_info.entries
+            self.total_videos = max(len(entries), 1)
+
+            index = SyncIndex(self.output_dir)
+            plan = self.sync_plan = index.diff(entries, format_type)
+            prefix_of = self.index_prefix if self.prefix_index else (lambda position: '')
+            plan.renamed = index.renumber(entries, prefix_of)
+            if prune:
+                plan.pruned = index.prune(entries)
+            else:
+                index.detach(plan.removed)
+            index.save()
+            if self.status_callback:
+                self.status_callback(
+                    f"مزامنة: {len(plan.new)} جديد، {len(plan.removed)} محذوف، {len(plan.moved)} تغير ترتيبه"
+                )
+
+            new_indexes = {entry.index for entry in plan.new}
+            finished = [entry.index for entry in entries if entry.index not in new_indexes]
+            if not plan.new:
+                # Nothing to download: not a single video page or media request
+                self.results = []
+                self.reset_progress()
+                for entry_index in finished:
+                    self.aggregator.finish_entry(entry_index)
+                if self.progress_callback:
+                    self.progress_callback(100)
+                if self.status_callback:
+                    self.status_callback("القائمة محدثة، لا توجد فيديوهات جديدة")
+                return True, self.output_dir, self.total_videos, self.playlist_title
+
+            success = self.download_entries(plan.new, format_type, finished=finished)[0]
+            for result in self.results:
+                if result.success:
+                    entry = PlaylistEntry(result.index, result.url, result.title)
+                    index.record(entry, result.filepath, format_type, prefix_of(result.index))
+            index.save()
+            return success, self.output_dir, self.total_videos, self.playlist_title
+        except Exception as e:
+            logger.error("Error syncing playlist: %s", e)
+            if self.status_callback:
+                self.status_callback(f"حدث خطأ: {str(e)}")
+            return False, self.output_dir, self.total_videos, self.playlist_title
+
+    def stream_playlist(self, url, format_type, job_id=None, playlist_stream=None):
+        """
+        Download a very large playlist (e.g. a whole channel) without holding it in memory.
+        Entries are paged in only as workers free up, each entry's full info is
+        extracted just before it downloads, and every EntryResult goes to
+        result_callback instead of self.results. Returns the same tuple as download().
+        """
+        try:
+            self.start_timing()
+            stream = playlist_stream or stream_playlist_info(url, timing_callback=self.timing_callback)
+            if stream.is_playlist and stream.title and self.playlist_title == "قائمة تشغيل":
+                self.playlist_title = stream.title
+            # Prefixes can't be widened later, so an unknown length gets room for 9999 entries
+            self.total_videos = max(stream.count or 1, 1)
+            self.index_total = stream.count or 1000
+            return self.stream_entries(stream.entries, format_type, job_id=job_id)
+        except Exception as e:
+            logger.error("Error streaming playlist: %s", e)
+            if self.status_callback:
+                self.status_callback(f"حدث خطأ: {str(e)}")
+            return False, self.output_dir, self.total_videos, self.playlist_title
+
+    def stream_entries(self, entries, format_type, job_id=None):
+        self.reset_progress()
+        self.results = []
+        counts = {'succeeded': 0, 'failed': 0}
+        if self.status_callback:
+            self.status_callback("جارٍ التحميل...")
+
+        def discovered(entries):
+            for entry in entries:
+                if entry.index > self.total_videos:
+                    # Length not known up front: the total grows as pages come in
+                    self.total_videos = self.aggregator.total_videos = entry.index
+                if self.job_store and job_id is not None:
+                    self.job_store.set_entries(job_id, [entry])
+                yield entry
+
+        def on_result(result):
+            counts['succeeded' if result.success else 'failed'] += 1
+            if self.result_callback:
+                self.result_callback(result)
+
+        scheduler = PlaylistScheduler(
+            self, max_workers=self.max_workers, rate_limit=self.rate_limit,
+            job_store=self.job_store if job_id is not None else None, job_id=job_id,
+            pool=self.pool, limiter=self.limiter, connections=self.connection_limiter, control=self.control
+        )
+        scheduler.run(discovered(entries), format_type, on_result=on_result)
+        if self.metadata_cache is not None:
+            self.metadata_cache.save()
+        if self.throughput is not None:
+            self.throughput.save()
+        success = counts['succeeded'] > 0 and counts['failed'] == 0
+        return success, self.output_dir, self.total_videos, self.playlist_title
+
+    def download_entries(self, entries, format_type, job_id=None, finished=()):
+        # finished: indexes of entries already on disk, counted towards overall progress
+        self.reset_progress()
+        for entry_index in finished:
+            self.aggregator.finish_entry(entry_index)
+            self.download_count += 1
+        if self.status_callback:
+            self.status_callback(f"جارٍ التحميل... {len(entries)} فيديو")
+
+        scheduler = PlaylistScheduler(
+            self, max_workers=self.max_workers, rate_limit=self.rate_limit,
+            job_store=self.job_store if job_id is not None else None, job_id=job_id,
+            pool=self.pool, limiter=self.limiter, connections=self.connection_limiter, control=self.control
+        )
+        if self.stream_export:
+            self.exporter = ExportEngine(self.export_folder(), max_workers=self.max_workers)
+        try:
+            self.results = scheduler.run(entries, format_type)
+        finally:
+            if self.exporter is not None:
+                self.finish_streaming_export(job_id)
+        if self.metadata_cache is not None:
+            self.metadata_cache.save()
+        if self.throughput is not None:
+            self.throughput.save()
+        success = bool(self.results) and all(result.success for result in self.results)
+        return success, self.output_dir, self.total_videos, self.playlist_title
+
+    def finish_streaming_export(self, job_id=None):
+        exporter, self.exporter = self.exporter, None
+        exported = {}
+        try:
+            # Only the wait after the last download; earlier exports overlapped with downloads
+            with default_registry.span('export'):
+                exports = exporter.wait()
+            for export in exports:
+                if export.success:
+                    exported[export.source] = export.destination
+        finally:
+            exporter.close()
+
+        for result in self.results:
+            if result.filepath in exported:
+                result.filepath = exported[result.filepath]
+                if self.job_store and job_id is not None:
+                    self.job_store.finish_entry(job_id, result.index, result.filepath)
+        self.output_dir = exporter.destination
+        if self.status_callback:
+            stats = exporter.stats()
+            self.status_callback(f"تم نقل الملفات إلى مجلد القائمة: {self.playlist_title} - {stats['mb_per_s']:.1f} MB/s")
+
     def sanitize_filename(self, name):
         return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
\ No newline at end of file
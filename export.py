@@ -0,0 +1,198 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from metrics import logger
+
+
+RENAME = 'rename'
+COPY_FILE_RANGE = 'copy_file_range'
+SENDFILE = 'sendfile'
+READ_WRITE = 'read_write'
+
+
+class ExportResult:
+    def __init__(self, source, destination):
+        self.source = source
+        self.destination = destination
+        self.bytes = 0
+        self.method = None
+        self.seconds = 0.0
+        self.error = None
+
+    @property
+    def success(self):
+        return self.error is None
+
+
+def same_device(path, directory):
+    try:
+        return os.stat(path).st_dev == os.stat(directory).st_dev
+    except OSError:
+        return False
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExportEngine:
+    """
+    Moves finished downloads into a destination folder.
+    Same device: a plain os.rename. Other devices (e.g. a NAS mount): the file is
+    split into chunks copied in parallel with copy_file_range/sendfile where the
+    OS has them, checked, then the source is removed.
+    Files can be submitted one by one as their downloads finish.
+    """
+
+    def __init__(self, destination, max_workers=4, chunk_workers=4, chunk_size=16 * 1024 * 1024, verify_hash=False):
+        self.destination = os.path.abspath(destination)
+        os.makedirs(self.destination, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.verify_hash = verify_hash  # Size is always checked; hashing re-reads both copies
+        self.results = []
+        self._files = ThreadPoolExecutor(max_workers=max_workers)
+        self._chunks = ThreadPoolExecutor(max_workers=chunk_workers)
+        self._futures = []
+        self._unsupported = set()  # Kernel copy methods that failed for this destination
+        self._lock = threading.Lock()
+        self._started = None
+        self._finished = None
+
+    def submit(self, source):
+        """Queue one file; returns a Future resolving to its ExportResult."""
+        with self._lock:
+            if self._started is None:
+                self._started = time.perf_counter()
+            future = self._files.submit(self.export_file, source)
+            self._futures.append(future)
+        return future
+
+    def export_directory(self, source_dir):
+        for filename in sorted(os.listdir(source_dir)):
+            source_file = os.path.join(source_dir, filename)
+            if os.path.isfile(source_file):
+                self.submit(source_file)
+        return self.wait()
+
+    def wait(self):
+        with self._lock:
+            futures, self._futures = self._futures, []
+        wait(futures)
+        self._finished = time.perf_counter()
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.wait()
+        self._files.shutdown()
+        self._chunks.shutdown()
+
+    def stats(self):
+        with self._lock:
+            results = list(self.results)
+        total_bytes = sum(result.bytes for result in results if result.success)
+        end = self._finished or time.perf_counter()
+        elapsed = end - self._started if self._started else 0.0
+        return {
+            'files': len(results),
+            'failed': sum(1 for result in results if not result.success),
+            'bytes': total_bytes,
+            'seconds': elapsed,
+            'mb_per_s': total_bytes / elapsed / (1024 * 1024) if elapsed else 0.0,
+        }
+
+    def export_file(self, source):
+        result = ExportResult(source, os.path.join(self.destination, os.path.basename(source)))
+        start = time.perf_counter()
+        try:
+            result.bytes = os.path.getsize(source)
+            if same_device(source, self.destination):
+                os.replace(source, result.destination)
+                result.method = RENAME
+            else:
+                result.method = self._copy(source, result.destination, result.bytes)
+                self._verify(source, result.destination, result.bytes)
+                shutil.copystat(source, result.destination)
+                os.remove(source)
+        except Exception as e:
+            logger.error("Error exporting %s: %s", source, e)
+            result.error = str(e)
+        result.seconds = time.perf_counter() - start
+        with self._lock:
+            self.results.append(result)
+        return result
+
+    def _copy(self, source, destination, size):
+        tmp_destination = destination + '.part'
+        with open(tmp_destination, 'wb') as f:
+            f.truncate(size)  # Preallocate so chunks can land in any order
+
+        offsets = range(0, size, self.chunk_size)
+        try:
+            futures = [self._chunks.submit(self._copy_chunk, source, tmp_destination, offset, min(self.chunk_size, size - offset))
+                       for offset in offsets]
+            methods = {future.result() for future in futures}
+        except BaseException:
+            os.remove(tmp_destination)
+            raise
+        os.replace(tmp_destination, destination)
+        return methods.pop() if len(methods) == 1 else READ_WRITE
+
+    def _copy_chunk(self, source, destination, offset, length):
+        # Each chunk gets its own descriptors so their file positions never collide
+        with open(source, 'rb') as src, open(destination, 'r+b') as dst:
+            for method in self._fast_methods():
+                try:
+                    self._copy_range(method, src.fileno(), dst.fileno(), offset, length)
+                    return method
+                except OSError:
+                    # e.g. EXDEV/EINVAL for this pair of filesystems; don't try it again
+                    self._unsupported.add(method)
+            src.seek(offset)
+            dst.seek(offset)
+            remaining = length
+            while remaining:
+                data = src.read(min(remaining, 1024 * 1024))
+                if not data:
+                    raise IOError(f"unexpected end of {source}")
+                dst.write(data)
+                remaining -= len(data)
+            return READ_WRITE
+
+    def _fast_methods(self):
+        methods = []
+        if hasattr(os, 'copy_file_range'):
+            methods.append(COPY_FILE_RANGE)
+        if hasattr(os, 'sendfile'):
+            methods.append(SENDFILE)
+        return [method for method in methods if method not in self._unsupported]
+
+    def _copy_range(self, method, src_fd, dst_fd, offset, length):
+        copied = 0
+        if method == SENDFILE:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+        while copied < length:
+            if method == COPY_FILE_RANGE:
+                sent = os.copy_file_range(src_fd, dst_fd, length - copied, offset + copied, offset + copied)
+            else:
+                sent = os.sendfile(dst_fd, src_fd, offset + copied, length - copied)
+            if sent == 0:
+                raise IOError("unexpected end of file")
+            copied += sent
+
+    def _verify(self, source, destination, size):
+        if os.path.getsize(destination) != size:
+            os.remove(destination)
+            raise IOError(f"size mismatch after copying {source}")
+        if self.verify_hash and file_digest(source) != file_digest(destination):
+            os.remove(destination)
+            raise IOError(f"checksum mismatch after copying {source}")
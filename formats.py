@@ -0,0 +1,230 @@
+import os
+import json
+import threading
+from urllib.parse import urlparse
+from metrics import logger
+
+DEFAULT_RATE = 1024 * 1024  # bytes/s assumed for a CDN we have never downloaded from
+MERGE_RATE = 150 * 1024 * 1024  # bytes/s of an ffmpeg stream-copy merge (disk bound)
+
+
+# Second-level labels that country TLDs sell domains under (example.co.uk, example.com.au)
+SECOND_LEVEL = {'ac', 'co', 'com', 'edu', 'gov', 'go', 'ne', 'net', 'or', 'org'}
+
+
+def host_keys(url):
+    """The URL's host and its registered domain, most specific first."""
+    host = urlparse(url or '').hostname
+    if not host:
+        return []
+    labels = host.split('.')
+    if labels[-1].isdigit() or ':' in host:
+        return [host]  # IP address
+    suffix = 2 if len(labels[-1]) == 2 and len(labels) > 2 and labels[-2] in SECOND_LEVEL else 1
+    if len(labels) <= suffix + 1:
+        return [host]
+    domain = '.'.join(labels[-suffix - 1:])
+    # Per-video edge hosts (rr3---sn-xyz.googlevideo.com) rarely repeat; their domain does
+    return [host] if domain == host else [host, domain]
+
+
+class ThroughputModel:
+    """
+    Rolling throughput estimate per CDN host: an exponentially weighted moving
+    average of bytes/s over finished downloads, with JSON persistence.
+    Unknown hosts fall back to their domain's estimate, then to default_rate.
+    The rates are per download, so they already reflect how many entries were
+    sharing the link at the time.
+    """
+
+    def __init__(self, path=None, alpha=0.3, default_rate=DEFAULT_RATE, min_bytes=256 * 1024):
+        self.path = os.path.abspath(path) if path else None
+        self.alpha = alpha  # Weight of the newest sample
+        self.default_rate = default_rate
+        self.min_bytes = min_bytes  # Smaller transfers are mostly latency, not throughput
+        self._rates = {}  # host or domain -> {'rate': bytes/s, 'samples': n}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Jobs sharing the model save it from their own threads
+        self._dirty = False
+        if self.path:
+            self.load()
+
+    def observe(self, url, nbytes, seconds):
+        if not nbytes or not seconds or nbytes < self.min_bytes or seconds <= 0:
+            return
+        sample = nbytes / seconds
+        with self._lock:
+            for key in host_keys(url):
+                entry = self._rates.get(key)
+                if entry is None:
+                    self._rates[key] = {'rate': sample, 'samples': 1}
+                else:
+                    entry['rate'] += self.alpha * (sample - entry['rate'])
+                    entry['samples'] += 1
+            self._dirty = True
+
+    def estimate(self, url):
+        with self._lock:
+            for key in host_keys(url):
+                if key in self._rates:
+                    return self._rates[key]['rate']
+        return self.default_rate
+
+    def stats(self):
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._rates.items()}
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error("Error loading throughput model: %s", e)
+            return
+        with self._lock:
+            self._rates.update(
+                (key, entry) for key, entry in stored.items() if isinstance(entry, dict) and entry.get('rate')
+            )
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = {key: dict(entry) for key, entry in self._rates.items()}
+                self._dirty = False
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.error("Error saving throughput model: %s", e)
+
+
+class FormatTarget:
+    def __init__(self, max_seconds=None, max_bytes=None, max_height=None):
+        self.max_seconds = max_seconds  # Estimated wall-clock time, download plus merge
+        self.max_bytes = max_bytes
+        self.max_height = max_height
+
+    def __bool__(self):
+        return any(limit is not None for limit in (self.max_seconds, self.max_bytes, self.max_height))
+
+    def as_dict(self):
+        return {'max_seconds': self.max_seconds, 'max_bytes': self.max_bytes, 'max_height': self.max_height}
+
+
+class FormatChoice:
+    """One downloadable option: a single format or a video+audio pair."""
+
+    def __init__(self, formats, rate_of):
+        self.formats = formats
+        self.muxed = len(formats) == 1 and all(formats[0].get(key) not in (None, 'none') for key in ('vcodec', 'acodec'))
+        video = next((fmt for fmt in formats if fmt.get('vcodec') not in (None, 'none')), None)
+        self.height = video.get('height') if video else None
+        self.fps = video.get('fps') if video else None
+        sizes = [fmt.get('filesize') or fmt.get('filesize_approx') for fmt in formats]
+        self.bytes = sum(sizes) if all(sizes) else None
+        if self.bytes is None:
+            self.seconds = None
+        else:
+            # yt-dlp fetches the parts of a pair one after the other, then merges them
+            self.seconds = sum(size / rate_of(fmt) for size, fmt in zip(sizes, formats))
+            if len(formats) > 1:
+                self.seconds += self.bytes / MERGE_RATE
+
+    @property
+    def spec(self):
+        return '+'.join(fmt['format_id'] for fmt in self.formats)
+
+    @property
+    def quality(self):
+        return (self.height or 0, self.fps or 0, sum(fmt.get('tbr') or fmt.get('abr') or 0 for fmt in self.formats))
+
+    def fits(self, target):
+        if target.max_height is not None and self.height and self.height > target.max_height:
+            return False
+        for limit, value in ((target.max_bytes, self.bytes), (target.max_seconds, self.seconds)):
+            if limit is not None and (value is None or value > limit):
+                return False
+        return True
+
+    def as_dict(self, target=None):
+        return {
+            'format_id': self.spec,
+            'height': self.height,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 1) if self.seconds is not None else None,
+            'muxed': self.muxed,
+            'fits': self.fits(target) if target is not None else None,
+        }
+
+
+class FormatPolicy:
+    """
+    Picks the best format that meets a FormatTarget, using the ThroughputModel
+    to turn sizes into download times. A pre-muxed format wins over a
+    video+audio pair of the same resolution, since it needs no merge pass.
+    When nothing meets the target the fastest option is taken.
+    """
+
+    def __init__(self, target, model=None):
+        self.target = target
+        self.model = model or ThroughputModel()
+
+    def candidates(self, formats, audio_only=False):
+        usable = [fmt for fmt in formats if fmt.get('format_id') and not fmt.get('has_drm')]
+        audio = [fmt for fmt in usable if fmt.get('vcodec') == 'none' and fmt.get('acodec') not in (None, 'none')]
+        muxed = [fmt for fmt in usable if fmt.get('vcodec') not in (None, 'none') and fmt.get('acodec') not in (None, 'none')]
+        rate_of = lambda fmt: self.model.estimate(fmt.get('url'))
+        if audio_only:
+            return [FormatChoice([fmt], rate_of) for fmt in (audio or muxed)]
+        video = [fmt for fmt in usable if fmt.get('vcodec') not in (None, 'none') and fmt.get('acodec') == 'none']
+        choices = [FormatChoice([fmt], rate_of) for fmt in muxed]
+        choices.extend(FormatChoice([v, a], rate_of) for v in video for a in audio)
+        return choices
+
+    def choose(self, formats, audio_only=False):
+        candidates = self.candidates(formats, audio_only)
+        if not candidates:
+            return None
+        eligible = [choice for choice in candidates if choice.fits(self.target)]
+        if not eligible:
+            sized = [choice for choice in candidates if choice.seconds is not None]
+            return min(sized, key=lambda choice: choice.seconds) if sized else None
+        best = max(eligible, key=lambda choice: choice.quality)
+        muxed = [choice for choice in eligible if choice.muxed and (choice.height or 0) >= (best.height or 0)]
+        return max(muxed, key=lambda choice: choice.quality) if muxed else best
+
+    def selector(self, ydl, format_spec, on_report=None):
+        """
+        A callable for ydl.format_selector. It runs the usual selector for
+        format_spec too, so on_report(report) can compare the two picks.
+        """
+        default = ydl.build_format_selector(format_spec)
+        audio_only = format_spec.startswith('bestaudio')
+
+        def select(ctx):
+            baseline = list(default(ctx))
+            choice = self.choose(ctx['formats'], audio_only)
+            picked = list(ydl.build_format_selector(choice.spec)(ctx)) if choice else []
+            if not picked:
+                yield from baseline
+                return
+            if on_report:
+                on_report(self.report(choice, baseline[0] if baseline else None))
+            yield from picked
+
+        return select
+
+    def report(self, choice, baseline):
+        rate_of = lambda fmt: self.model.estimate(fmt.get('url'))
+        if baseline is not None:
+            baseline = FormatChoice(baseline.get('requested_formats') or [baseline], rate_of).as_dict(self.target)
+        return {'target': self.target.as_dict(), 'chosen': choice.as_dict(self.target), 'baseline': baseline}
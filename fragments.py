@@ -0,0 +1,246 @@
+import time
+import http.client
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import yt_dlp
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.dash import DashSegmentsFD
+from yt_dlp.downloader.hls import HlsFD
+from segmented import SegmentedYoutubeDL, default_pool, needs_stock_downloader
+from network import SessionMixin
+from metrics import default_registry
+
+
+class FragmentError(IOError):
+    pass
+
+
+class FragmentPipelineMixin:
+    """
+    Replaces FragmentFD's fragment loop for finished (non-live) HLS/DASH streams.
+    Up to concurrent_fragment_downloads fragments of one stream are fetched at
+    once over pooled keep-alive connections, kept in memory (at most
+    fragment_buffer_bytes waiting for an earlier fragment) and appended to the
+    .part file in playlist order. There are no per-fragment temp files, and a
+    failed fragment is retried on its own without touching the others.
+    yt-dlp's manifest parsing, decryption, .ytdl resume file and
+    skip_unavailable_fragments handling are kept. Proxies, rate limits and the
+    other STOCK_PARAMS fall back to yt-dlp's own fragment loop.
+    """
+
+    def download_and_append_fragments(self, ctx, fragments, info_dict, *, is_fatal=(lambda idx: False),
+                                      pack_func=(lambda content, idx: content), finish_func=None,
+                                      tpe=None, interrupt_trigger=(True, )):
+        if ctx.get('live') or info_dict.get('request_data') or needs_stock_downloader(self.params):
+            return super().download_and_append_fragments(
+                ctx, fragments, info_dict, is_fatal=is_fatal, pack_func=pack_func,
+                finish_func=finish_func, tpe=tpe, interrupt_trigger=interrupt_trigger
+            )
+        if not self.params.get('skip_unavailable_fragments', True):
+            is_fatal = lambda _: True
+
+        fragments = list(fragments)
+        concurrency = max(1, self.params.get('concurrent_fragment_downloads') or 1)
+        buffer_limit = self.params.get('fragment_buffer_bytes') or 32 * 1024 * 1024
+        decrypt = self.decrypter(info_dict)
+        headers = dict(info_dict.get('http_headers') or {})
+        cookie = self.ydl.cookiejar.get_cookie_header(info_dict['url'])
+        if cookie:
+            headers['Cookie'] = cookie
+
+        progress = {
+            'status': 'downloading',
+            'downloaded_bytes': ctx['complete_frags_downloaded_bytes'],
+            'fragment_index': ctx['fragment_index'],
+            'fragment_count': ctx['total_frags'],
+            'filename': ctx['filename'],
+            'tmpfilename': ctx['tmpfilename'],
+            'max_progress': ctx.get('max_progress'),
+            'progress_idx': ctx.get('progress_idx'),
+        }
+        started = time.time()
+        resumed_bytes = ctx['complete_frags_downloaded_bytes']
+        appended = 0
+
+        buffered = {}  # position in fragments -> content waiting for an earlier fragment
+        buffered_bytes = 0
+        running = {}  # Future -> position in fragments
+        next_submit = next_append = 0
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            while next_append < len(fragments):
+                if not interrupt_trigger[0]:
+                    break
+                # Always let the fragment we are waiting on in, so a full buffer can't stall
+                while next_submit < len(fragments) and len(running) < concurrency and (
+                        buffered_bytes < buffer_limit or next_submit == next_append):
+                    fragment = fragments[next_submit]
+                    fatal = is_fatal(fragment.get('index') or (fragment['frag_index'] - 1))
+                    running[pool.submit(self._fetch_fragment, fragment, headers, decrypt, fatal)] = next_submit
+                    next_submit += 1
+                if next_append not in buffered:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        position = running.pop(future)
+                        try:
+                            content = future.result()
+                        except FragmentError as e:
+                            ctx['dest_stream'].close()
+                            self.report_error(f"{e}, unable to continue")
+                            return False
+                        buffered[position] = content
+                        buffered_bytes += len(content or b'')
+                while next_append in buffered:
+                    content = buffered.pop(next_append)
+                    buffered_bytes -= len(content or b'')
+                    fragment = fragments[next_append]
+                    next_append += 1
+                    if content is None:
+                        self.report_skip_fragment(fragment['frag_index'], 'fragment not found')
+                        continue
+                    self._write_fragment(ctx, pack_func(content, fragment['frag_index']), fragment['frag_index'])
+                    appended += 1
+                    elapsed = time.time() - started
+                    downloaded = ctx['complete_frags_downloaded_bytes'] = ctx['complete_frags_downloaded_bytes'] + len(content)
+                    speed = (downloaded - resumed_bytes) / elapsed if elapsed > 0 else None
+                    progress.update({
+                        'downloaded_bytes': downloaded,
+                        'fragment_index': fragment['frag_index'],
+                        'elapsed': elapsed,
+                        'speed': speed,
+                        'fragments_per_second': appended / elapsed if elapsed > 0 else None,
+                    })
+                    if ctx['total_frags']:
+                        progress['total_bytes_estimate'] = downloaded / fragment['frag_index'] * ctx['total_frags']
+                        progress['eta'] = (progress['total_bytes_estimate'] - downloaded) / speed if speed else None
+                    self._hook_progress(progress, info_dict)
+        except BaseException:
+            ctx['dest_stream'].close()  # Whole fragments so far stay in .part for continuedl
+            raise
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if finish_func is not None:
+            ctx['dest_stream'].write(finish_func())
+            ctx['dest_stream'].flush()
+        return self._finish_frag_download(ctx, info_dict)
+
+    def _fetch_fragment(self, fragment, headers, decrypt, fatal):
+        """Download one fragment into memory, retrying only this fragment. None = skipped."""
+        headers = dict(headers)
+        byte_range = fragment.get('byte_range')
+        if byte_range:
+            headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
+        retries = self.params.get('fragment_retries', 10)
+        for attempt in range(retries + 1):
+            try:
+                content = self._get(fragment['url'], headers)
+                return decrypt(fragment, content)
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+                if attempt < retries:
+                    self.report_retry(e, attempt + 1, retries, fragment['frag_index'], fatal)
+                    time.sleep(min(0.5 * 2 ** attempt, 5))
+        if fatal:
+            raise FragmentError(f"fragment {fragment['frag_index']} failed: {error}")
+        return None
+
+    def _get(self, url, headers):
+        _, key, conn, response = default_pool.open(url, headers)
+        reusable = False
+        try:
+            if response.status not in (200, 206):
+                response.read()
+                reusable = True
+                raise FragmentError(f"HTTP {response.status}")
+            content = response.read()
+            if response.length:
+                raise FragmentError("connection closed before the fragment was complete")
+            reusable = not response.will_close
+            return content
+        finally:
+            default_pool.release(key, conn, reusable)
+
+    def _write_fragment(self, ctx, content, frag_index):
+        ctx['dest_stream'].write(content)
+        ctx['dest_stream'].flush()
+        ctx['fragment_index'] = frag_index
+        if ctx['live'] is not True and ctx['tmpfilename'] != '-' and not self.params.get('_no_ytdl_file'):
+            self._write_ytdl_file(ctx)  # Resume point for continuedl
+
+
+class PipelinedHlsFD(FragmentPipelineMixin, HlsFD):
+    pass
+
+
+class PipelinedDashFD(FragmentPipelineMixin, DashSegmentsFD):
+    pass
+
+
+PIPELINED = {HlsFD: PipelinedHlsFD, DashSegmentsFD: PipelinedDashFD}
+
+
+class FragmentYoutubeDL(SessionMixin, yt_dlp.YoutubeDL):
+    """
+    YoutubeDL that runs yt-dlp's native HLS/DASH downloaders through the fragment pipeline.
+    Also times the metadata, format selection, transfer and post-processing stages,
+    and shares connections and caches with every other instance (see network.py).
+    """
+
+    _metadata_started = None  # Set while extraction runs, until formats are selected
+    _depth = 0  # Nesting of extract_info/process_ie_result calls
+
+    def extract_info(self, url, *args, **kwargs):
+        with self._metadata_span():
+            return super().extract_info(url, *args, **kwargs)
+
+    def process_ie_result(self, ie_result, *args, **kwargs):
+        # Cached extractor results skip extract_info and start here
+        with self._metadata_span():
+            return super().process_ie_result(ie_result, *args, **kwargs)
+
+    @contextmanager
+    def _metadata_span(self):
+        self._depth += 1
+        if self._depth == 1:
+            self._metadata_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._end_metadata()
+
+    def _end_metadata(self):
+        if self._metadata_started is not None:
+            default_registry.observe('ytdl_stage_seconds', time.perf_counter() - self._metadata_started, stage='metadata')
+            self._metadata_started = None
+
+    def _select_formats(self, formats, selector):
+        self._end_metadata()
+        with default_registry.span('format_selection'):
+            return super()._select_formats(formats, selector)
+
+    def post_process(self, filename, info, files_to_move=None):
+        # Merging a video+audio pair runs here too
+        with default_registry.span('postprocess'):
+            return super().post_process(filename, info, files_to_move)
+
+    def dl(self, name, info, subtitle=False, test=False):
+        fd_class = None
+        if not (test or subtitle or name == '-') and info.get('url'):
+            fd_class = PIPELINED.get(get_suitable_downloader(info, self.params, to_stdout=False))
+        with default_registry.span('transfer'):
+            if fd_class is None:
+                return super().dl(name, info, subtitle=subtitle, test=test)
+            fd = fd_class(self, self.params)
+            for ph in self._progress_hooks:
+                fd.add_progress_hook(ph)
+            new_info = self._copy_infodict(info)
+            if new_info.get('http_headers') is None:
+                new_info['http_headers'] = self._calc_headers(new_info)
+            return fd.download(name, new_info, subtitle)
+
+
+class SegmentedFragmentYoutubeDL(FragmentYoutubeDL, SegmentedYoutubeDL):
+    """Fragment pipeline for HLS/DASH plus SegmentedFD for progressive formats."""
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+PAUSED = 'paused'
+CANCELLED = 'cancelled'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    format_type TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    prefix_index INTEGER NOT NULL DEFAULT 0,
+    playlist_title TEXT,
+    playlist_dir TEXT,
+    format_target TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    part_path TEXT,
+    part_bytes INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER,
+    filepath TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state);
+"""
+
+
+class JobStore:
+    """
+    On-disk download queue (SQLite in WAL mode).
+    Records every job, its playlist entries, the .part byte offsets and the final
+    paths, so a restarted app skips finished entries and resumes partial ones.
+    """
+
+    def __init__(self, path, progress_interval=1.0):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.progress_interval = progress_interval  # Min seconds between .part offset writes per entry
+        self._lock = threading.Lock()
+        self._last_progress = {}  # (job_id, idx) -> monotonic time of the last offset write
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if 'format_target' not in columns:
+            # Queues written before format targets existed
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN format_target TEXT")
+        # Anything still marked running was interrupted by a crash or a close
+        self._execute("UPDATE jobs SET state = ? WHERE state = ?", (PENDING, RUNNING))
+        self._execute("UPDATE entries SET state = ? WHERE state = ?", (PENDING, RUNNING))
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Jobs
+
+    def add_job(self, url, format_type, output_dir, prefix_index=False, format_target=None):
+        """
+        Queue a job, reusing an unfinished job for the same URL, format and target.
+        format_target is a FormatTarget.as_dict() or None; job rows return it decoded.
+        """
+        target = json.dumps(format_target, sort_keys=True) if format_target else None
+        rows = self._query(
+            "SELECT id FROM jobs WHERE url = ? AND format_type = ? AND output_dir = ? AND format_target IS ? "
+            "AND state NOT IN (?, ?)",
+            (url, format_type, output_dir, target, DONE, CANCELLED)
+        )
+        if rows:
+            return rows[0]['id']
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO jobs (url, format_type, output_dir, prefix_index, format_target, state, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, format_type, output_dir, int(prefix_index), target, PENDING, now, now)
+        )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _job_row(row):
+        job = dict(row)
+        job['format_target'] = json.loads(job['format_target']) if job['format_target'] else None
+        return job
+
+    def get_job(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._job_row(rows[0]) if rows else None
+
+    def unfinished_jobs(self):
+        return [self._job_row(row) for row in self._query(
+            "SELECT * FROM jobs WHERE state IN (?, ?, ?) ORDER BY id", (PENDING, RUNNING, PAUSED)
+        )]
+
+    def set_job_state(self, job_id, state):
+        self._execute("UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?", (state, time.time(), job_id))
+
+    def set_job_playlist(self, job_id, playlist_title, playlist_dir):
+        self._execute(
+            "UPDATE jobs SET playlist_title = ?, playlist_dir = ?, updated_at = ? WHERE id = ?",
+            (playlist_title, playlist_dir, time.time(), job_id)
+        )
+
+    # Entries
+
+    def set_entries(self, job_id, entries):
+        """Record the flattened playlist; entries already known keep their state."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO entries (job_id, idx, url, title, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, entry.index, entry.url, entry.title, now) for entry in entries]
+            )
+            self._conn.execute("COMMIT")
+
+    def get_entries(self, job_id):
+        return [dict(row) for row in self._query("SELECT * FROM entries WHERE job_id = ? ORDER BY idx", (job_id,))]
+
+    def start_entry(self, job_id, index):
+        self._execute(
+            "UPDATE entries SET state = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+            (RUNNING, time.time(), job_id, index)
+        )
+
+    def update_progress(self, job_id, index, part_path, part_bytes, total_bytes=None):
+        # Progress hooks fire many times a second; only persist the offset periodically
+        key = (job_id, index)
+        now = time.monotonic()
+        if now - self._last_progress.get(key, 0) < self.progress_interval:
+            return
+        self._last_progress[key] = now
+        self._execute(
+            "UPDATE entries SET part_path = ?, part_bytes = ?, total_bytes = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+            (part_path, part_bytes, total_bytes, time.time(), job_id, index)
+        )
+
+    def finish_entry(self, job_id, index, filepath):
+        self._last_progress.pop((job_id, index), None)
+        self._execute(
+            "UPDATE entries SET state = ?, filepath = ?, part_path = NULL, error = NULL, updated_at = ? "
+            "WHERE job_id = ? AND idx = ?",
+            (DONE, filepath, time.time(), job_id, index)
+        )
+
+    def fail_entry(self, job_id, index, error):
+        self._last_progress.pop((job_id, index), None)
+        self._execute(
+            "UPDATE entries SET state = ?, error = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+            (FAILED, error, time.time(), job_id, index)
+        )
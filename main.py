@@ -1,13 +1,18 @@
 import sys
 import os
+import logging
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, 
                             QLineEdit, QLabel, QProgressBar, QCheckBox, QComboBox,
                             QHBoxLayout, QFrame, QSizePolicy, QScrollArea, QTabWidget,
                             QMessageBox)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QObject, pyqtSignal
 from PyQt6.QtGui import QIcon
-from downloader import YouTubeDownloader
-from pytube import Playlist
+from jobstore import JobStore, PENDING, RUNNING, DONE, FAILED, PAUSED, CANCELLED
+from cache import MetadataCache
+from store import MediaStore
+from manager import JobManager
+from formats import FormatTarget, ThroughputModel
+from metrics import configure_logging, default_registry, logger
 
 
 class ModernProgressBar(QProgressBar):
@@ -26,65 +31,118 @@ class ModernProgressBar(QProgressBar):
             }
         """)
 
-class DownloaderThread(QThread):
-    progress_updated = pyqtSignal(int)
-    status_updated = pyqtSignal(str)
-    download_finished = pyqtSignal(bool, str, str, int)  # Include total_videos
-    
-    def __init__(self, url, format_type, is_playlist, prefix_index, progress_callback, status_callback, output_dir, total_videos=1):
+class JobSignals(QObject):
+    # JobManager calls back from worker threads; Qt queues the signal onto the GUI thread
+    job_updated = pyqtSignal(object)
+
+
+class JobWidget(QFrame):
+    STATE_LABELS = {
+        PENDING: "في الانتظار",
+        RUNNING: "جارٍ التحميل",
+        PAUSED: "متوقف مؤقتاً",
+        DONE: "مكتمل",
+        FAILED: "فشل",
+        CANCELLED: "ملغى",
+    }
+
+    def __init__(self, job, manager):
         super().__init__()
-        self.url = url
-        self.format_type = format_type
-        self.is_playlist = is_playlist
-        self.prefix_index = prefix_index
-        self.progress_callback = lambda p: self.progress_updated.emit(p)  # Convert callback to signal
-        self.status_callback = lambda s: self.status_updated.emit(s)  # Convert callback to signal
-        self.total_videos = total_videos  # Initialize total_videos
-        self.playlist_title = ""  # Initialize playlist title
-        self.output_dir = output_dir  # Store output directory
-    
-    def run(self):
-        try:
-            pl = Playlist(self.url)
-            self.playlist_title = pl.title
-            self.total_videos = pl.length if pl.length > 0 else 1
-            playlist_dir = os.path.join(self.output_dir, self.playlist_title)
-            os.makedirs(playlist_dir, exist_ok=True)  # Ensure directory exists
-        except Exception as e:
-            print(f"Error fetching playlist details: {e}")
-            self.playlist_title = "قائمة تشغيل"
-            self.total_videos = 1
-            playlist_dir = os.path.join(self.output_dir, self.playlist_title)
-            os.makedirs(playlist_dir, exist_ok=True)
+        self.job_id = job.id
+        self.manager = manager
+        self.opened = False  # Output folder shown once the job is done
+        self.finished = False  # Metrics written for the job's current terminal state
+        self.setStyleSheet("""
+            QFrame {
+                background-color: #f8f9fa;
+                border-radius: 5px;
+                border: 1px solid #dcdde1;
+            }
+        """)
+        layout = QVBoxLayout()
 
-        downloader = YouTubeDownloader(
-            output_dir=playlist_dir,  # Use the playlist directory
-            prefix_index=self.prefix_index,
-            progress_callback=self.progress_callback,
-            status_callback=self.status_callback,
-            total_videos=self.total_videos,
-            playlist_title=self.playlist_title
-        )
-        
-        success, output_dir, total_videos, playlist_title = downloader.download(
-            self.url, self.format_type, is_playlist=self.is_playlist
-        )
-        
-        self.total_videos = total_videos
-        self.playlist_title = playlist_title
-        self.download_finished.emit(success, output_dir, self.playlist_title, self.total_videos)
+        self.title_label = QLabel(job.url)
+        self.title_label.setStyleSheet("font-weight: bold; border: none;")
+        layout.addWidget(self.title_label)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("border: none;")
+        layout.addWidget(self.status_label)
 
+        self.progress_bar = ModernProgressBar()
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
+
+        buttons_layout = QHBoxLayout()
+        self.pause_button = QPushButton("إيقاف مؤقت")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        self.priority_button = QPushButton("أولوية")
+        self.priority_button.clicked.connect(lambda: manager.set_priority(self.job_id, manager.get(self.job_id).priority + 1))
+        self.cancel_button = QPushButton("إلغاء")
+        self.cancel_button.setStyleSheet("background-color: #e74c3c;")
+        self.cancel_button.clicked.connect(lambda: manager.cancel(self.job_id))
+        buttons_layout.addWidget(self.pause_button)
+        buttons_layout.addWidget(self.priority_button)
+        buttons_layout.addWidget(self.cancel_button)
+        layout.addLayout(buttons_layout)
+
+        self.setLayout(layout)
+        self.update_job(job)
+
+    def toggle_pause(self):
+        if self.manager.get(self.job_id).state == PAUSED:
+            self.manager.resume(self.job_id)
+        else:
+            self.manager.pause(self.job_id)
+
+    def update_job(self, job):
+        if job.playlist_title:
+            self.title_label.setText(f"قائمة التشغيل: {job.playlist_title} - عدد الفيديوهات: {job.total_videos}")
+        state = self.STATE_LABELS.get(job.state, job.state)
+        if job.priority:
+            state += f" - الأولوية: {job.priority}"
+        self.status_label.setText(f"{state}\n{job.status}" if job.status else state)
+        self.progress_bar.setValue(100 if job.state == DONE else job.percent)
+        self.pause_button.setText("استئناف" if job.state == PAUSED else "إيقاف مؤقت")
+        self.pause_button.setEnabled(job.active)
+        self.priority_button.setEnabled(job.active)
+        self.cancel_button.setEnabled(job.active)
 
 
 class YouTubeDownloaderApp(QWidget):
+    # Label -> FormatTarget (None keeps the best quality)
+    FORMAT_TARGETS = [
+        ("أفضل جودة", None),
+        ("حتى 1080p", FormatTarget(max_height=1080)),
+        ("حتى 720p", FormatTarget(max_height=720)),
+        ("حتى 480p", FormatTarget(max_height=480)),
+        ("خلال 5 دقائق لكل فيديو", FormatTarget(max_seconds=5 * 60)),
+        ("حتى 100 MB لكل فيديو", FormatTarget(max_bytes=100 * 1024 * 1024)),
+    ]
+
     def __init__(self):
         super().__init__()
-        self.current_video_index = 0
-        self.total_videos = 0
-        self.downloader_thread = None
-        self.playlist_title_label = QLabel("")  # Label for playlist title
         self.output_dir = "downloads"  # Default output directory
+        configure_logging(os.path.join(self.output_dir, "app.log"), file_level=logging.INFO)
+        self.metrics_path = os.path.join(self.output_dir, "metrics.prom")  # For a local Prometheus textfile scraper
+        self.job_store = JobStore(os.path.join(self.output_dir, "jobs.sqlite3"))  # Survives restarts
+        self.metadata_cache = MetadataCache(os.path.join(self.output_dir, "metadata_cache.json"))
+        self.media_store = MediaStore(os.path.join(self.output_dir, ".media"), link_dir=self.output_dir)  # One copy per video across playlists
+        self.job_widgets = {}  # job id -> JobWidget
+        self.job_signals = JobSignals()
+        self.job_signals.job_updated.connect(self.on_job_updated)
+        self.manager = JobManager(
+            self.output_dir,
+            job_store=self.job_store,
+            metadata_cache=self.metadata_cache,
+            media_store=self.media_store,
+            on_update=self.job_signals.job_updated.emit,
+            timing_callback=self.report_timing,
+            audio_codec="mp3",  # The audio tab promises MP3 files
+            throughput=ThroughputModel(os.path.join(self.output_dir, "throughput.json"))
+        )
         self.initUI()
+        self.resume_pending_jobs()
         
     def initUI(self):
         self.setWindowTitle("برنامج تحميل الفيديوهات من اليوتيوب")  # Improved Arabic title
@@ -199,34 +257,28 @@ class YouTubeDownloaderApp(QWidget):
         
         
         checkbox_layout.addLayout(prefix_layout)
+
+        target_layout = QHBoxLayout()
+        target_label = QLabel("الهدف")
+        self.target_combo = QComboBox()
+        for label, _ in self.FORMAT_TARGETS:
+            self.target_combo.addItem(label)
+        target_layout.addWidget(self.target_combo)
+        target_layout.addWidget(target_label)
+        checkbox_layout.addLayout(target_layout)
         checkbox_frame.setLayout(checkbox_layout)
         main_layout.addWidget(checkbox_frame)
 
-        # Progress Section
-        progress_frame = QFrame()
-        progress_layout = QVBoxLayout()
-        
-        # Playlist Title and Count
-        self.playlist_title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        progress_layout.addWidget(self.playlist_title_label)
-        
-        # Status label with improved styling
-        self.status_label = QLabel("")
-        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.status_label.setStyleSheet("""
-            QLabel {
-                font-size: 14px;
-                padding: 15px;
-                background-color: #f8f9fa;
-                border-radius: 5px;
-                border: 1px solid #dcdde1;
-                min-height: 30px;
-            }
-        """)
-        progress_layout.addWidget(self.status_label)
-        
-        progress_frame.setLayout(progress_layout)
-        main_layout.addWidget(progress_frame)
+        # Job list: one row per queued, running or finished job
+        self.jobs_layout = QVBoxLayout()
+        self.jobs_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        jobs_container = QWidget()
+        jobs_container.setLayout(self.jobs_layout)
+        jobs_scroll = QScrollArea()
+        jobs_scroll.setWidgetResizable(True)
+        jobs_scroll.setWidget(jobs_container)
+        jobs_scroll.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        main_layout.addWidget(jobs_scroll)
 
         # Status Section
         status_frame = QFrame()
@@ -247,22 +299,10 @@ class YouTubeDownloaderApp(QWidget):
 
         self.setLayout(main_layout)
 
-    def update_overall_progress(self, video_progress):
-        # This method can stay empty or be removed since we're not using progress bar
-        pass
-
-    def update_status_label(self, message):
-        self.status_label.setText(message)
-
-    def set_total_videos(self, playlist_title, total_videos):
-        self.total_videos = total_videos
-        self.playlist_title = playlist_title
-        self.playlist_title_label.setText(f"قائمة التشغيل: {self.playlist_title}\nعدد الفيديوهات: {self.total_videos}")
+    def report_timing(self, stage, seconds):
+        logger.debug("%s took %.2fs", stage, seconds)
 
     def start_download(self):
-        if self.downloader_thread and self.downloader_thread.isRunning():
-            return
-
         url = self.url_input.text()
         format_type = "bestaudio/best" if self.audio_tab.isVisible() else "bestvideo+bestaudio/best"
         prefix_index = self.prefix_checkbox.isChecked()
@@ -271,47 +311,48 @@ class YouTubeDownloaderApp(QWidget):
             self.status_label.setText("يرجى إدخال رابط صالح")
             return
 
-        self.download_button.setEnabled(False)
-        self.status_label.setText("جارٍ بدء التحميل...")
-        self.playlist_title_label.clear()  # Clear the playlist title label
-        self.status_label.clear()  # Clear the status label
-        self.current_video_index = 0
-        # Remove progress bar reset
-        # self.overall_progress_bar.setValue(0)
-        
-        is_playlist = False
-        
-        # Pass callbacks directly to the thread
-        self.downloader_thread = DownloaderThread(
-            url, 
-            format_type, 
-            is_playlist, 
-            prefix_index,
-            self.update_overall_progress,
-            self.update_status_label,
-            self.output_dir,  # Pass output_dir
-            total_videos=1
-        )
-        
-        self.downloader_thread.progress_updated.connect(self.update_overall_progress)
-        self.downloader_thread.status_updated.connect(self.update_status_label)
-        self.downloader_thread.download_finished.connect(self.on_download_finished)
-        self.downloader_thread.start()
+        format_target = self.FORMAT_TARGETS[self.target_combo.currentIndex()][1]
+        self.manager.submit(url, format_type, prefix_index, format_target=format_target)
+        self.status_label.setText("تمت إضافة التحميل إلى القائمة")
+        self.url_input.clear()  # Ready for the next URL while this one downloads
+
+    def resume_pending_jobs(self):
+        # Pick up every job left unfinished by a crash or a close
+        jobs = self.job_store.unfinished_jobs()
+        for job in jobs:
+            target = job['format_target']
+            self.manager.submit(
+                job['url'], job['format_type'], bool(job['prefix_index']),
+                job_id=job['id'], paused=job['state'] == PAUSED,
+                format_target=FormatTarget(**target) if target else None
+            )
+        if jobs:
+            self.status_label.setText("جارٍ استئناف التحميلات السابقة...")
 
-    def on_download_finished(self, success, output_dir, playlist_title, total_videos):
-        self.playlist_title = playlist_title
-        self.set_total_videos(playlist_title, total_videos)
-        if success:
-            self.status_label.setText("اكتمل التحميل بنجاح!")
+    def on_job_updated(self, job):
+        widget = self.job_widgets.get(job.id)
+        if widget is None:
+            widget = JobWidget(job, self.manager)
+            self.job_widgets[job.id] = widget
+            self.jobs_layout.insertWidget(0, widget)  # Newest first
+        widget.update_job(job)
+        if job.active:
+            widget.finished = False  # Resumed or retried: write again when it ends
+        elif not widget.finished:
+            widget.finished = True
+            default_registry.write(self.metrics_path)
+        if job.state == DONE and not widget.opened:
+            widget.opened = True
+            if self.metadata_cache is not None:
+                logger.debug("metadata cache: %s", self.metadata_cache.stats())
             try:
-                os.startfile(output_dir)
+                os.startfile(job.output_dir)
             except Exception as e:
-                print(f"Error opening folder: {e}")
-        else:
-            self.status_label.setText("حدث خطأ أثناء التحميل.")
-        
-        self.download_button.setEnabled(True)
-        self.url_input.clear()  # Clear the text field after download
+                logger.error("Error opening folder: %s", e)
+
+    def closeEvent(self, event):
+        self.manager.shutdown()  # Unfinished jobs resume on the next start
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,253 @@
+import os
+import threading
+from downloader import YouTubeDownloader
+from formats import FormatPolicy, ThroughputModel
+from metrics import default_registry, logger
+from metadata import fetch_playlist_info
+from jobstore import PENDING, RUNNING, DONE, FAILED, PAUSED, CANCELLED
+from scheduler import BandwidthLimiter, ConnectionLimiter, JobControl, PriorityPool
+
+ACTIVE_STATES = (PENDING, RUNNING, PAUSED)
+
+
+class Job:
+    def __init__(self, job_id, url, format_type, prefix_index=False, priority=0, format_target=None):
+        self.id = job_id
+        self.url = url
+        self.format_type = format_type
+        self.prefix_index = prefix_index
+        self.format_target = format_target  # Optional FormatTarget; None downloads format_type as is
+        self.control = JobControl(priority)
+        self.state = PENDING
+        self.percent = 0
+        self.status = ""
+        self.playlist_title = None
+        self.total_videos = 1
+        self.output_dir = None
+        self.success = False
+        self.started = False  # A worker thread has picked the job up
+
+    @property
+    def priority(self):
+        return self.control.priority
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_STATES
+
+
+class JobManager:
+    """
+    Runs several download jobs at once.
+    Jobs start in priority order (then submission order) up to max_jobs at a time;
+    a paused job gives up its slot and queues for one again when resumed.
+    Their entries share one PriorityPool, one connection cap and one bandwidth cap,
+    so a single clip queued behind a long playlist starts right away.
+    on_update(job) is called from worker threads whenever a job changes.
+    """
+
+    def __init__(self, output_dir, max_jobs=3, max_workers=4, pool_workers=8, max_connections=16, rate_limit=None,
+                 job_store=None, metadata_cache=None, media_store=None, on_update=None, timing_callback=None,
+                 http_engine='native', connections=4, audio_codec=None, throughput=None, format_target=None):
+        self.output_dir = output_dir
+        self.max_jobs = max(1, max_jobs)
+        self.max_workers = max_workers  # Entries of one job in flight at once
+        self.job_store = job_store
+        self.metadata_cache = metadata_cache
+        self.media_store = media_store
+        self.on_update = on_update
+        self.timing_callback = timing_callback
+        self.http_engine = http_engine
+        self.connections = connections
+        self.audio_codec = audio_codec  # Audio-only jobs are transcoded to this codec (e.g. 'mp3')
+        self.pool = PriorityPool(pool_workers)
+        self.connection_limiter = ConnectionLimiter(max_connections)
+        self.limiter = BandwidthLimiter(rate_limit)  # rate None = unlimited; set_rate_limit changes it live
+        self.throughput = throughput or ThroughputModel()  # Per-host speeds learned from every job
+        self.format_target = format_target  # Default FormatTarget for jobs submitted without one
+        self._jobs = {}  # job id -> Job, in submission order
+        self._lock = threading.Lock()
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def submit(self, url, format_type, prefix_index=False, priority=0, job_id=None, paused=False, format_target=None):
+        """Queue a job (persisted when there is a job store); returns its Job."""
+        format_target = format_target or self.format_target
+        if job_id is None and self.job_store:
+            job_id = self.job_store.add_job(
+                url, format_type, self.output_dir, prefix_index, format_target.as_dict() if format_target else None
+            )
+        with self._lock:
+            if job_id is None:
+                job_id = max(self._jobs, default=0) + 1
+            job = self._jobs.get(job_id)
+            if job is not None and job.active:
+                return job  # Same URL and format already queued
+            job = Job(job_id, url, format_type, prefix_index, priority, format_target)
+            if paused:
+                job.control.pause()
+                job.state = PAUSED
+            self._jobs[job_id] = job
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def pause(self, job_id):
+        job = self._jobs[job_id]
+        if job.state not in (PENDING, RUNNING):
+            return
+        job.control.pause()
+        self._set_state(job, PAUSED)
+
+    def resume(self, job_id):
+        job = self._jobs[job_id]
+        if job.state != PAUSED:
+            return
+        # Back through the max_jobs gate: a started job stays paused until _dispatch gives it a slot
+        self._set_state(job, PENDING)
+        self._dispatch()
+
+    def cancel(self, job_id):
+        job = self._jobs[job_id]
+        if not job.active:
+            return
+        job.control.cancel()
+        if not job.started:
+            self._set_state(job, CANCELLED)
+        else:
+            job.status = "جارٍ الإلغاء..."
+            self._notify(job)
+
+    def set_priority(self, job_id, priority):
+        # Applies to entries queued from now on and to connection waits
+        self._jobs[job_id].control.priority = priority
+        self._notify(self._jobs[job_id])
+        self._dispatch()
+
+    def set_rate_limit(self, rate_limit):
+        self.limiter.rate = rate_limit
+
+    def shutdown(self):
+        for job in self.jobs():
+            if job.state in (PENDING, RUNNING):
+                job.control.pause()  # Keeps .part files and PENDING rows for the next start
+        self.pool.shutdown(wait=False)
+
+    def _dispatch(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.started and job.state == RUNNING)
+            queued = sorted(
+                (job for job in self._jobs.values() if job.state == PENDING),
+                key=lambda job: (-job.priority, job.id)
+            )
+            starting = queued[:max(self.max_jobs - running, 0)]
+            resuming = [job for job in starting if job.started]  # Their threads wait in the scheduler
+            for job in starting:
+                job.started = True
+                job.state = RUNNING
+        for job in starting:
+            # Also for jobs paused before they ever ran (e.g. restored paused after a restart)
+            job.control.resume()
+            self._notify(job)
+            if job in resuming:
+                if self.job_store:
+                    self.job_store.set_job_state(job.id, RUNNING)
+            else:
+                threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+    def _set_state(self, job, state):
+        job.state = state
+        if self.job_store:
+            # Paused jobs come back paused; running ones are reset to pending on restart
+            self.job_store.set_job_state(job.id, state)
+        self._notify(job)
+
+    def _notify(self, job):
+        if self.on_update:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                logger.error("Error in job update callback: %s", e)
+
+    def _run_job(self, job):
+        with default_registry.job(job.id) as usage:
+            try:
+                self._download(job)
+            except Exception as e:
+                logger.error("Error running job %s: %s", job.id, e)
+                job.status = f"حدث خطأ: {str(e)}"
+                job.success = False
+            usage['success'] = job.success
+        if job.control.cancelled:
+            job.status = "تم إلغاء التحميل"
+            self._set_state(job, CANCELLED)
+        else:
+            job.status = "اكتمل التحميل بنجاح!" if job.success else "حدث خطأ أثناء التحميل."
+            self._set_state(job, DONE if job.success else FAILED)
+        self._dispatch()
+
+    def _download(self, job):
+        stored = self.job_store.get_job(job.id) if self.job_store else None
+        playlist_info = None
+        if stored and stored['playlist_dir']:
+            # Resumed job: the playlist was already looked up before the restart
+            job.playlist_title = stored['playlist_title']
+            job.total_videos = max(len(self.job_store.get_entries(job.id)), 1)
+            playlist_dir = stored['playlist_dir']
+        else:
+            try:
+                playlist_info = fetch_playlist_info(job.url, timing_callback=self.timing_callback, cache=self.metadata_cache)
+                is_playlist = playlist_info.is_playlist and playlist_info.title
+                job.playlist_title = playlist_info.title if is_playlist else "قائمة تشغيل"
+                job.total_videos = max(playlist_info.count, 1)
+            except Exception as e:
+                logger.error("Error fetching playlist details: %s", e)
+                job.playlist_title = "قائمة تشغيل"
+            playlist_dir = os.path.abspath(os.path.join(self.output_dir, job.playlist_title))
+            if self.job_store:
+                self.job_store.set_job_playlist(job.id, job.playlist_title, playlist_dir)
+        os.makedirs(playlist_dir, exist_ok=True)
+        self._notify(job)
+        if job.control.cancelled:
+            return
+        if self.job_store and job.state == RUNNING:
+            self.job_store.set_job_state(job.id, RUNNING)
+
+        def progress_callback(percent):
+            job.percent = percent
+            self._notify(job)
+
+        def status_callback(message):
+            job.status = message
+            self._notify(job)
+
+        downloader = YouTubeDownloader(
+            output_dir=playlist_dir,
+            prefix_index=job.prefix_index,
+            progress_callback=progress_callback,
+            status_callback=status_callback,
+            total_videos=job.total_videos,
+            playlist_title=job.playlist_title,
+            max_workers=self.max_workers,
+            job_store=self.job_store,
+            timing_callback=self.timing_callback,
+            metadata_cache=self.metadata_cache,
+            media_store=self.media_store,
+            http_engine=self.http_engine,
+            connections=self.connections,
+            audio_codec=self.audio_codec if job.format_type.startswith('bestaudio') else None,
+            control=job.control,
+            pool=self.pool,
+            limiter=self.limiter,
+            connection_limiter=self.connection_limiter,
+            format_policy=FormatPolicy(job.format_target, self.throughput) if job.format_target else None,
+            throughput=self.throughput,
+        )
+        job.success, job.output_dir, job.total_videos, job.playlist_title = downloader.download_playlist(
+            job.url, job.format_type, job_id=job.id if self.job_store else None, playlist_info=playlist_info
+        )
@@ -0,0 +1,152 @@
+import time
+from scheduler import PlaylistEntry
+from network import SessionYoutubeDL
+from metrics import YdlLogger, default_registry
+
+
+class PlaylistInfo:
+    def __init__(self, url, title=None, entries=None, is_playlist=False, elapsed=0.0):
+        self.url = url
+        self.title = title
+        self.entries = entries or []  # [PlaylistEntry, ...] in playlist order
+        self.is_playlist = is_playlist
+        self.elapsed = elapsed  # Seconds spent on the metadata pass
+
+    @property
+    def count(self):
+        return len(self.entries)
+
+
+class PlaylistStream:
+    """A playlist whose entries are paged in only as they are consumed."""
+
+    def __init__(self, url, title=None, entries=(), is_playlist=False, count=None, elapsed=0.0):
+        self.url = url
+        self.title = title
+        self.entries = entries  # Iterator of PlaylistEntry in playlist order, read once
+        self.is_playlist = is_playlist
+        self.count = count  # Entry count when the site reports it up front, else None
+        self.elapsed = elapsed  # Seconds until the first page was in
+
+
+def stream_playlist_info(url, timing_callback=None):
+    """
+    Streaming counterpart of fetch_playlist_info for very large playlists.
+    Only the first page is fetched here; later pages are requested as the
+    returned entries iterator is advanced, and no entry list is built, so
+    memory stays the same for 100 or 10,000 entries. Nothing is cached.
+    """
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'ignoreerrors': True,
+        'no_warnings': True,
+        'quiet': True,
+        'logger': YdlLogger(),
+    }
+    start = time.perf_counter()
+    ydl = SessionYoutubeDL(ydl_opts)
+    try:
+        info = ydl.extract_info(url, download=False, process=False)
+        if info and info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, process=False)
+    except BaseException:
+        ydl.close()
+        raise
+
+    if info and info.get('_type') in ('playlist', 'multi_video'):
+        def entries():
+            # The YoutubeDL has to outlive the generator: later pages are fetched through it
+            try:
+                index = 0
+                for entry in info.get('entries') or []:
+                    if not entry:
+                        continue
+                    index += 1
+                    yield PlaylistEntry(index, entry.get('url') or entry.get('webpage_url') or entry.get('id'), entry.get('title'))
+            finally:
+                ydl.close()
+
+        count = info.get('playlist_count')
+        if count is None and isinstance(info.get('entries'), list):
+            count = len(info['entries'])
+        playlist_info = PlaylistStream(url, info.get('title'), entries(), is_playlist=True, count=count)
+    elif not info:
+        ydl.close()
+        playlist_info = PlaylistStream(url, entries=iter(()), count=0)
+    else:
+        ydl.close()
+        entry = PlaylistEntry(1, info.get('webpage_url') or url, info.get('title'))
+        playlist_info = PlaylistStream(url, info.get('title'), iter([entry]), count=1)
+
+    playlist_info.elapsed = time.perf_counter() - start
+    default_registry.observe('ytdl_stage_seconds', playlist_info.elapsed, stage='listing')
+    if timing_callback:
+        timing_callback('metadata', playlist_info.elapsed)
+    return playlist_info
+
+
+def fetch_playlist_info(url, timing_callback=None, cache=None):
+    """
+    Single metadata pass shared by directory naming and the downloader.
+    Uses extract_info(process=False) so a playlist is paged through once and its
+    entries are never resolved individually here.
+    timing_callback(stage, seconds) is called with 'metadata' when done.
+    With a MetadataCache, a playlist listed in the last few minutes skips the pass entirely.
+    """
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'ignoreerrors': True,
+        'no_warnings': True,
+        'quiet': True,
+        'logger': YdlLogger(),
+    }
+    start = time.perf_counter()
+    cached = cache.get(url) if cache is not None else None
+    if cached is not None:
+        if cached.get('_type') == 'playlist':
+            entries = [PlaylistEntry(i + 1, entry['url'], entry.get('title')) for i, entry in enumerate(cached['entries'])]
+            playlist_info = PlaylistInfo(url, cached.get('title'), entries, is_playlist=True)
+        else:
+            entry = PlaylistEntry(1, cached.get('webpage_url') or url, cached.get('title'))
+            playlist_info = PlaylistInfo(url, cached.get('title'), [entry])
+        playlist_info.elapsed = time.perf_counter() - start
+        if timing_callback:
+            timing_callback('metadata', playlist_info.elapsed)
+        return playlist_info
+
+    with SessionYoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        # e.g. watch?v=...&list=... hands off to the playlist extractor
+        if info and info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, process=False)
+
+        if not info:
+            playlist_info = PlaylistInfo(url)
+        elif info.get('_type') in ('playlist', 'multi_video'):
+            entries = []
+            for entry in info.get('entries') or []:
+                if not entry:
+                    continue
+                entry_url = entry.get('url') or entry.get('webpage_url') or entry.get('id')
+                entries.append(PlaylistEntry(len(entries) + 1, entry_url, entry.get('title')))
+            playlist_info = PlaylistInfo(url, info.get('title'), entries, is_playlist=True)
+            if cache is not None:
+                cache.put(url, {
+                    '_type': 'playlist',
+                    'title': playlist_info.title,
+                    'entries': [{'url': entry.url, 'title': entry.title} for entry in entries],
+                }, ttl=cache.listing_ttl)  # New uploads must show up on the next run
+        else:
+            entry = PlaylistEntry(1, info.get('webpage_url') or url, info.get('title'))
+            playlist_info = PlaylistInfo(url, info.get('title'), [entry])
+            if cache is not None and info.get('_type', 'video') == 'video':
+                # The download step looks the same video up again; let it hit the cache
+                cache.put(url, ydl.sanitize_info(info))
+
+    playlist_info.elapsed = time.perf_counter() - start
+    default_registry.observe('ytdl_stage_seconds', playlist_info.elapsed, stage='listing')
+    if timing_callback:
+        timing_callback('metadata', playlist_info.elapsed)
+    return playlist_info
@@ -0,0 +1,283 @@
+"""
+Instrumentation: stage spans, hook and throughput histograms, per-job resource
+usage and yt-dlp's own log lines, collected in one process-wide Registry and
+exposed in the Prometheus text format (as a file or a local HTTP endpoint).
+An opt-in SamplingProfiler dumps folded stacks for flame graphs.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource  # Peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 1800)
+HOOK_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+RATE_BUCKETS = tuple(2 ** n * 1024 for n in range(6, 19, 2))  # 64 KiB/s .. 256 MiB/s
+
+# name -> (type, help)
+METRICS = {
+    'ytdl_stage_seconds': ('histogram', 'Time spent per pipeline stage'),
+    'ytdl_hook_calls_total': ('counter', 'Progress hook calls by status'),
+    'ytdl_hook_seconds': ('histogram', 'Time spent inside the progress hook'),
+    'ytdl_transfer_bytes_per_second': ('histogram', 'Average speed of each finished file'),
+    'ytdl_transfer_bytes_total': ('counter', 'Bytes of finished files'),
+    'ytdl_log_messages_total': ('counter', 'yt-dlp log lines by level'),
+    'ytdl_jobs_total': ('counter', 'Finished jobs by outcome'),
+    'ytdl_job_wall_seconds': ('gauge', 'Wall-clock time of a recent job'),
+    'ytdl_job_cpu_seconds': ('gauge', 'Process CPU time while a recent job ran (shared by overlapping jobs)'),
+    'ytdl_job_peak_rss_bytes': ('gauge', 'Process peak resident memory when a recent job finished'),
+}
+
+logger = logging.getLogger('ytdl')
+logger.addHandler(logging.NullHandler())  # Silent unless the app or CLI configures logging
+
+
+def configure_logging(log_file=None, file_level=logging.DEBUG, console_level=logging.ERROR):
+    """Errors to stderr (what yt-dlp printed before it had a logger); everything else to log_file."""
+    console = logging.StreamHandler()
+    console.setLevel(console_level)
+    console.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logger.addHandler(console)
+    level = console_level
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        handler = logging.FileHandler(log_file, encoding='utf-8')
+        handler.setLevel(file_level)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(threadName)s %(levelname)s %(message)s'))
+        logger.addHandler(handler)
+        level = min(level, file_level)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in pairs) + '}'
+
+
+class Registry:
+    """Thread-safe counters, gauges and histograms keyed by name and labels."""
+
+    def __init__(self, max_jobs=50):
+        self.max_jobs = max_jobs  # Per-job gauges kept for the most recent jobs only
+        self._values = {}  # (name, labels) -> number or Histogram
+        self._jobs = OrderedDict()  # job label -> None, oldest first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[self._key(name, labels)] = value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('ytdl_stage_seconds', time.perf_counter() - started, stage=stage)
+
+    @contextmanager
+    def job(self, job):
+        """Record wall time, CPU time and peak RSS of a job; outcome from the with-body."""
+        started, cpu_started = time.perf_counter(), time.process_time()
+        outcome = {'success': False}
+        try:
+            yield outcome
+        finally:
+            label = str(job)
+            self.set('ytdl_job_wall_seconds', time.perf_counter() - started, job=label)
+            self.set('ytdl_job_cpu_seconds', time.process_time() - cpu_started, job=label)
+            if resource is not None:
+                # ru_maxrss is KiB on Linux, bytes on macOS
+                scale = 1 if sys.platform == 'darwin' else 1024
+                self.set('ytdl_job_peak_rss_bytes', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, job=label)
+            self.inc('ytdl_jobs_total', outcome='success' if outcome['success'] else 'failure')
+            self._forget_old_jobs(label)
+
+    def _forget_old_jobs(self, label):
+        with self._lock:
+            self._jobs[label] = None
+            self._jobs.move_to_end(label)
+            while len(self._jobs) > self.max_jobs:
+                old, _ = self._jobs.popitem(last=False)
+                for key in [key for key in self._values if ('job', old) in key[1]]:
+                    del self._values[key]
+
+    def render(self):
+        """The Prometheus text exposition format."""
+        with self._lock:
+            by_name = {}
+            for (name, labels), value in sorted(self._values.items()):
+                by_name.setdefault(name, []).append((labels, value))
+            lines = []
+            for name, samples in by_name.items():
+                kind, help_text = METRICS.get(name, ('untyped', name))
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    if isinstance(value, Histogram):
+                        cumulative = 0
+                        for bound, count in zip(value.buckets, value.counts):
+                            cumulative += count
+                            lines.append(f'{name}_bucket{format_labels(labels, le=bound)} {cumulative}')
+                        lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} {value.count}')
+                        lines.append(f'{name}_sum{format_labels(labels)} {value.sum}')
+                        lines.append(f'{name}_count{format_labels(labels)} {value.count}')
+                    else:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write a textfile-collector file atomically, so a scraper never reads half of it."""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics on a daemon thread; returns the server (call shutdown() to stop)."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+default_registry = Registry()
+
+
+class YdlLogger:
+    """
+    yt-dlp 'logger' that forwards to the 'ytdl' logging logger instead of
+    dropping everything, and counts warnings and errors.
+    """
+
+    def __init__(self, registry=None, log=None):
+        self.registry = registry or default_registry
+        self.log = log or logger
+
+    def debug(self, message):
+        # yt-dlp sends both debug and screen output here; debug lines carry a prefix
+        self.log.debug(message[len('[debug] '):] if message.startswith('[debug] ') else message)
+
+    def info(self, message):
+        self.log.info(message)
+
+    def warning(self, message):
+        self.registry.inc('ytdl_log_messages_total', level='warning')
+        self.log.warning(message)
+
+    def error(self, message):
+        self.registry.inc('ytdl_log_messages_total', level='error')
+        self.log.error(message)
+
+
+class SamplingProfiler:
+    """
+    Opt-in statistical profiler: a daemon thread samples every thread's stack
+    each interval seconds. dump() writes folded stacks ('a;b;c count' per line),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)).split(' ')[0])
+                self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
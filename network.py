@@ -0,0 +1,344 @@
+"""
+Process-wide network session shared by every YoutubeDL the app creates.
+
+A YoutubeDL is built for each entry, which used to mean a fresh urllib opener
+(one TCP/TLS handshake and DNS lookup per request, no keep-alive), a freshly
+sorted table of ~1800 extractors, and YouTube's player JS downloaded again for
+every video. SessionYoutubeDL keeps the per-entry instance (its params, hooks
+and counters are per job and it is not thread-safe) but takes everything that
+can be shared from one NetworkSession: requests go through the keep-alive
+ConnectionPool with its DNS cache (or an HTTP/2 transport when httpx and h2 are
+installed), and extractors share the extractor table and player caches.
+
+Some of this leans on yt-dlp internals (private networking helpers, YoutubeDL._ies,
+YoutubeIE's player caches), checked against the version pinned in
+requirements.txt. When a yt-dlp upgrade moves them, each piece switches itself
+off and yt-dlp's stock handlers and per-instance caches are used instead.
+"""
+import io
+import ssl
+import threading
+import http.client
+import urllib.request
+from collections import OrderedDict
+from email.message import Message
+from functools import partial
+from urllib.parse import urljoin, urlsplit
+import yt_dlp
+from yt_dlp.networking.common import Features, RequestHandler, Response
+from yt_dlp.networking.exceptions import (
+    CertificateVerifyError, HTTPError, IncompleteRead, RequestError, SSLError, TransportError, UnsupportedRequest,
+)
+from yt_dlp.utils.networking import normalize_url
+from segmented import REDIRECTS, default_pool
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx only speaks HTTP/2 with it installed
+except ImportError:
+    httpx = None
+
+try:
+    from yt_dlp.networking._helper import add_accept_encoding_header, get_redirect_method
+    from yt_dlp.networking._urllib import SUPPORTED_ENCODINGS, HTTPHandler
+    DECODERS = {'gzip': HTTPHandler.gz, 'deflate': HTTPHandler.deflate, 'br': HTTPHandler.brotli}
+except (ImportError, AttributeError):
+    DECODERS = None  # Private helpers moved: leave requests to yt-dlp's own handlers
+
+MAX_REDIRECTS = 10
+
+
+class BoundedCache(OrderedDict):
+    """Dict that forgets its oldest entries beyond maxsize; safe to share between threads."""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            while len(self) > self.maxsize:
+                self.popitem(last=False)
+
+
+class NetworkSession:
+    """Connections, DNS answers, the extractor table and player caches, shared across jobs and threads."""
+
+    def __init__(self, pool=None, http2=True, players=4, player_results=4096):
+        self.pool = pool or default_pool
+        self.transport = None  # httpx HTTP/2 transport for https when available
+        if http2 and httpx is not None:
+            self.transport = httpx.HTTPTransport(http2=True, verify=self.pool.ssl_context, retries=1)
+        self.code_cache = BoundedCache(players)  # player ID -> player JS (a few MB each)
+        self.player_cache = BoundedCache(player_results)  # Signature/nsig functions and decoded values
+        self.extractors = {}  # allowed_extractors -> [(ie_key, class, is_instance)] in match order
+
+    def share_caches(self, ie):
+        # YoutubeIE keeps the player JS and the functions derived from it per instance,
+        # i.e. per YoutubeDL; they only change when YouTube ships a new player
+        if not all(isinstance(getattr(ie, name, None), dict) for name in ('_code_cache', '_player_cache')):
+            return  # Not YouTube, or yt-dlp changed how it caches players
+        if ie._player_cache is not self.player_cache:
+            ie._code_cache = self.code_cache
+            ie._player_cache = self.player_cache
+
+    def stats(self):
+        dns = self.pool.dns
+        return {
+            'connections_created': self.pool.created,
+            'connections_reused': self.pool.reused,
+            'dns_hits': dns.hits if dns else None,
+            'dns_misses': dns.misses if dns else None,
+            'http2': self.transport is not None,
+            'players_cached': len(self.code_cache),
+        }
+
+    def close(self):
+        self.pool.close()
+        if self.transport is not None:
+            self.transport.close()
+
+
+default_session = NetworkSession()
+
+
+class PooledResponse(Response):
+    """Response over a pooled connection; the connection goes back to the pool once the body is read."""
+
+    def __init__(self, session, key, conn, response, url, body=None):
+        super().__init__(
+            fp=io.BytesIO(body) if body is not None else response, url=url,
+            headers=response.headers, status=response.status, reason=response.reason,
+        )
+        self._session = session
+        self._key = key
+        self._conn = conn
+        self._response = response
+        if body is not None:
+            self._release()
+
+    def _release(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            reusable = self._response.isclosed() and not self._response.will_close
+            self._session.pool.release(self._key, conn, reusable)
+
+    def read(self, amt=None):
+        try:
+            data = self.fp.read(amt)
+        except http.client.IncompleteRead as e:
+            raise IncompleteRead(partial=len(e.partial), expected=e.expected, cause=e) from e
+        except Exception as e:
+            raise TransportError(cause=e) from e
+        if not data or self._response.isclosed():
+            self._release()
+        return data
+
+    def close(self):
+        self._release()  # Unread body: the connection is closed, not reused
+        return super().close()
+
+
+class Http2Response(Response):
+    def __init__(self, response, url):
+        headers = Message()  # Keeps repeated headers such as Set-Cookie apart
+        for name, value in response.headers.multi_items():
+            headers[name] = value
+        super().__init__(
+            fp=response, url=url, headers=headers, status=response.status_code, reason=response.reason_phrase,
+        )
+        self._chunks = response.iter_bytes()
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def read(self, amt=None):
+        try:
+            while amt is None or len(self._buffer) < amt:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._buffer += chunk
+        except Exception as e:
+            raise TransportError(cause=e) from e
+        if amt is None:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+
+class CookieResponse:
+    """What CookieJar.extract_cookies needs from a response."""
+
+    def __init__(self, headers):
+        self._headers = headers
+
+    def info(self):
+        return self._headers
+
+
+class SessionRH(RequestHandler):
+    """
+    yt-dlp request handler on the process-wide NetworkSession: keep-alive
+    connections shared by every YoutubeDL, or HTTP/2 with httpx installed.
+    Proxies, client certificates, disabled verification, legacy SSL and
+    streamed request bodies are left to yt-dlp's own handlers.
+    """
+
+    _SUPPORTED_URL_SCHEMES = ('http', 'https')
+    _SUPPORTED_PROXY_SCHEMES = ()
+    _SUPPORTED_FEATURES = (Features.NO_PROXY,)
+    RH_NAME = 'session'
+
+    def __init__(self, *, session=None, **kwargs):
+        super().__init__(**kwargs)
+        self.session = session or default_session
+
+    def _check_extensions(self, extensions):
+        super()._check_extensions(extensions)
+        extensions.pop('cookiejar', None)
+        extensions.pop('timeout', None)
+        if extensions.pop('legacy_ssl', None):
+            raise UnsupportedRequest('legacy SSL is not supported')
+
+    def _validate(self, request):
+        super()._validate(request)
+        if self.source_address or not self.verify or any(self._client_cert.values()) or self.legacy_ssl_support:
+            raise UnsupportedRequest('the shared session only makes default connections')
+        if request.data is not None and not isinstance(request.data, bytes):
+            raise UnsupportedRequest('only bytes request bodies are supported')
+
+    def _send(self, request):
+        headers = self._merge_headers(request.headers)
+        add_accept_encoding_header(headers, SUPPORTED_ENCODINGS)
+        cookiejar = self._get_cookiejar(request)
+        timeout = self._calculate_timeout(request)
+        method, url, data = request.method, normalize_url(request.url), request.data
+        explicit_cookie = 'Cookie' in headers
+
+        for _ in range(MAX_REDIRECTS + 1):
+            if not explicit_cookie:
+                # Per hop, so cookies set by a redirect response are sent to its target
+                drop_headers(headers, 'Cookie')
+                cookie = cookiejar.get_cookie_header(url)
+                if cookie:
+                    headers['Cookie'] = cookie
+            response = self._exchange(method, url, dict(headers), data, timeout)
+            cookiejar.extract_cookies(CookieResponse(response.headers), urllib.request.Request(url))
+            location = response.get_header('Location')
+            if response.status not in REDIRECTS or not location:
+                break
+            response.close()
+            new_method = get_redirect_method(method, response.status)
+            if new_method != method:
+                data = None
+                drop_headers(headers, 'Content-Type', 'Content-Length')
+            # Location is latin-1 on the wire but usually meant as UTF-8
+            new_url = normalize_url(urljoin(url, location.encode('iso-8859-1').decode()))
+            if urlsplit(new_url).netloc != urlsplit(url).netloc:
+                drop_headers(headers, 'Authorization')
+                explicit_cookie = False  # Credentials set for one host never follow to another
+            method, url = new_method, new_url
+        else:
+            raise HTTPError(response, redirect_loop=True)
+
+        if not 200 <= response.status < 300:
+            raise HTTPError(response)
+        return response
+
+    def _exchange(self, method, url, headers, data, timeout):
+        if self.session.transport is not None and url.startswith('https:'):
+            return self._exchange_http2(method, url, headers, data, timeout)
+        try:
+            key, conn, response = self.session.pool.request(method, url, headers, data, timeout)
+        except ssl.SSLCertVerificationError as e:
+            raise CertificateVerifyError(cause=e) from e
+        except ssl.SSLError as e:
+            raise SSLError(cause=e) from e
+        except (http.client.InvalidURL, ValueError) as e:
+            raise RequestError(cause=e) from e
+        except (http.client.HTTPException, OSError) as e:
+            raise TransportError(cause=e) from e
+
+        encodings = [e.strip() for e in response.getheader('Content-Encoding', '').split(',') if e.strip()]
+        body = None
+        if any(encoding in DECODERS for encoding in encodings) or not 200 <= response.status < 300:
+            # Compressed pages and error bodies are small: read them now and free the connection
+            try:
+                body = response.read()
+                for encoding in reversed(encodings):
+                    if encoding in SUPPORTED_ENCODINGS:
+                        body = DECODERS[encoding](body)
+            except Exception as e:
+                conn.close()
+                raise TransportError(cause=e) from e
+        return PooledResponse(self.session, key, conn, response, url, body)
+
+    def _exchange_http2(self, method, url, headers, data, timeout):
+        request = httpx.Request(method, url, headers=headers, content=data, extensions={
+            'timeout': {'connect': timeout, 'read': timeout, 'write': timeout, 'pool': timeout},
+        })
+        try:
+            response = self.session.transport.handle_request(request)
+        except httpx.ConnectError as e:
+            if 'CERTIFICATE_VERIFY_FAILED' in str(e):
+                raise CertificateVerifyError(cause=e) from e
+            raise TransportError(cause=e) from e
+        except httpx.TransportError as e:
+            raise TransportError(cause=e) from e
+        return Http2Response(response, url)
+
+
+def drop_headers(headers, *names):
+    for name in names:
+        if name in headers:
+            del headers[name]
+
+
+def prefer_session(rh, request):
+    return 200 if isinstance(rh, SessionRH) else 0
+
+
+class SessionMixin:
+    """YoutubeDL that draws its network handling and shared caches from a NetworkSession."""
+
+    session = default_session
+
+    def add_default_info_extractors(self):
+        # yt-dlp matches ~1800 extractors against allowed_extractors for every new
+        # YoutubeDL (a fifth of a second); the result only depends on that option
+        allowed = tuple(self.params.get('allowed_extractors') or ['default'])
+        table = self.session.extractors.get(allowed)
+        if table is None:
+            super().add_default_info_extractors()
+            if not isinstance(getattr(self, '_ies', None), dict):
+                return  # yt-dlp keeps its extractor table elsewhere now; nothing to share
+            self.session.extractors[allowed] = [
+                (ie_key, ie if isinstance(ie, type) else type(ie), not isinstance(ie, type))
+                for ie_key, ie in self._ies.items()
+            ]
+            return
+        for ie_key, ie, is_instance in table:
+            if is_instance:
+                self.add_info_extractor(ie())  # Instances are bound to their YoutubeDL
+            else:
+                self._ies[ie_key] = ie
+
+    def get_info_extractor(self, ie_key):
+        ie = super().get_info_extractor(ie_key)
+        self.session.share_caches(ie)
+        return ie
+
+    def build_request_director(self, handlers, preferences=None):
+        if DECODERS is None:
+            return super().build_request_director(handlers, preferences)
+        handlers = [*handlers, partial(SessionRH, session=self.session)]
+        return super().build_request_director(handlers, {*(preferences or ()), prefer_session})
+
+
+class SessionYoutubeDL(SessionMixin, yt_dlp.YoutubeDL):
+    pass
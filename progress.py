@@ -0,0 +1,132 @@
+import time
+import threading
+from metrics import logger
+
+
+DOWNLOADING = 'downloading'
+FINISHED = 'finished'
+ERROR = 'error'
+
+
+class ProgressEvent:
+    __slots__ = ('state', 'entry_index', 'filename', 'downloaded_bytes', 'total_bytes', 'speed', 'eta',
+                 'fragments_per_second', 'timestamp')
+
+    def __init__(self, state, entry_index, filename=None, downloaded_bytes=0, total_bytes=None, speed=None, eta=None,
+                 fragments_per_second=None):
+        self.state = state
+        self.entry_index = entry_index  # 1-based playlist position
+        self.filename = filename
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+        self.speed = speed  # bytes/s
+        self.eta = eta  # seconds
+        self.fragments_per_second = fragments_per_second  # HLS/DASH only
+        self.timestamp = time.monotonic()
+
+    @classmethod
+    def from_hook(cls, d, entry_index):
+        """Build an event from a yt-dlp progress_hooks dict."""
+        return cls(
+            d['status'],
+            entry_index,
+            filename=d.get('filename'),
+            downloaded_bytes=d.get('downloaded_bytes') or 0,
+            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+            speed=d.get('speed'),
+            eta=d.get('eta'),
+            fragments_per_second=d.get('fragments_per_second'),
+        )
+
+    @property
+    def fraction(self):
+        if self.state == FINISHED:
+            return 1.0
+        if not self.total_bytes:
+            return 0.0
+        return min(self.downloaded_bytes / self.total_bytes, 1.0)
+
+
+class ProgressAggregator:
+    """
+    Turns per-entry events into one overall percentage for a job.
+    Only entries in flight are tracked; finished ones are just counted.
+    An entry's progress never goes backwards, e.g. when the audio file of a
+    video+audio pair starts and the entry's total grows.
+    """
+
+    def __init__(self, total_videos=1):
+        self.total_videos = max(total_videos, 1)
+        self.finished = 0
+        self._files = {}  # entry_index -> {filename: (downloaded_bytes, total_bytes)}
+        self._fractions = {}  # entry_index -> highest fraction reported so far
+        self._lock = threading.Lock()
+
+    def update(self, event):
+        with self._lock:
+            if event.total_bytes:
+                files = self._files.setdefault(event.entry_index, {})
+                files[event.filename] = (event.downloaded_bytes, event.total_bytes)
+                downloaded = sum(entry_bytes for entry_bytes, _ in files.values())
+                total = sum(entry_total for _, entry_total in files.values())
+                fraction = min(downloaded / total, 1.0)
+                self._fractions[event.entry_index] = max(fraction, self._fractions.get(event.entry_index, 0.0))
+
+    def finish_entry(self, entry_index):
+        with self._lock:
+            self._files.pop(entry_index, None)
+            self._fractions.pop(entry_index, None)
+            self.finished += 1
+
+    def percent(self):
+        with self._lock:
+            done = self.finished + sum(self._fractions.values())
+        return min(int(done * 100 / self.total_videos), 100)
+
+
+class ProgressPublisher:
+    """
+    Coalescing publisher: delivers at most max_rate updates per second and drops
+    intermediate frames, always keeping the newest one. State changes (finished,
+    error) are delivered immediately.
+    """
+
+    def __init__(self, max_rate=10):
+        self.interval = 1.0 / max_rate if max_rate else 0.0
+        self.published = 0  # Events received
+        self.delivered = 0  # Events passed to subscribers
+        self._subscribers = []
+        self._pending = None
+        self._last_delivery = 0.0
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, event):
+        with self._lock:
+            self.published += 1
+            now = time.monotonic()
+            if event.state == DOWNLOADING and now - self._last_delivery < self.interval:
+                self._pending = event  # Newer frame replaces the undelivered one
+                return
+            self._pending = None
+            self._last_delivery = now
+            self.delivered += 1
+        self._deliver(event)
+
+    def flush(self):
+        with self._lock:
+            event, self._pending = self._pending, None
+            if event is None:
+                return
+            self._last_delivery = time.monotonic()
+            self.delivered += 1
+        self._deliver(event)
+
+    def _deliver(self, event):
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error("Error in progress subscriber: %s", e)
@@ -0,0 +1,441 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from yt_dlp.utils import DownloadCancelled
+from jobstore import DONE
+from metrics import default_registry, logger
+
+
+class PlaylistEntry:
+    __slots__ = ('index', 'url', 'title')
+
+    def __init__(self, index, url, title=None):
+        self.index = index  # 1-based position in the playlist
+        self.url = url
+        self.title = title
+
+
+class EntryResult:
+    # One per playlist entry, so no per-instance __dict__
+    __slots__ = ('index', 'url', 'title', 'success', 'filepath', 'error', 'elapsed', 'timings', 'paused', 'format')
+
+    def __init__(self, entry):
+        self.index = entry.index
+        self.url = entry.url
+        self.title = entry.title
+        self.success = False
+        self.filepath = None
+        self.error = None
+        self.elapsed = 0.0
+        self.timings = {}  # Stage -> seconds, for pipelined entries (e.g. audio transcodes)
+        self.paused = False  # Stopped by a pause; its .part is kept for the next attempt
+        self.format = None  # FormatPolicy report: chosen format vs the plain format string's pick
+
+
+class JobCancelled(DownloadCancelled):
+    msg = 'The job was cancelled'
+
+
+class JobPaused(DownloadCancelled):
+    msg = 'The job was paused'
+
+
+class JobControl:
+    """
+    Cancel/pause switches and priority for one job.
+    Progress hooks call check(), so a running download stops at its next chunk;
+    yt-dlp re-raises DownloadCancelled instead of swallowing it under ignoreerrors.
+    """
+
+    def __init__(self, priority=0):
+        self.priority = priority  # Higher runs first
+        self._cancelled = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._resumed.set()  # Wake a paused job so it can wind down
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+        if self.paused:
+            raise JobPaused()
+
+    def wait_resumed(self):
+        """Block while paused; returns False if the job was cancelled instead."""
+        self._resumed.wait()
+        return not self.cancelled
+
+
+class BandwidthLimiter:
+    """
+    Global bandwidth cap shared by every worker.
+    yt-dlp calls progress hooks from inside its read loop, so sleeping in a hook
+    throttles the download that produced the bytes.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate  # bytes/s
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def consume(self, nbytes):
+        if not self.rate or nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next_slot = max(self._next_slot, now) + nbytes / self.rate
+            delay = self._next_slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ConnectionLimiter:
+    """
+    Global cap on open connections shared by every job.
+    Waiters with a higher priority are served first.
+    """
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self._available = self.limit
+        self._waiting = []  # Priorities of blocked acquire() calls
+        self._condition = threading.Condition()
+
+    def acquire(self, count=1, priority=0):
+        count = min(max(1, count), self.limit)
+        with self._condition:
+            self._waiting.append(priority)
+            try:
+                self._condition.wait_for(lambda: self._available >= count and priority >= max(self._waiting))
+            finally:
+                self._waiting.remove(priority)
+                self._condition.notify_all()  # The next priority level may be unblocked now
+            self._available -= count
+        return count
+
+    def release(self, count):
+        with self._condition:
+            self._available += count
+            self._condition.notify_all()
+
+
+class PriorityPool:
+    """
+    Worker pool that can be shared by several jobs.
+    Higher priority tasks start first; equal priorities run in submission order.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max(1, max_workers)
+        self._queue = []  # heap of (-priority, seq, future, fn, args)
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+
+    def submit(self, fn, *args, priority=0):
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            heapq.heappush(self._queue, (-priority, next(self._seq), future, fn, args))
+            if len(self._queue) > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker, daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._condition.notify()
+        return future
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                self._idle += 1
+                while not self._queue and not self._shutdown:
+                    self._condition.wait()
+                self._idle -= 1
+                if not self._queue:
+                    return  # Shut down and drained
+                _, _, future, fn, args = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait=True):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class PlaylistScheduler:
+    def __init__(self, downloader, max_workers=1, rate_limit=None, job_store=None, job_id=None,
+                 pool=None, limiter=None, connections=None, control=None):
+        self.downloader = downloader  # YouTubeDownloader that owns counters and callbacks
+        self.max_workers = max(1, max_workers or 1)  # Entries of this job in flight at once
+        self.limiter = limiter or (BandwidthLimiter(rate_limit) if rate_limit else None)
+        self.job_store = job_store  # Optional JobStore that persists per-entry state
+        self.job_id = job_id
+        self.pool = pool  # Shared PriorityPool (a private one is used when None)
+        self.connections = connections  # Optional ConnectionLimiter shared across jobs
+        self.control = control  # Optional JobControl for cancel/pause/priority
+
+    @property
+    def priority(self):
+        return self.control.priority if self.control is not None else 0
+
+    def run(self, entries, format_type, on_result=None):
+        """
+        Download every entry on a bounded worker pool.
+        entries can be any iterable, e.g. a generator that pages a playlist in;
+        it is read only as fast as workers free up.
+        Returns a list of EntryResult in playlist order. With on_result, each
+        result goes to on_result(result) as it finishes and nothing is kept,
+        so memory does not grow with the playlist; a cancel then stops reading
+        entries instead of marking the rest of the playlist cancelled.
+        """
+        results = []
+        emit = on_result or results.append
+        finished = self._finished_entries()
+
+        def pending():
+            for entry in entries:
+                if entry.index in finished:
+                    # Finished before a restart and still on disk: nothing to fetch
+                    result = EntryResult(entry)
+                    result.success = True
+                    result.filepath = finished[entry.index]
+                    emit(result)
+                    self.downloader.mark_finished(entry.index)
+                else:
+                    yield entry
+
+        pool = self.pool or PriorityPool(self.max_workers)
+        try:
+            self._run_pending(pool, pending(), format_type, emit, drain=on_result is None)
+        finally:
+            if pool is not self.pool:
+                pool.shutdown()
+        return sorted(results, key=lambda result: result.index)
+
+    def _run_pending(self, pool, pending, format_type, emit, drain=True):
+        # At most max_workers entries of this job are queued on the pool at once,
+        # so a long playlist never sits in front of other jobs' entries
+        requeued = []  # Heap of (index, entry) stopped by a pause; they go before new entries
+        running = {}  # Future -> PlaylistEntry
+        exhausted = False
+        while True:
+            control = self.control
+            if control is not None and control.cancelled:
+                for _, entry in requeued:
+                    emit(self._cancelled(entry))
+                requeued.clear()
+                if drain:
+                    for entry in pending:
+                        emit(self._cancelled(entry))
+                exhausted = True
+            elif control is not None and control.paused and not running:
+                control.wait_resumed()  # Everything in flight has stopped; hold the rest
+                continue
+            while len(running) < self.max_workers and not (control is not None and (control.paused or control.cancelled)):
+                if requeued:
+                    entry = heapq.heappop(requeued)[1]
+                else:
+                    entry = next(pending, None) if not exhausted else None
+                    if entry is None:
+                        exhausted = True
+                        break
+                running[pool.submit(self._download_entry, entry, format_type, priority=self.priority)] = entry
+            if not running:
+                if exhausted and not requeued:
+                    return
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry = running.pop(future)
+                result = future.result()
+                if result.paused:
+                    # Picked up again from its .part once the job is resumed
+                    heapq.heappush(requeued, (entry.index, entry))
+                else:
+                    emit(result)
+
+    def _cancelled(self, entry):
+        result = EntryResult(entry)
+        result.error = JobCancelled.msg
+        if self.job_store:
+            self.job_store.fail_entry(self.job_id, entry.index, result.error)
+        return result
+
+    def _finished_entries(self):
+        if not self.job_store:
+            return {}
+        return {
+            row['idx']: row['filepath'] for row in self.job_store.get_entries(self.job_id)
+            if row['state'] == DONE and row['filepath'] and os.path.exists(row['filepath'])
+        }
+
+    def _make_hook(self, entry):
+        last_bytes = {}  # filename -> downloaded_bytes seen on the previous callback
+
+        def hook(d):
+            if d['status'] == 'downloading':
+                if self.control is not None:
+                    self.control.check()
+                filename = d.get('filename')
+                downloaded_bytes = d.get('downloaded_bytes') or 0
+                if self.limiter:
+                    self.limiter.consume(downloaded_bytes - last_bytes.get(filename, 0))
+                last_bytes[filename] = downloaded_bytes
+                if self.job_store:
+                    self.job_store.update_progress(
+                        self.job_id, entry.index, d.get('tmpfilename'), downloaded_bytes,
+                        d.get('total_bytes') or d.get('total_bytes_estimate')
+                    )
+            self.downloader.progress_hook(d, entry_index=entry.index)
+
+        return hook
+
+    def _download_entry(self, entry, format_type):
+        result = EntryResult(entry)
+        start = time.monotonic()
+
+        # autonumber restarts for every YoutubeDL instance, so bake the playlist index in
+        prefix = self.downloader.index_prefix(entry.index) if self.downloader.prefix_index else ''
+        outtmpl = prefix + '%(title)s.%(ext)s'
+
+        transcoder = self.downloader.transcoder
+        # An MP3 and the untouched download of the same format are different objects
+        store_format = f"{format_type}:{transcoder.codec}" if transcoder else format_type
+        policy = self.downloader.format_policy
+        if policy is not None:
+            store_format += f"@{policy.target.max_seconds}:{policy.target.max_bytes}:{policy.target.max_height}"
+        media_store = self.downloader.media_store
+        record = media_store.lookup(entry.url, store_format) if media_store else None
+        if record is not None:
+            # Already downloaded for another playlist: link it instead of fetching it again
+            try:
+                result.filepath = media_store.materialize(record, os.path.join(self.downloader.output_dir, prefix + record.filename))
+                result.success = True
+            except OSError as e:
+                logger.error("Error linking stored entry %s: %s", entry.index, e)
+            if result.success:
+                return self._finish_entry(entry, result, start)
+
+        hook = self._make_hook(entry)
+        ydl_opts = self.downloader.build_ydl_opts(format_type, outtmpl=outtmpl, progress_hooks=[hook])
+        ydl_opts['noplaylist'] = True
+        if self.job_store:
+            self.job_store.start_entry(self.job_id, entry.index)
+
+        slots = 0
+        try:
+            if self.connections is not None:
+                wanted = self.downloader.connections if self.downloader.http_engine == 'segmented' else 1
+                slots = self.connections.acquire(wanted, priority=self.priority)
+            if self.control is not None:
+                self.control.check()
+            with self.downloader.ydl_class()(ydl_opts) as ydl:
+                if policy is not None:
+                    ydl.format_selector = policy.selector(ydl, format_type, lambda report: self._report_format(entry, result, report))
+                if transcoder:
+                    info = self._transcode_entry(ydl, entry, result, hook)
+                else:
+                    info = self.downloader.process_url(ydl, entry.url)
+            if info:
+                result.title = info.get('title', entry.title)
+                downloads = info.get('requested_downloads') or [{}]
+                result.filepath = downloads[-1].get('filepath')
+            # ignoreerrors swallows failures, so trust only a file that actually landed on disk
+            result.success = bool(result.filepath) and os.path.exists(result.filepath)
+            if not result.success:
+                result.error = "لم يتم تحميل الملف"
+            elif media_store:
+                filename = os.path.basename(result.filepath)
+                if prefix and filename.startswith(prefix):
+                    filename = filename[len(prefix):]  # Later playlists apply their own index
+                media_store.add(entry.url, store_format, result.filepath, format_id=info.get('format_id'), filename=filename)
+        except JobPaused:
+            result.paused = True
+            return result  # Not finished: stays pending in the job store
+        except JobCancelled as e:
+            result.error = str(e)
+        except Exception as e:
+            logger.error("Error downloading entry %s: %s", entry.index, e)
+            result.error = str(e)
+        finally:
+            if slots:
+                self.connections.release(slots)
+        return self._finish_entry(entry, result, start)
+
+    def _transcode_entry(self, ydl, entry, result, hook):
+        # Select the format without downloading, then stream it through ffmpeg in one pass
+        transcoder = self.downloader.transcoder
+        info = self.downloader.process_url(ydl, entry.url, download=False)
+        if not info:
+            return None
+        if not transcoder.can_stream(info):
+            # Fragmented or merged formats: regular download, then FFmpegExtractAudio
+            return ydl.process_ie_result(info, download=True)
+        filepath, result.timings = transcoder.transcode(
+            info, ydl.prepare_filename(info), transcoder.request_headers(ydl, info), progress_hook=hook
+        )
+        info['requested_downloads'] = [{'filepath': filepath}]
+        if result.timings['total']:
+            # Network and ffmpeg overlap here; record each stage's own time
+            default_registry.observe('ytdl_stage_seconds', result.timings['download'], stage='transfer')
+            default_registry.observe('ytdl_stage_seconds', result.timings['encode'], stage='postprocess')
+        if self.downloader.timing_callback:
+            for stage, seconds in result.timings.items():
+                self.downloader.timing_callback(f"audio_{stage}", seconds)
+        return info
+
+    def _report_format(self, entry, result, report):
+        result.format = report
+        chosen, baseline = report['chosen'], report['baseline']
+        if self.downloader.status_callback and baseline and chosen['format_id'] != baseline['format_id']:
+            size = f" (~{chosen['bytes'] / (1024 * 1024):.0f} MB)" if chosen['bytes'] else ""
+            self.downloader.status_callback(
+                f"الفيديو {entry.index}: الصيغة {chosen['format_id']}{size} بدلاً من {baseline['format_id']}"
+            )
+
+    def _finish_entry(self, entry, result, start):
+        result.elapsed = time.monotonic() - start
+        if self.job_store:
+            if result.success:
+                self.job_store.finish_entry(self.job_id, entry.index, result.filepath)
+            else:
+                self.job_store.fail_entry(self.job_id, entry.index, result.error)
+        if result.success:
+            if self.downloader.exporter is not None:
+                self.downloader.exporter.submit(result.filepath)  # Export while other entries download
+            self.downloader.mark_finished(entry.index)
+        elif self.downloader.status_callback and not (self.control is not None and self.control.cancelled):
+            self.downloader.status_callback(f"فشل تحميل الفيديو {entry.index} من {self.downloader.total_videos}")
+        return result
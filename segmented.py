@@ -0,0 +1,479 @@
+import os
+import ssl
+import json
+import time
+import socket
+import threading
+import http.client
+from urllib.parse import urlsplit, urljoin
+import yt_dlp
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.utils import DownloadCancelled
+
+
+REDIRECTS = (301, 302, 303, 307, 308)
+BLOCK_SIZE = 64 * 1024
+# Options the pooled connections don't implement; yt-dlp's own downloaders honour them
+STOCK_PARAMS = ('proxy', 'nocheckcertificate', 'source_address', 'http_chunk_size', 'ratelimit')
+
+
+def needs_stock_downloader(params):
+    return any(params.get(name) for name in STOCK_PARAMS)
+
+
+class DnsCache:
+    """
+    getaddrinfo results per (host, port), kept for ttl seconds. Every new
+    pooled connection to a CDN edge would otherwise pay a lookup.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # (host, port) -> (expires, addrinfo list)
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        with self._lock:
+            self.misses += 1
+            self._entries[(host, port)] = (now + self.ttl, addresses)
+        return addresses
+
+    def forget(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def create_connection(self, address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+        """Drop-in for socket.create_connection (HTTPConnection._create_connection)."""
+        host, port = address
+        error = None
+        for family, kind, proto, _, sockaddr in self.resolve(host, port):
+            sock = socket.socket(family, kind, proto)
+            try:
+                if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sockaddr)
+                return sock
+            except OSError as e:
+                error = e
+                sock.close()
+        self.forget(host, port)  # Every address failed; the host may have moved
+        raise error or OSError(f"no addresses for {host}")
+
+
+default_dns = DnsCache()
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections, reused across segments, files and jobs."""
+
+    def __init__(self, max_idle_per_host=8, timeout=20, verify=True, dns=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.dns = dns  # Optional DnsCache for new connections
+        self.ssl_context = ssl.create_default_context()
+        if not verify:
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.created = 0  # New connections, i.e. TCP/TLS handshakes paid
+        self.reused = 0
+        self._idle = {}  # (scheme, host, port) -> [connection, ...]
+        self._lock = threading.Lock()
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        if self.dns is not None:
+            conn._create_connection = self.dns.create_connection
+        return conn
+
+    def release(self, key, conn, reusable=True):
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle_per_host:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def request(self, method, url, headers, body=None, timeout=None):
+        """
+        One request without following redirects. Returns (key, connection, response);
+        hand the connection back with release() once the body is consumed.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        conn = self._acquire(key)
+        try:
+            response = self._send(conn, method, path, headers, body, timeout)
+        except (http.client.HTTPException, OSError):
+            # A pooled connection the server already closed; retry once on a fresh one
+            conn.close()
+            conn = self._acquire_new(key)
+            try:
+                response = self._send(conn, method, path, headers, body, timeout)
+            except BaseException:
+                conn.close()
+                raise
+        return key, conn, response
+
+    def _send(self, conn, method, path, headers, body, timeout):
+        timeout = timeout or self.timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        conn.timeout = timeout
+        conn.request(method, path, body=body, headers=headers)
+        return conn.getresponse()
+
+    def open(self, url, headers, max_redirects=5):
+        """
+        GET url following redirects. Returns (url, key, connection, response);
+        hand the connection back with release() once the body is consumed.
+        """
+        for _ in range(max_redirects + 1):
+            key, conn, response = self.request('GET', url, headers)
+            if response.status in REDIRECTS and response.getheader('Location'):
+                response.read()
+                self.release(key, conn)
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            return url, key, conn, response
+        raise IOError(f"too many redirects for {url}")
+
+    def _acquire_new(self, key):
+        with self._lock:
+            self._idle.pop(key, None)
+        return self._acquire(key)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+
+default_pool = ConnectionPool(dns=default_dns)
+
+
+class Segment:
+    __slots__ = ('start', 'position', 'end', 'retries')
+
+    def __init__(self, start, end, position=None):
+        self.start = start
+        self.position = start if position is None else position  # Next byte to fetch
+        self.end = end  # Exclusive
+        self.retries = 0
+
+    @property
+    def remaining(self):
+        return max(self.end - self.position, 0)
+
+
+def pwrite(fd, data, offset, lock):
+    if hasattr(os, 'pwrite'):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    else:
+        # Windows has no pwrite; serialize seek + write on the shared descriptor
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+
+
+class SegmentedTransfer:
+    """Fetches byte ranges of one file over several pooled connections."""
+
+    def __init__(self, fd, url, headers, fileno, segments, total, connections, min_split, retries, map_path):
+        self.fd = fd
+        self.url = url
+        self.headers = headers
+        self.fileno = fileno
+        self.segments = segments
+        self.total = total
+        self.connections = connections
+        self.min_split = min_split
+        self.retries = retries
+        self.map_path = map_path
+        self.error = None
+        self._pending = [segment for segment in segments if segment.remaining]
+        self._active = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def run(self):
+        workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(max(1, self.connections))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if self.error:
+            raise self.error
+
+    def save_map(self):
+        with self._lock:
+            state = {'total': self.total, 'segments': [[s.start, s.position, s.end] for s in self.segments]}
+        tmp_path = self.map_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.map_path)
+
+    def _next_segment(self):
+        with self._lock:
+            if self._pending:
+                segment = self._pending.pop(0)
+                self._active.add(segment)
+                return segment
+            # Nothing queued: split the segment furthest from done, i.e. the one lagging
+            candidates = [s for s in self._active if s.remaining >= 2 * self.min_split]
+            if not candidates:
+                return None
+            slow = max(candidates, key=lambda s: s.remaining)
+            middle = slow.position + slow.remaining // 2
+            segment = Segment(middle, slow.end)
+            slow.end = middle
+            self.segments.append(segment)
+            self._active.add(segment)
+            return segment
+
+    def _worker(self):
+        while self.error is None:
+            segment = self._next_segment()
+            if segment is None:
+                return
+            try:
+                self._fetch(segment)
+            except DownloadCancelled as e:
+                # Paused or cancelled from a progress hook: stop every worker, keep the segment map
+                with self._lock:
+                    self._active.discard(segment)
+                    self.error = e
+                return
+            except Exception as e:
+                with self._lock:
+                    self._active.discard(segment)
+                    segment.retries += 1
+                    if segment.retries > self.retries:
+                        self.error = e
+                        return
+                    self._pending.append(segment)
+                continue
+            with self._lock:
+                self._active.discard(segment)
+
+    def _fetch(self, segment):
+        with self._lock:
+            if segment.position >= segment.end:
+                return
+            headers = dict(self.headers, Range=f'bytes={segment.position}-{segment.end - 1}')
+        pool = self.fd.pool or default_pool
+        _, key, conn, response = pool.open(self.url, headers)
+        reusable = False
+        try:
+            if response.status != 206:
+                raise IOError(f"HTTP {response.status} for a range request")
+            while True:
+                with self._lock:
+                    limit = segment.end  # Shrinks if another worker took over our tail
+                if segment.position >= limit:
+                    break
+                chunk = response.read(min(BLOCK_SIZE, limit - segment.position))
+                if not chunk:
+                    raise IOError("connection closed before the segment was complete")
+                pwrite(self.fileno, chunk, segment.position, self._write_lock)
+                with self._lock:
+                    segment.position += len(chunk)
+                self.fd.report_bytes(len(chunk))
+            reusable = response.length == 0  # Stopped early after a split: the rest is still in flight
+        finally:
+            pool.release(key, conn, reusable)
+
+
+class SegmentedFD(FileDownloader):
+    """
+    Multi-connection HTTP downloader for progressive (non-fragmented) formats.
+    Splits the file into byte ranges fetched over N pooled keep-alive
+    connections, written into a preallocated .part file. A .segments map next to
+    it allows resuming; idle connections split the slowest remaining segment.
+    Reports through the regular yt-dlp progress hooks.
+    """
+
+    FD_NAME = 'segmented'
+
+    def __init__(self, ydl, params, pool=None):
+        super().__init__(ydl, params)
+        self.pool = pool
+        self.connections = params.get('segmented_connections') or 4
+        self.min_split = params.get('segmented_min_split') or 1024 * 1024
+        self._report_lock = threading.Lock()
+
+    @staticmethod
+    def can_download(info_dict, params):
+        protocol = info_dict.get('protocol') or urlsplit(info_dict.get('url', '')).scheme
+        return (protocol in ('http', 'https') and not info_dict.get('fragments')
+                and not params.get('external_downloader') and not needs_stock_downloader(params))
+
+    def _native(self, filename, info_dict):
+        fd = HttpFD(self.ydl, self.params)
+        for hook in self._progress_hooks:
+            if hook != self.report_progress:
+                fd.add_progress_hook(hook)
+        return fd.real_download(filename, info_dict)
+
+    def probe(self, url, headers):
+        """Returns (final_url, total_bytes, supports_ranges)."""
+        pool = self.pool or default_pool
+        url, key, conn, response = pool.open(url, dict(headers, Range='bytes=0-0'))
+        try:
+            if response.status == 206:
+                response.read()
+                content_range = response.getheader('Content-Range', '')
+                total = content_range.rpartition('/')[2]
+                pool.release(key, conn)
+                return url, int(total) if total.isdigit() else None, True
+            length = response.getheader('Content-Length')
+            conn.close()  # Don't drain a full 200 body just to reuse the socket
+            return url, int(length) if length and length.isdigit() else None, False
+        except Exception:
+            conn.close()
+            raise
+
+    def real_download(self, filename, info_dict):
+        headers = dict(info_dict.get('http_headers') or {})
+        headers.pop('Accept-Encoding', None)  # Byte ranges must address the raw body
+        cookie = self.ydl.cookiejar.get_cookie_header(info_dict['url'])
+        if cookie:
+            headers['Cookie'] = cookie
+
+        try:
+            url, total, ranged = self.probe(info_dict['url'], headers)
+        except Exception as e:
+            self.report_warning(f"Segmented download probe failed ({e}); using the native downloader")
+            return self._native(filename, info_dict)
+        if not ranged or not total or total < 2 * self.min_split:
+            return self._native(filename, info_dict)
+
+        tmpfilename = self.temp_name(filename)
+        map_path = tmpfilename + '.segments'
+        segments = self._load_map(map_path, tmpfilename, total) or self._split(total)
+
+        self._total = total
+        self._filename = filename
+        self._tmpfilename = tmpfilename
+        self._info_dict = info_dict
+        self._resumed = sum(s.position - s.start for s in segments)
+        self._downloaded = self._resumed
+        self._started = time.time()
+        self._last_map_save = time.monotonic()
+
+        fileno = os.open(tmpfilename, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+        try:
+            if os.fstat(fileno).st_size != total:
+                os.ftruncate(fileno, total)  # Preallocate so every segment writes in place
+            self._transfer = SegmentedTransfer(
+                self, url, headers, fileno, segments, total, self.connections,
+                self.min_split, self.params.get('retries', 10), map_path
+            )
+            try:
+                self._transfer.run()
+            finally:
+                self._transfer.save_map()  # Resume point, also after a pause
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            self.report_error(f"Segmented download failed: {e}")
+            return False
+        finally:
+            os.close(fileno)
+
+        os.remove(map_path)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - self._started,
+        }, info_dict)
+        return True
+
+    def _split(self, total):
+        count = max(1, min(self.connections, total // self.min_split))
+        size = total // count
+        bounds = [i * size for i in range(count)] + [total]
+        return [Segment(bounds[i], bounds[i + 1]) for i in range(count)]
+
+    def _load_map(self, map_path, tmpfilename, total):
+        if not (self.params.get('continuedl', True) and os.path.exists(map_path) and os.path.exists(tmpfilename)):
+            return None
+        try:
+            with open(map_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('total') != total:
+            return None  # The remote file changed; start over
+        return [Segment(start, end, position) for start, position, end in state['segments']]
+
+    def report_bytes(self, nbytes):
+        # Serialized so hooks (rate limiter, job store, UI) see one consistent stream
+        with self._report_lock:
+            self._downloaded += nbytes
+            now = time.time()
+            elapsed = now - self._started
+            fresh = self._downloaded - self._resumed
+            speed = fresh / elapsed if elapsed > 0 else None
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': self._downloaded,
+                'total_bytes': self._total,
+                'tmpfilename': self._tmpfilename,
+                'filename': self._filename,
+                'eta': (self._total - self._downloaded) / speed if speed else None,
+                'speed': speed,
+                'elapsed': elapsed,
+            }, self._info_dict)
+            if time.monotonic() - self._last_map_save >= 1:
+                self._last_map_save = time.monotonic()
+                self._transfer.save_map()
+
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that routes plain HTTP(S) formats through SegmentedFD."""
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if test or subtitle or name == '-' or not info.get('url') or not SegmentedFD.can_download(info, self.params):
+            return super().dl(name, info, subtitle=subtitle, test=test)
+        fd = SegmentedFD(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
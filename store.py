@@ -0,0 +1,167 @@
+import os
+import time
+import shutil
+import sqlite3
+import threading
+from cache import cache_key
+from export import file_digest
+from metrics import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    video_key TEXT NOT NULL,
+    format_type TEXT NOT NULL,
+    format_id TEXT,
+    digest TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (video_key, format_type)
+);
+CREATE INDEX IF NOT EXISTS media_digest ON media(digest);
+"""
+
+FICLONE = 0x40049409  # Linux reflink ioctl (btrfs, xfs, ...)
+
+
+def reflink(source, destination):
+    import fcntl
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def link_or_copy(source, destination):
+    """
+    Hardlink, else reflink, else a symlink (the only link that crosses
+    filesystems), else a real copy. Returns the method used.
+    """
+    try:
+        os.link(source, destination)
+        return 'hardlink'
+    except OSError:
+        pass
+    try:
+        reflink(source, destination)
+        return 'reflink'
+    except (OSError, ImportError):
+        if os.path.exists(destination):
+            os.remove(destination)
+    try:
+        os.symlink(os.path.abspath(source), destination)
+        return 'symlink'
+    except (OSError, NotImplementedError):
+        pass  # e.g. Windows without the symlink privilege
+    shutil.copy2(source, destination)
+    return 'copy'
+
+
+def device_of(path):
+    # The folder may not exist yet; its nearest existing parent is where it will live
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return os.stat(path).st_dev
+
+
+class MediaRecord:
+    __slots__ = ('video_key', 'format_type', 'format_id', 'digest', 'filename', 'size', 'path')
+
+    def __init__(self, video_key, format_type, format_id, digest, filename, size, path):
+        self.video_key = video_key
+        self.format_type = format_type
+        self.format_id = format_id
+        self.digest = digest
+        self.filename = filename  # Name the file was first downloaded under, without index prefix
+        self.size = size
+        self.path = path  # Object path inside the store
+
+
+class MediaStore:
+    """
+    Content-addressed local media store.
+    Every downloaded file is kept once under objects/<digest>; playlist folders
+    get hardlinks (or reflinks) to it. An in-memory index keyed by
+    (video ID, requested format) answers "do we already have this?" in O(1)
+    from the URL alone, before any extraction. Hardlinks can't cross
+    filesystems: with link_dir (where playlists are downloaded) on another
+    device, playlist folders get symlinks into the store, or copies where
+    symlinks aren't allowed.
+    """
+
+    def __init__(self, root, link_dir=None):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.cross_device = link_dir is not None and device_of(link_dir) != device_of(self.objects_dir)
+        if self.cross_device:
+            logger.warning(
+                "Media store %s is on another filesystem than %s: playlist folders get symlinks "
+                "(or full copies) instead of hardlinks, and new downloads are copied into the store",
+                self.root, os.path.abspath(link_dir)
+            )
+        self.hits = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._index = {}  # (video_key, format_type) -> MediaRecord
+        for row in self._conn.execute("SELECT video_key, format_type, format_id, digest, filename, size FROM media"):
+            record = MediaRecord(*row, path=self.object_path(row[3], row[4]))
+            if os.path.exists(record.path):
+                self._index[(record.video_key, record.format_type)] = record
+
+    def object_path(self, digest, filename):
+        ext = os.path.splitext(filename)[1]
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def lookup(self, url, format_type):
+        """O(1): the stored record for this video and requested format, or None."""
+        return self._index.get((cache_key(url), format_type))
+
+    def materialize(self, record, destination):
+        """Link a stored object to destination instead of downloading it again."""
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if os.path.exists(destination):
+            if os.path.samefile(record.path, destination):
+                return destination
+            os.remove(destination)
+        link_or_copy(record.path, destination)
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += record.size
+        return destination
+
+    def add(self, url, format_type, filepath, format_id=None, filename=None):
+        """
+        Adopt a freshly downloaded file: move it into the store (or drop it if
+        identical content is already there) and leave a link at filepath.
+        filename is the name to reuse for later playlists (default: the basename).
+        """
+        digest = file_digest(filepath)
+        filename = filename or os.path.basename(filepath)
+        object_path = self.object_path(digest, filename)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        size = os.path.getsize(filepath)
+
+        with self._lock:
+            if os.path.exists(object_path):
+                os.remove(filepath)  # Same bytes already stored under another video/format
+            else:
+                shutil.move(filepath, object_path)
+        link_or_copy(object_path, filepath)
+
+        record = MediaRecord(cache_key(url), format_type, format_id, digest, filename, size, object_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media (video_key, format_type, format_id, digest, filename, size, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (record.video_key, format_type, format_id, digest, filename, size, time.time())
+            )
+            self._index[(record.video_key, format_type)] = record
+        return record
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
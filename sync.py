@@ -0,0 +1,156 @@
+import os
+import json
+import time
+from cache import cache_key
+from metrics import logger
+
+INDEX_NAME = '.sync.json'
+
+
+class SyncPlan:
+    """Difference between a playlist's current flat listing and a folder's index."""
+
+    def __init__(self):
+        self.new = []  # PlaylistEntry not downloaded yet (or whose file is gone)
+        self.removed = []  # Index keys no longer in the playlist
+        self.moved = []  # (PlaylistEntry, old index) for entries whose position changed
+        self.renamed = 0  # Files renumbered in place
+        self.pruned = 0  # Files of removed entries deleted
+
+    @property
+    def unchanged(self):
+        return not (self.new or self.removed or self.moved)
+
+    def as_dict(self):
+        return {
+            'new': len(self.new),
+            'removed': len(self.removed),
+            'moved': len(self.moved),
+            'renamed': self.renamed,
+            'pruned': self.pruned,
+        }
+
+
+class SyncIndex:
+    """
+    Per-folder record of which playlist entries were downloaded and the file
+    each one produced, stored as .sync.json next to the files. Entries are
+    keyed by extractor and video ID (cache_key), so a playlist can be diffed
+    from its flat listing alone, without touching any video page or media URL.
+    """
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.path = os.path.join(self.folder, INDEX_NAME)
+        self.entries = {}  # key -> {'index', 'path', 'name', 'title', 'format_type', 'synced_at'}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f).get('entries', {})
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error("Error loading sync index: %s", e)
+
+    def save(self):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self.entries}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)  # A crash never leaves a half-written index
+        except OSError as e:
+            logger.error("Error saving sync index: %s", e)
+
+    def filepath(self, record):
+        return os.path.join(self.folder, record['path'])  # Absolute paths survive the join
+
+    def diff(self, entries, format_type):
+        plan = SyncPlan()
+        seen = set()
+        for entry in entries:
+            key = cache_key(entry.url)
+            seen.add(key)
+            record = self.entries.get(key)
+            if record is None or record['format_type'] != format_type or not os.path.exists(self.filepath(record)):
+                plan.new.append(entry)
+            elif record['index'] != entry.index:
+                plan.moved.append((entry, record['index']))
+        # Kept (unpruned) files of removed entries have no position and are only reported once
+        plan.removed = [key for key, record in self.entries.items() if key not in seen and record['index'] is not None]
+        return plan
+
+    def record(self, entry, filepath, format_type, prefix=''):
+        name = os.path.basename(filepath)
+        if prefix and name.startswith(prefix):
+            name = name[len(prefix):]  # Renumbering puts the current prefix back on
+        self.entries[cache_key(entry.url)] = {
+            'index': entry.index,
+            'path': self._relative(filepath),
+            'name': name,
+            'title': entry.title,
+            'format_type': format_type,
+            'synced_at': time.time(),
+        }
+
+    def renumber(self, entries, index_prefix):
+        """
+        Rename files whose prefix no longer matches their position, e.g. after
+        entries were inserted or reordered, or the count crossed 10 or 100.
+        index_prefix(index) gives the prefix for a position ('' = no prefix).
+        Goes through temporary names so two files can trade places.
+        """
+        renames = []
+        for entry in entries:
+            record = self.entries.get(cache_key(entry.url))
+            if record is None:
+                continue
+            source = self.filepath(record)
+            destination = os.path.join(os.path.dirname(source), index_prefix(entry.index) + record['name'])
+            record['index'] = entry.index
+            if source != destination and os.path.exists(source):
+                renames.append((record, source, destination))
+
+        staged = []
+        for n, (record, source, destination) in enumerate(renames):
+            tmp_path = os.path.join(os.path.dirname(source), f".sync-{n}-{record['name']}")
+            try:
+                os.replace(source, tmp_path)
+                staged.append((record, tmp_path, destination))
+            except OSError as e:
+                logger.error("Error renumbering %s: %s", source, e)
+        for record, tmp_path, destination in staged:
+            try:
+                os.replace(tmp_path, destination)
+                record['path'] = self._relative(destination)
+            except OSError as e:
+                logger.error("Error renumbering %s: %s", destination, e)
+                record['path'] = self._relative(tmp_path)
+        return len(staged)
+
+    def detach(self, keys):
+        """Keep the files of removed entries, so re-adding one costs nothing."""
+        for key in keys:
+            self.entries[key]['index'] = None
+
+    def prune(self, entries):
+        """Forget every indexed entry that is not in entries and delete its file."""
+        listed = {cache_key(entry.url) for entry in entries}
+        deleted = 0
+        for key in [key for key in self.entries if key not in listed]:
+            record = self.entries.pop(key)
+            try:
+                os.remove(self.filepath(record))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error("Error deleting %s: %s", record['path'], e)
+        return deleted
+
+    def _relative(self, path):
+        path = os.path.abspath(path)
+        inside = os.path.commonpath([path, self.folder]) == self.folder
+        return os.path.relpath(path, self.folder) if inside else path
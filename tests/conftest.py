@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The app is a flat set of modules next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import FixtureServer  # noqa: E402
+
+
+@pytest.fixture
+def fixture_server():
+    with FixtureServer() as server:
+        yield server
+
+
+@pytest.fixture
+def throttled_server():
+    # 1 MiB/s per connection: slow enough to pause a transfer halfway through
+    with FixtureServer(bytes_per_second=1024 * 1024) as server:
+        yield server
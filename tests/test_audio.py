@@ -0,0 +1,69 @@
+import logging
+import os
+import shutil
+import sys
+
+import pytest
+
+from audio import AudioTranscoder
+from downloader import YouTubeDownloader
+from scheduler import PlaylistEntry
+
+# Stands in for ffmpeg: "encodes" by copying stdin to the output file unchanged
+FAKE_FFMPEG = """#!{python}
+import shutil
+import sys
+
+if "-i" not in sys.argv:
+    print("ffmpeg version 0.0-fake")
+    sys.exit(0)
+with open(sys.argv[-1], "wb") as out:
+    shutil.copyfileobj(sys.stdin.buffer, out)
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ffmpeg = bin_dir / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ.get("PATH", ""))
+    return str(ffmpeg)
+
+
+def download_audio(server, output_dir, timings=None):
+    entries = [PlaylistEntry(i, server.add_file(f"audio{i}.m4a", 512 * 1024), f"audio{i}") for i in (1, 2)]
+    downloader = YouTubeDownloader(
+        str(output_dir), audio_codec="mp3", noprogress=True, max_workers=2,
+        timing_callback=(lambda stage, seconds: timings.append(stage)) if timings is not None else None
+    )
+    return downloader, downloader.download_entries(entries, "bestaudio/best")[0]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="the fake ffmpeg is a shebang script")
+def test_audio_is_streamed_through_ffmpeg(fixture_server, fake_ffmpeg, tmp_path):
+    assert shutil.which("ffmpeg") == fake_ffmpeg
+    timings = []
+    downloader, success = download_audio(fixture_server, tmp_path / "out", timings)
+    assert success
+    for result in downloader.results:
+        assert result.filepath.endswith(".mp3")
+        with open(result.filepath, "rb") as encoded, \
+                open(os.path.join(fixture_server.root, f"audio{result.index}.m4a"), "rb") as source:
+            assert encoded.read() == source.read()  # Every byte went through ffmpeg exactly once
+        assert not os.path.exists(result.filepath + ".part")
+    assert {"audio_download", "audio_encode", "audio_queue_wait", "audio_encoder_wait", "audio_total"} <= set(timings)
+
+
+def test_without_ffmpeg_the_original_audio_is_kept(fixture_server, tmp_path, monkeypatch, capsys, caplog):
+    monkeypatch.setattr(shutil, "which", lambda name: None)
+    assert not AudioTranscoder().available
+    with caplog.at_level(logging.WARNING, logger="ytdl"):
+        downloader, success = download_audio(fixture_server, tmp_path / "out")
+    assert success
+    assert downloader.transcoder is None
+    assert all(result.filepath.endswith(".m4a") for result in downloader.results)
+    assert "ffmpeg not found" in caplog.text
+    assert capsys.readouterr().out == ""  # stdout belongs to cli --jsonl
@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+
+from cache import EXPIRY_MARGIN, MetadataCache, cache_key, info_expiry, url_expiry
+from metadata import fetch_playlist_info
+
+
+def test_playlist_listing_uses_short_ttl(fixture_server):
+    url = fixture_server.add_playlist("channel", entries=3, size=1024)
+    cache = MetadataCache(listing_ttl=60)
+    assert len(fetch_playlist_info(url, cache=cache).entries) == 3
+    [entry] = cache._entries.values()
+    now = time.time()
+    assert now < entry["expires"] <= now + 60
+
+    cache.listing_ttl = 0
+    cache._entries.clear()
+    fetch_playlist_info(url, cache=cache)
+    assert cache.get(url) is None  # Already stale: never stored
+
+
+def test_url_expiry_reads_signed_urls():
+    assert url_expiry("https://rr1---sn-x.googlevideo.com/videoplayback?expire=1700000000&sig=x") == 1700000000
+    assert url_expiry("https://cdn.example.com/v.mp4?Expires=1700000001") == 1700000001
+    assert url_expiry("https://manifest.googlevideo.com/api/manifest/hls/expire/1700000002/id/x/file.m3u8") == 1700000002
+    amz = "https://bucket.s3.amazonaws.com/v.mp4?X-Amz-Date=20231114T221320Z&X-Amz-Expires=600"
+    assert url_expiry(amz) == 1700000000 + 600
+    assert url_expiry("https://example.com/video.mp4") is None
+
+
+def test_info_expiry_takes_the_earliest_format():
+    info = {"formats": [
+        {"url": "https://a.example.com/1?expire=2000000000"},
+        {"url": "https://a.example.com/2", "manifest_url": "https://a.example.com/m?expire=1900000000"},
+        {"url": "https://a.example.com/3?expire=notanumber"},
+    ]}
+    assert info_expiry(info) == 1900000000
+    assert info_expiry({"url": "https://a.example.com/plain"}) is None
+
+
+def test_cache_shares_entries_across_url_forms_and_honours_expiry(tmp_path):
+    assert cache_key("https://youtu.be/aaaaaaaaaaa") == cache_key("https://www.youtube.com/watch?v=aaaaaaaaaaa")
+    cache = MetadataCache(str(tmp_path / "cache.json"), max_entries=2)
+    cache.put("https://youtu.be/aaaaaaaaaaa", {"id": "a"})
+    assert cache.get("https://www.youtube.com/watch?v=aaaaaaaaaaa") == {"id": "a"}
+
+    # Signed URLs that expire within the margin are not worth keeping
+    soon = int(time.time() + EXPIRY_MARGIN / 2)
+    cache.put("https://youtu.be/bbbbbbbbbbb", {"id": "b", "url": f"https://cdn.example.com/b?expire={soon}"})
+    assert cache.get("https://youtu.be/bbbbbbbbbbb") is None
+
+    cache.put("https://youtu.be/ccccccccccc", {"id": "c"})
+    cache.put("https://youtu.be/ddddddddddd", {"id": "d"})  # Evicts a, the least recently used
+    assert cache.get("https://youtu.be/aaaaaaaaaaa") is None
+    assert cache.stats()["evictions"] == 1
+    cache.save()
+    assert MetadataCache(str(tmp_path / "cache.json")).get("https://youtu.be/ddddddddddd") == {"id": "d"}
+
+
+def test_concurrent_saves_leave_a_complete_file(tmp_path):
+    cache = MetadataCache(str(tmp_path / "cache.json"))
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                cache.put(f"https://example.com/{n}/{i}", {"id": f"{n}-{i}", "padding": "x" * 4096})
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    with open(tmp_path / "cache.json", encoding="utf-8") as f:
+        assert len(json.load(f)) == 160
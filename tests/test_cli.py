@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+import cli
+from metrics import logger
+
+
+@pytest.fixture(autouse=True)
+def restore_logger():
+    # main() adds a stderr handler on every call; don't let it outlive capsys
+    handlers, level, propagate = list(logger.handlers), logger.level, logger.propagate
+    yield
+    logger.handlers[:] = handlers
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+
+def run(capsys, *argv):
+    code = cli.main(list(argv))
+    out = capsys.readouterr().out
+    return code, [json.loads(line) for line in out.splitlines()]  # Every line must be an event
+
+
+def test_jsonl_playlist_download(fixture_server, tmp_path, capsys):
+    url = fixture_server.add_playlist("channel", entries=2, size=4096)
+    code, events = run(capsys, "--jsonl", "-o", str(tmp_path), "-f", "best", url)
+
+    assert code == cli.EXIT_OK
+    entries = [e for e in events if e["event"] == "entry"]
+    assert sorted(e["index"] for e in entries) == [1, 2]
+    assert all(e["success"] and os.path.getsize(e["filepath"]) == 4096 for e in entries)
+    assert events[-1]["event"] == "job" and events[-1]["success"] and events[-1]["url"] == url
+    assert {e["event"] for e in events} >= {"timing", "progress"}
+
+
+def test_jsonl_stream_reports_each_entry(fixture_server, tmp_path, capsys):
+    url = fixture_server.add_playlist("channel", entries=2, size=4096)
+    code, events = run(capsys, "--jsonl", "--stream", "-o", str(tmp_path), "-f", "best", url)
+
+    assert code == cli.EXIT_OK
+    assert events[-1]["event"] == "job" and events[-1]["success"]
+    assert sorted(e["index"] for e in events if e["event"] == "entry" and e["success"]) == [1, 2]
+
+
+def test_failed_url_sets_exit_code(fixture_server, tmp_path, capsys):
+    good = fixture_server.add_file("video.mp4", 1024)
+    code, events = run(capsys, "--jsonl", "-o", str(tmp_path), "-f", "best", good, f"{fixture_server.base_url}/missing.mp4")
+
+    assert code == cli.EXIT_FAILED
+    jobs = [e for e in events if e["event"] == "job"]
+    assert [job["success"] for job in jobs] == [True, False]
+
+
+@pytest.mark.parametrize("flag", ["--sync", "--export"])
+def test_stream_conflicts_with_sync_and_export(tmp_path, capsys, flag):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--stream", flag, "-o", str(tmp_path), "http://127.0.0.1/feed.xml"])
+    assert exc.value.code == 2
+    assert "--stream can't be combined" in capsys.readouterr().err
+
+
+def test_no_urls_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main([])
+    assert exc.value.code == 2
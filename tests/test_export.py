@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+import export
+from export import COPY_FILE_RANGE, READ_WRITE, RENAME, SENDFILE, ExportEngine
+
+SIZES = {"empty.mp4": 0, "small.mp4": 1000, "chunked.mp4": 5 * 64 * 1024 + 123}
+
+
+def make_sources(folder):
+    folder.mkdir()
+    contents = {}
+    for name, size in SIZES.items():
+        contents[name] = os.urandom(size)
+        (folder / name).write_bytes(contents[name])
+    return contents
+
+
+def check_exported(engine, results, destination, contents, source_dir):
+    assert all(result.success for result in results)
+    for name, data in contents.items():
+        assert (destination / name).read_bytes() == data
+        assert not (source_dir / name).exists()
+    assert not list(destination.glob("*.part"))
+    assert engine.stats()["bytes"] == sum(SIZES.values())
+
+
+def test_same_device_export_renames(tmp_path):
+    contents = make_sources(tmp_path / "src")
+    engine = ExportEngine(str(tmp_path / "dst"))
+    results = engine.export_directory(str(tmp_path / "src"))
+    engine.close()
+    check_exported(engine, results, tmp_path / "dst", contents, tmp_path / "src")
+    assert {result.method for result in results} == {RENAME}
+
+
+@pytest.fixture
+def cross_device(monkeypatch):
+    monkeypatch.setattr(export, "same_device", lambda path, directory: False)
+
+
+def test_cross_device_export_copies_chunks_in_parallel(tmp_path, cross_device):
+    contents = make_sources(tmp_path / "src")
+    engine = ExportEngine(str(tmp_path / "dst"), max_workers=3, chunk_workers=4, chunk_size=64 * 1024, verify_hash=True)
+    futures = [engine.submit(str(tmp_path / "src" / name)) for name in SIZES]  # As downloads finish
+    results = [future.result() for future in futures]
+    engine.close()
+    check_exported(engine, results, tmp_path / "dst", contents, tmp_path / "src")
+    methods = {result.source.rsplit(os.sep, 1)[1]: result.method for result in results}
+    assert methods["empty.mp4"] == READ_WRITE  # Nothing to hand to the kernel
+    if hasattr(os, "copy_file_range") or hasattr(os, "sendfile"):
+        # In-kernel copies whenever the OS has them, for one chunk or many
+        assert methods["small.mp4"] in (COPY_FILE_RANGE, SENDFILE)
+        assert methods["chunked.mp4"] == methods["small.mp4"]
+
+
+def test_cross_device_export_falls_back_to_read_write(tmp_path, cross_device, monkeypatch):
+    def unsupported(self, method, src_fd, dst_fd, offset, length):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(ExportEngine, "_copy_range", unsupported)
+    contents = make_sources(tmp_path / "src")
+    engine = ExportEngine(str(tmp_path / "dst"), chunk_size=64 * 1024)
+    results = engine.export_directory(str(tmp_path / "src"))
+    engine.close()
+    check_exported(engine, results, tmp_path / "dst", contents, tmp_path / "src")
+    assert {result.method for result in results} == {READ_WRITE}
+    assert engine._fast_methods() == []  # Failed kernel methods aren't retried for this destination
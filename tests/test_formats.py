@@ -0,0 +1,93 @@
+import yt_dlp
+
+from formats import FormatPolicy, FormatTarget, ThroughputModel, host_keys
+
+MB = 1024 * 1024
+
+
+def fmt(format_id, height=None, size=None, vcodec="avc1", acodec="none", host="cdn.example.com"):
+    return {
+        "format_id": format_id, "height": height, "filesize": size, "vcodec": vcodec, "acodec": acodec,
+        "url": f"https://{host}/{format_id}", "ext": "mp4", "tbr": (height or 0) / 10 or 128,
+    }
+
+
+FORMATS = [
+    fmt("audio", size=4 * MB, vcodec="none", acodec="mp4a"),
+    fmt("360", 360, 20 * MB),
+    fmt("720", 720, 60 * MB),
+    fmt("1080", 1080, 150 * MB),
+    fmt("720muxed", 720, 70 * MB, acodec="mp4a"),
+]
+
+
+def test_host_keys_fall_back_to_the_domain():
+    assert host_keys("https://rr3---sn-abc.googlevideo.com/videoplayback") == [
+        "rr3---sn-abc.googlevideo.com", "googlevideo.com"
+    ]
+    assert host_keys("http://127.0.0.1:8000/x") == ["127.0.0.1"]
+    # Unrelated sites under a public suffix don't share an estimate
+    assert host_keys("https://media.bbc.co.uk/x") == ["media.bbc.co.uk", "bbc.co.uk"]
+    assert host_keys("https://cdn.example.com.au/x") == ["cdn.example.com.au", "example.com.au"]
+    assert host_keys("https://bbc.co.uk/x") == ["bbc.co.uk"]
+    assert host_keys("https://example.com/x") == ["example.com"]
+    assert host_keys("") == []
+
+
+def test_throughput_model_learns_per_host(tmp_path):
+    model = ThroughputModel(str(tmp_path / "throughput.json"), alpha=0.5, default_rate=MB)
+    model.observe("https://a.cdn.example.com/1", 10 * MB, 1)
+    model.observe("https://a.cdn.example.com/2", 20 * MB, 1)
+    model.observe("https://a.cdn.example.com/3", 1024, 1)  # Too small to say anything
+    assert model.estimate("https://a.cdn.example.com/x") == 15 * MB
+    assert model.estimate("https://b.cdn.example.com/x") == 15 * MB  # Same domain
+    assert model.estimate("https://other.org/x") == MB
+    model.save()
+    assert ThroughputModel(str(tmp_path / "throughput.json")).estimate("https://a.cdn.example.com/x") == 15 * MB
+
+
+def test_policy_prefers_muxed_formats_within_the_target():
+    policy = FormatPolicy(FormatTarget(max_height=720))
+    assert policy.choose(FORMATS).spec == "720muxed"  # No merge pass at the same height
+    assert policy.choose(FORMATS, audio_only=True).spec == "audio"
+
+
+def test_policy_turns_sizes_into_time_with_the_throughput_model():
+    model = ThroughputModel(default_rate=MB)
+    policy = FormatPolicy(FormatTarget(max_seconds=90), model)
+    assert policy.choose(FORMATS).height == 720  # 1080p takes ~154 s at 1 MB/s
+    model.observe("https://cdn.example.com/x", 100 * MB, 10)
+    assert policy.choose(FORMATS).spec == "1080+audio"  # ~15 s at 10 MB/s
+
+
+def test_policy_takes_the_fastest_option_when_nothing_fits():
+    policy = FormatPolicy(FormatTarget(max_bytes=MB))
+    assert policy.choose(FORMATS).spec == "360+audio"
+
+
+def test_selector_reports_both_picks():
+    reports = []
+    policy = FormatPolicy(FormatTarget(max_bytes=30 * MB))
+    info = {"id": "x", "title": "x", "formats": [dict(f) for f in FORMATS], "webpage_url": "https://example.com/x"}
+    with yt_dlp.YoutubeDL({"quiet": True, "simulate": True}) as ydl:
+        ydl.format_selector = policy.selector(ydl, "bestvideo+bestaudio/best", reports.append)
+        result = ydl.process_ie_result(info, download=False)
+    assert result["format_id"] == "360+audio"
+    [report] = reports
+    assert report["chosen"]["fits"] and not report["baseline"]["fits"]
+    assert report["baseline"]["format_id"] == "1080+audio"
+
+
+def test_every_finished_download_feeds_the_throughput_model(fixture_server, tmp_path):
+    from downloader import YouTubeDownloader
+    from scheduler import PlaylistEntry
+
+    model = ThroughputModel(str(tmp_path / "throughput.json"), min_bytes=1)
+    entries = [PlaylistEntry(1, fixture_server.add_file("clip.mp4", 256 * 1024), "clip")]
+    downloader = YouTubeDownloader(str(tmp_path / "out"), noprogress=True, throughput=model)
+    assert downloader.format_policy is None
+    assert downloader.download_entries(entries, "best")[0]
+    assert model.stats()["127.0.0.1"]["samples"] == 1
+    assert ThroughputModel(str(tmp_path / "throughput.json")).estimate(fixture_server.base_url) == model.estimate(
+        fixture_server.base_url
+    )
@@ -0,0 +1,109 @@
+import glob
+import os
+import threading
+import time
+
+import pytest
+
+from fragments import FragmentPipelineMixin, FragmentYoutubeDL
+
+FRAGMENT = 64 * 1024
+
+
+def read(server, name):
+    with open(os.path.join(server.root, name), "rb") as f:
+        return f.read()
+
+
+def download(url, output_dir, **params):
+    opts = {
+        "quiet": True, "noprogress": True, "fixup": "never", "outtmpl": os.path.join(str(output_dir), "%(id)s.%(ext)s"),
+        "concurrent_fragment_downloads": 4, "fragment_retries": 2, "format": "best",
+    }
+    opts.update(params)
+    with FragmentYoutubeDL(opts) as ydl:
+        assert ydl.download([url]) == 0
+    [path] = [p for p in glob.glob(os.path.join(str(output_dir), "*")) if not p.endswith((".part", ".ytdl"))]
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """URLs passed to the pipeline's _get, in call order; set fail[url] to make the next fetches raise."""
+    calls = []
+    fail = {}
+    get = FragmentPipelineMixin._get
+
+    def recording_get(self, url, headers):
+        calls.append(url)
+        if fail.get(url):
+            fail[url] -= 1
+            raise ConnectionResetError("connection reset by peer")
+        return get(self, url, headers)
+
+    monkeypatch.setattr(FragmentPipelineMixin, "_get", recording_get)
+    return calls, fail
+
+
+def test_hls_fragments_are_appended_in_order(fixture_server, tmp_path, fetches):
+    url = fixture_server.add_hls("stream", fragments=12, fragment_size=FRAGMENT)
+    data = download(url, tmp_path)
+    assert data == b"".join(read(fixture_server, f"stream/seg{i}.ts") for i in range(12))
+    assert len(fetches[0]) == 12  # Each fragment fetched once
+    assert not glob.glob(str(tmp_path / "*.frag*"))  # Nothing written per fragment
+
+
+def test_dash_output_starts_with_the_init_segment(fixture_server, tmp_path, fetches):
+    url = fixture_server.add_dash("stream", fragments=6, fragment_size=FRAGMENT)
+    data = download(url, tmp_path)
+    expected = read(fixture_server, "stream/init.mp4") + b"".join(
+        read(fixture_server, f"stream/seg{i}.m4s") for i in range(6)
+    )
+    assert data == expected
+
+
+def test_a_failed_fragment_is_retried_on_its_own(fixture_server, tmp_path, fetches):
+    calls, fail = fetches
+    url = fixture_server.add_hls("stream", fragments=10, fragment_size=FRAGMENT)
+    fail[f"{fixture_server.base_url}/stream/seg5.ts"] = 1
+    data = download(url, tmp_path)
+    assert data == b"".join(read(fixture_server, f"stream/seg{i}.ts") for i in range(10))
+    assert [call.rsplit("/", 1)[1] for call in calls].count("seg5.ts") == 2
+    assert len(calls) == 11  # Only the failed fragment was fetched again
+
+
+def test_missing_fragment_is_skipped_when_allowed(fixture_server, tmp_path, fetches):
+    url = fixture_server.add_hls("stream", fragments=6, fragment_size=FRAGMENT)
+    os.remove(os.path.join(fixture_server.root, "stream", "seg3.ts"))
+    data = download(url, tmp_path, skip_unavailable_fragments=True, fragment_retries=1)
+    assert data == b"".join(read(fixture_server, f"stream/seg{i}.ts") for i in range(6) if i != 3)
+
+
+def test_buffer_limit_holds_fragments_behind_a_slow_one(fixture_server, tmp_path, monkeypatch):
+    url = fixture_server.add_hls("stream", fragments=16, fragment_size=FRAGMENT)
+    first = f"{fixture_server.base_url}/stream/seg0.ts"
+    first_done = threading.Event()
+    fetched_early = []
+    get = FragmentPipelineMixin._get
+
+    def slow_first_get(self, fragment_url, headers):
+        if fragment_url == first:
+            time.sleep(1)
+            content = get(self, fragment_url, headers)
+            first_done.set()
+            return content
+        if not first_done.is_set():
+            fetched_early.append(fragment_url)
+        return get(self, fragment_url, headers)
+
+    monkeypatch.setattr(FragmentPipelineMixin, "_get", slow_first_get)
+    data = download(url, tmp_path / "limited", fragment_buffer_bytes=2 * FRAGMENT)
+    assert data == b"".join(read(fixture_server, f"stream/seg{i}.ts") for i in range(16))
+    # At most the two buffered fragments plus one per other worker run ahead of seg0
+    assert len(fetched_early) <= 2 + 3
+
+    first_done.clear()
+    fetched_early.clear()
+    download(url, tmp_path / "unlimited")
+    assert len(fetched_early) == 15  # The default 32 MiB buffer lets every other fragment through
@@ -0,0 +1,41 @@
+import os
+
+from downloader import YouTubeDownloader
+from jobstore import JobStore, DONE, PENDING, RUNNING
+from scheduler import PlaylistEntry
+
+
+def playlist(server, count, size=64 * 1024):
+    return [PlaylistEntry(i, server.add_file(f"video{i}.mp4", size), f"video{i}") for i in range(1, count + 1)]
+
+
+def test_job_store_resume_skips_finished_entries(fixture_server, tmp_path):
+    entries = playlist(fixture_server, 3)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.add_job("https://example.com/list", "best", str(tmp_path))
+    store.set_entries(job_id, entries)
+    downloader = YouTubeDownloader(str(tmp_path / "out"), job_store=store, noprogress=True)
+    assert downloader.download_entries(entries[:2], "best", job_id=job_id)[0]
+    store.set_job_state(job_id, RUNNING)
+    store.close()
+
+    # A restart: the running job is queued again and only the missing entry is fetched
+    store = JobStore(str(tmp_path / "jobs.db"))
+    assert store.get_job(job_id)["state"] == PENDING
+    assert [row["state"] for row in store.get_entries(job_id)] == [DONE, DONE, PENDING]
+    os.remove(os.path.join(fixture_server.root, "video1.mp4"))  # Would fail if fetched again
+    downloader = YouTubeDownloader(str(tmp_path / "out"), job_store=store, noprogress=True)
+    assert downloader.download_entries(entries, "best", job_id=job_id)[0]
+    assert [row["state"] for row in store.get_entries(job_id)] == [DONE, DONE, DONE]
+    store.close()
+
+
+def test_add_job_reuses_unfinished_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.add_job("https://example.com/list", "best", str(tmp_path))
+    assert store.add_job("https://example.com/list", "best", str(tmp_path)) == job_id
+    assert store.add_job("https://example.com/list", "bestaudio", str(tmp_path)) != job_id
+    store.set_job_state(job_id, DONE)
+    assert store.add_job("https://example.com/list", "best", str(tmp_path)) != job_id  # Done jobs are never reopened
+    assert job_id not in [job["id"] for job in store.unfinished_jobs()]
+    store.close()
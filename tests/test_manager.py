@@ -0,0 +1,98 @@
+import threading
+import time
+
+from formats import FormatTarget
+from jobstore import JobStore, DONE, PAUSED, PENDING, RUNNING
+from manager import JobManager
+
+
+def blocking_manager(tmp_path, **kwargs):
+    """JobManager whose jobs run until finish(job_id) instead of downloading."""
+    manager = JobManager(str(tmp_path), **kwargs)
+    release = {}
+
+    def run_job(job):
+        release.setdefault(job.id, threading.Event()).wait(10)
+        manager._set_state(job, DONE)
+        manager._dispatch()
+
+    def finish(job_id):
+        release.setdefault(job_id, threading.Event()).set()
+
+    manager._run_job = run_job
+    return manager, finish
+
+
+def test_resumed_job_waits_for_a_free_slot(tmp_path):
+    manager, finish = blocking_manager(tmp_path, max_jobs=1)
+    first = manager.submit("https://example.com/a", "best")
+    assert first.state == RUNNING
+
+    manager.pause(first.id)
+    second = manager.submit("https://example.com/b", "best")
+    assert second.state == RUNNING  # The paused job gave up its slot
+
+    manager.resume(first.id)
+    assert first.state == PENDING
+    assert first.control.paused  # Still held in the scheduler: max_jobs is 1
+
+    finish(second.id)
+    for _ in range(100):
+        if first.state == RUNNING:
+            break
+        time.sleep(0.05)
+    assert first.state == RUNNING
+    assert not first.control.paused
+    finish(first.id)
+    manager.pool.shutdown()
+
+
+def test_format_target_survives_a_restart(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    manager, _ = blocking_manager(tmp_path, job_store=store)
+    job = manager.submit("https://example.com/a", "best", format_target=FormatTarget(max_height=720), paused=True)
+    assert job.state == PAUSED
+    manager.pool.shutdown()
+    store.close()
+
+    store = JobStore(str(tmp_path / "jobs.db"))
+    [row] = store.unfinished_jobs()
+    assert row["format_target"] == FormatTarget(max_height=720).as_dict()
+    # Same URL and format with another target is a different job
+    assert store.add_job("https://example.com/a", "best", str(tmp_path), format_target={"max_height": 480}) != row["id"]
+    assert store.add_job("https://example.com/a", "best", str(tmp_path), format_target=row["format_target"]) == row["id"]
+    store.close()
+
+
+def wait_for_state(job, state, timeout=30):
+    deadline = time.monotonic() + timeout
+    while job.state != state and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return job.state
+
+
+def test_job_submitted_paused_runs_once_resumed(fixture_server, tmp_path):
+    url = fixture_server.add_file("clip.mp4", 64 * 1024)
+    manager = JobManager(str(tmp_path))
+    job = manager.submit(url, "best", paused=True)  # How main restores a paused row
+    time.sleep(0.2)
+    assert job.state == PAUSED and not job.started
+
+    manager.resume(job.id)
+    assert wait_for_state(job, DONE) == DONE
+    assert job.success and not job.control.paused
+    manager.pool.shutdown()
+
+
+def test_job_paused_while_queued_runs_once_resumed(throttled_server, tmp_path):
+    manager = JobManager(str(tmp_path), max_jobs=1)
+    first = manager.submit(throttled_server.add_file("first.mp4", 1024 * 1024), "best")
+    second = manager.submit(throttled_server.add_file("second.mp4", 64 * 1024), "best")
+    assert second.state == PENDING  # max_jobs is 1
+
+    manager.pause(second.id)
+    manager.resume(second.id)
+    assert wait_for_state(first, DONE) == DONE
+    assert wait_for_state(second, DONE) == DONE
+    assert second.success
+    manager.pool.shutdown()
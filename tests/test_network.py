@@ -0,0 +1,33 @@
+import network
+from network import NetworkSession, SessionRH, SessionYoutubeDL
+
+
+def session_handlers(ydl):
+    return [rh for rh in ydl._request_director.handlers.values() if isinstance(rh, SessionRH)]
+
+
+def test_requests_reuse_pooled_connections(fixture_server):
+    url = fixture_server.add_file("page.bin", 4096)
+    session = network.default_session
+    with SessionYoutubeDL({"quiet": True}) as ydl:
+        assert session_handlers(ydl)
+        created = session.pool.created
+        for _ in range(3):
+            assert len(ydl.urlopen(url).read()) == 4096
+    assert session.pool.created - created <= 1
+
+
+def test_falls_back_to_stock_handlers_without_private_helpers(monkeypatch):
+    monkeypatch.setattr(network, "DECODERS", None)
+    with SessionYoutubeDL({"quiet": True}) as ydl:
+        assert not session_handlers(ydl)
+
+
+def test_share_caches_skips_extractors_without_player_caches():
+    class Extractor:
+        _player_cache = {}  # No _code_cache: a yt-dlp that caches players differently
+
+    ie = Extractor()
+    session = NetworkSession()
+    session.share_caches(ie)
+    assert ie._player_cache is not session.player_cache
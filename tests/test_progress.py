@@ -0,0 +1,61 @@
+import time
+
+from progress import DOWNLOADING, ERROR, FINISHED, ProgressAggregator, ProgressEvent, ProgressPublisher
+
+
+def event(state, entry, filename="video.mp4", downloaded=0, total=None):
+    return ProgressEvent(state, entry, filename=filename, downloaded_bytes=downloaded, total_bytes=total)
+
+
+def test_publisher_coalesces_to_max_rate_and_keeps_the_newest_frame():
+    publisher = ProgressPublisher(max_rate=10)
+    delivered = []
+    publisher.subscribe(delivered.append)
+    for i in range(100):
+        publisher.publish(event(DOWNLOADING, 1, downloaded=i, total=100))
+    assert [e.downloaded_bytes for e in delivered] == [0]  # First frame, then throttled
+    publisher.flush()
+    assert delivered[-1].downloaded_bytes == 99  # Intermediate frames dropped, newest kept
+    assert (publisher.published, publisher.delivered) == (100, 2)
+
+    time.sleep(0.11)
+    publisher.publish(event(DOWNLOADING, 1, downloaded=100, total=100))
+    publisher.publish(event(FINISHED, 1, downloaded=100, total=100))
+    publisher.publish(event(ERROR, 2))
+    assert [e.state for e in delivered[-3:]] == [DOWNLOADING, FINISHED, ERROR]  # State changes never wait
+
+
+def test_publisher_survives_a_failing_subscriber():
+    publisher = ProgressPublisher(max_rate=0)
+    delivered = []
+    publisher.subscribe(lambda e: 1 / 0)
+    publisher.subscribe(delivered.append)
+    publisher.publish(event(DOWNLOADING, 1))
+    assert len(delivered) == 1
+
+
+def test_aggregator_percent_across_entries():
+    aggregator = ProgressAggregator(total_videos=4)
+    aggregator.update(event(DOWNLOADING, 1, downloaded=50, total=100))
+    aggregator.update(event(DOWNLOADING, 2, downloaded=0))  # Size not known yet
+    assert aggregator.percent() == 12
+    aggregator.finish_entry(1)
+    aggregator.finish_entry(3)
+    assert aggregator.percent() == 50
+    aggregator.finish_entry(2)
+    aggregator.finish_entry(4)
+    assert aggregator.percent() == 100
+
+
+def test_aggregator_never_goes_backwards_on_merged_pairs():
+    aggregator = ProgressAggregator(total_videos=1)
+    seen = []
+    for downloaded in (0, 40, 80, 100):
+        aggregator.update(event(DOWNLOADING, 1, "video.f137.mp4", downloaded, 100))
+        seen.append(aggregator.percent())
+    # The audio file starts: the entry's total grows from 100 to 120 bytes
+    for downloaded in (0, 10, 20):
+        aggregator.update(event(DOWNLOADING, 1, "video.f140.m4a", downloaded, 20))
+        seen.append(aggregator.percent())
+    assert seen == sorted(seen)
+    assert seen[-1] == 100
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+
+from downloader import YouTubeDownloader
+from scheduler import BandwidthLimiter, ConnectionLimiter, JobCancelled, JobControl, PlaylistEntry, PriorityPool
+
+
+def playlist(server, count, size=64 * 1024):
+    return [PlaylistEntry(i, server.add_file(f"video{i}.mp4", size), f"video{i}") for i in range(1, count + 1)]
+
+
+def test_bandwidth_limiter_spreads_bytes_over_time():
+    limiter = BandwidthLimiter(1024 * 1024)
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.consume(128 * 1024)
+    assert 0.4 <= time.monotonic() - start < 1.5
+    limiter.rate = None  # Unlimited again, applied live
+    start = time.monotonic()
+    limiter.consume(100 * 1024 * 1024)
+    assert time.monotonic() - start < 0.1
+
+
+def test_entries_download_concurrently_and_results_keep_playlist_order(tmp_path):
+    from benchmark import FixtureServer
+
+    with FixtureServer(bytes_per_second=512 * 1024) as server:
+        entries = playlist(server, 4, size=512 * 1024)
+        downloader = YouTubeDownloader(str(tmp_path), max_workers=4, noprogress=True)
+        start = time.monotonic()
+        assert downloader.download_entries(entries, "best")[0]
+        elapsed = time.monotonic() - start
+    assert elapsed < 3  # One at a time would take about 4 s
+    assert [result.index for result in downloader.results] == [1, 2, 3, 4]
+    assert all(os.path.exists(result.filepath) for result in downloader.results)
+    assert downloader.download_count == 4
+
+
+def test_priority_pool_runs_higher_priority_first():
+    pool = PriorityPool(1)
+    gate = threading.Event()
+    order = []
+    blocker = pool.submit(gate.wait)  # Occupies the only worker while the rest queue up
+    futures = [pool.submit(order.append, name, priority=priority)
+               for name, priority in (("low", 0), ("high", 5), ("low2", 0), ("mid", 2))]
+    gate.set()
+    for future in [blocker, *futures]:
+        future.result(5)
+    pool.shutdown()
+    assert order == ["high", "mid", "low", "low2"]
+
+
+def test_connection_limiter_serves_higher_priority_waiters_first():
+    limiter = ConnectionLimiter(2)
+    assert limiter.acquire(2) == 2
+    order = []
+
+    def wait(name, priority):
+        limiter.acquire(1, priority=priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=wait, args=("low", 0)), threading.Thread(target=wait, args=("high", 3))]
+    threads[0].start()
+    time.sleep(0.1)
+    threads[1].start()
+    time.sleep(0.1)
+    assert order == []  # Both wait for a free connection
+    limiter.release(1)
+    time.sleep(0.1)
+    assert order == ["high"]
+    limiter.release(1)
+    for thread in threads:
+        thread.join(5)
+    assert order == ["high", "low"]
+    limiter.release(2)
+    assert limiter.acquire(10) == 2  # Never more than the cap
+
+
+def test_paused_playlist_holds_entries_until_resumed(tmp_path):
+    from benchmark import FixtureServer
+
+    with FixtureServer(bytes_per_second=512 * 1024) as server:
+        entries = playlist(server, 4, size=512 * 1024)
+        control = JobControl()
+        downloader = YouTubeDownloader(str(tmp_path), max_workers=2, noprogress=True, control=control)
+        outcome = {}
+        worker = threading.Thread(
+            target=lambda: outcome.update(success=downloader.download_entries(entries, "best")[0]), daemon=True
+        )
+        worker.start()
+        time.sleep(0.5)
+        control.pause()
+        time.sleep(1)
+        finished = len([name for name in os.listdir(tmp_path) if name.endswith(".mp4")])
+        time.sleep(1)
+        assert len([name for name in os.listdir(tmp_path) if name.endswith(".mp4")]) == finished  # Nothing new starts
+        assert worker.is_alive()
+        control.resume()
+        worker.join(60)
+    assert outcome["success"]
+    assert [result.success for result in downloader.results] == [True] * 4
+
+
+def test_cancel_marks_the_rest_of_the_playlist(tmp_path):
+    from benchmark import FixtureServer
+
+    with FixtureServer(bytes_per_second=256 * 1024) as server:
+        entries = playlist(server, 4, size=512 * 1024)
+        control = JobControl()
+        downloader = YouTubeDownloader(str(tmp_path), noprogress=True, control=control)
+        worker = threading.Thread(target=downloader.download_entries, args=(entries, "best"), daemon=True)
+        worker.start()
+        time.sleep(0.5)
+        control.cancel()
+        worker.join(10)
+    assert not worker.is_alive()
+    assert [result.error for result in downloader.results] == [JobCancelled.msg] * 4
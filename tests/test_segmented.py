@@ -0,0 +1,157 @@
+import json
+import glob
+import os
+import threading
+import time
+
+import pytest
+
+from downloader import YouTubeDownloader
+from scheduler import JobCancelled, JobControl, PlaylistEntry
+from segmented import ConnectionPool, Segment, SegmentedFD, SegmentedTransfer
+
+
+def wait_for(predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_pause_keeps_segment_map_and_resume_completes(throttled_server, tmp_path):
+    size = 4 * 1024 * 1024
+    url = throttled_server.add_file("progressive.mp4", size)
+    control = JobControl()
+    downloader = YouTubeDownloader(str(tmp_path), http_engine="segmented", connections=4, noprogress=True, control=control)
+    outcome = {}
+    worker = threading.Thread(
+        target=lambda: outcome.update(result=downloader.download_entries([PlaylistEntry(1, url, "progressive")], "best")),
+        daemon=True,
+    )
+    worker.start()
+
+    assert wait_for(lambda: glob.glob(str(tmp_path / "*.part")))
+    time.sleep(0.5)
+    control.pause()
+
+    # Paused, not failed: the transfer stops and leaves its resume point behind
+    maps = []
+    assert wait_for(lambda: maps.extend(glob.glob(str(tmp_path / "*.segments"))) or maps)
+    time.sleep(0.5)  # Let the workers wind down and write the final map
+    with open(maps[0]) as f:
+        state = json.load(f)
+    done = sum(position - start for start, position, _ in state["segments"])
+    assert state["total"] == size
+    assert 0 < done < size
+    assert worker.is_alive()
+    assert "result" not in outcome
+
+    control.resume()
+    worker.join(60)
+    assert outcome["result"][0]
+    [result] = downloader.results
+    assert not os.path.exists(maps[0])
+    with open(result.filepath, "rb") as downloaded, open(os.path.join(throttled_server.root, "progressive.mp4"), "rb") as source:
+        assert downloaded.read() == source.read()
+
+
+def test_cancel_stops_segmented_transfer(throttled_server, tmp_path):
+    url = throttled_server.add_file("progressive.mp4", 4 * 1024 * 1024)
+    control = JobControl()
+    downloader = YouTubeDownloader(str(tmp_path), http_engine="segmented", connections=4, noprogress=True, control=control)
+    worker = threading.Thread(
+        target=downloader.download_entries, args=([PlaylistEntry(1, url, "progressive")], "best"), daemon=True
+    )
+    worker.start()
+
+    assert wait_for(lambda: glob.glob(str(tmp_path / "*.part")))
+    time.sleep(0.3)
+    control.cancel()
+    worker.join(10)
+    assert not worker.is_alive()
+    [result] = downloader.results
+    assert not result.success
+    assert result.error == JobCancelled.msg
+
+
+@pytest.mark.parametrize("option, value", [
+    ("proxy", "http://127.0.0.1:3128"),
+    ("nocheckcertificate", True),
+    ("source_address", "0.0.0.0"),
+    ("http_chunk_size", 10 * 1024 * 1024),
+    ("ratelimit", 1024 * 1024),
+])
+def test_options_the_pool_ignores_use_the_stock_downloader(option, value):
+    info = {"url": "https://example.com/video.mp4", "protocol": "https"}
+    assert SegmentedFD.can_download(info, {})
+    assert not SegmentedFD.can_download(info, {option: value})
+
+
+class FakeFD:
+    """What SegmentedTransfer needs from its SegmentedFD."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.reported = 0
+
+    def report_bytes(self, nbytes):
+        self.reported += nbytes
+
+
+class FlakyPool(ConnectionPool):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def open(self, url, headers, max_redirects=5):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionResetError("connection reset by peer")
+        return super().open(url, headers, max_redirects)
+
+
+def run_transfer(server, tmp_path, segments, pool, retries=3, data=None):
+    size = 2 * 1024 * 1024
+    url = server.add_file("file.bin", size)
+    with open(os.path.join(server.root, "file.bin"), "rb") as f:
+        source = f.read()
+    part = tmp_path / "file.bin.part"
+    part.write_bytes(data(source) if data else bytes(size))
+    fd = FakeFD(pool)
+    fileno = os.open(part, os.O_RDWR)
+    try:
+        transfer = SegmentedTransfer(fd, url, {}, fileno, segments, size, 4, 256 * 1024, retries, str(part) + ".segments")
+        transfer.run()
+    finally:
+        os.close(fileno)
+    return source, part.read_bytes(), fd, transfer
+
+
+def test_transfer_retries_failed_segments(fixture_server, tmp_path):
+    segments = [Segment(start, start + 512 * 1024) for start in range(0, 2 * 1024 * 1024, 512 * 1024)]
+    source, written, fd, _ = run_transfer(fixture_server, tmp_path, segments, FlakyPool(failures=2))
+    assert written == source
+    assert fd.reported == len(source)
+    assert sum(segment.retries for segment in segments) == 2
+
+
+def test_transfer_gives_up_after_its_retries(fixture_server, tmp_path):
+    with pytest.raises(ConnectionResetError):
+        run_transfer(fixture_server, tmp_path, [Segment(0, 2 * 1024 * 1024)], FlakyPool(failures=10), retries=2)
+
+
+def test_transfer_resumes_from_the_segment_map(fixture_server, tmp_path):
+    half = 1024 * 1024
+    # First half done, second half a quarter done: only the missing bytes are fetched
+    segments = [Segment(0, half, position=half), Segment(half, 2 * half, position=half + half // 4)]
+    source, written, fd, transfer = run_transfer(
+        fixture_server, tmp_path, segments, ConnectionPool(),
+        data=lambda source: source[:half + half // 4] + bytes(len(source) - half - half // 4)
+    )
+    assert written == source
+    assert fd.reported == half - half // 4
+    transfer.save_map()
+    with open(transfer.map_path) as f:
+        assert all(position == end for _, position, end in json.load(f)["segments"])
@@ -0,0 +1,56 @@
+import logging
+import os
+
+import store
+from store import MediaStore, link_or_copy
+
+
+def write(path, data=b"media"):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_link_or_copy_prefers_hardlinks(tmp_path):
+    source = write(tmp_path / "a.mp4")
+    assert link_or_copy(source, str(tmp_path / "b.mp4")) == "hardlink"
+    assert os.path.samefile(source, tmp_path / "b.mp4")
+
+
+def test_link_or_copy_symlinks_across_filesystems(tmp_path, monkeypatch):
+    def cross_device(*args):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "link", cross_device)
+    monkeypatch.setattr(store, "reflink", cross_device)
+    source = write(tmp_path / "a.mp4")
+    assert link_or_copy(source, str(tmp_path / "b.mp4")) == "symlink"
+    assert os.path.islink(tmp_path / "b.mp4")
+
+    monkeypatch.setattr(os, "symlink", cross_device)
+    assert link_or_copy(source, str(tmp_path / "c.mp4")) == "copy"
+    assert (tmp_path / "c.mp4").read_bytes() == b"media"
+
+
+def test_store_warns_when_opened_on_another_device(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(store, "device_of", lambda path: 1 if path.startswith(str(tmp_path / "store")) else 2)
+    with caplog.at_level(logging.WARNING, logger="ytdl"):
+        media_store = MediaStore(str(tmp_path / "store"), link_dir=str(tmp_path / "downloads"))
+    assert media_store.cross_device
+    assert "another filesystem" in caplog.text
+    media_store.close()
+
+    media_store = MediaStore(str(tmp_path / "store"), link_dir=str(tmp_path / "store" / "downloads"))
+    assert not media_store.cross_device
+    media_store.close()
+
+
+def test_materialize_links_a_stored_file_into_another_playlist(tmp_path):
+    media_store = MediaStore(str(tmp_path / "store"), link_dir=str(tmp_path))
+    first = write(tmp_path / "first.mp4", os.urandom(1024))
+    record = media_store.add("https://www.youtube.com/watch?v=aaaaaaaaaaa", "best", first)
+    assert media_store.lookup("https://youtu.be/aaaaaaaaaaa", "best") is record
+    second = media_store.materialize(record, str(tmp_path / "other" / "first.mp4"))
+    assert os.path.samefile(first, second)
+    assert media_store.bytes_saved == 1024
+    media_store.close()
@@ -0,0 +1,75 @@
+import os
+
+from downloader import YouTubeDownloader
+from scheduler import PlaylistEntry
+from sync import SyncIndex
+
+
+def entry(index, video_id):
+    return PlaylistEntry(index, f"https://www.youtube.com/watch?v={video_id:0>11}", f"title {video_id}")
+
+
+def prefixed(index):
+    return f"{index:02d} - "
+
+
+def populate(folder, entries):
+    index = SyncIndex(str(folder))
+    for e in entries:
+        path = folder / (prefixed(e.index) + f"{e.title}.mp4")
+        path.write_text(e.title)
+        index.record(e, str(path), "best", prefixed(e.index))
+    index.save()
+    return SyncIndex(str(folder))  # Reloaded from .sync.json
+
+
+def test_diff_finds_new_moved_and_removed_entries(tmp_path):
+    index = populate(tmp_path, [entry(1, "a"), entry(2, "b"), entry(3, "c")])
+    os.remove(tmp_path / "03 - title c.mp4")  # Deleted by hand: downloaded again
+
+    plan = index.diff([entry(1, "new"), entry(2, "a"), entry(3, "c")], "best")
+    assert [e.title for e in plan.new] == ["title new", "title c"]
+    assert [(e.title, old) for e, old in plan.moved] == [("title a", 1)]
+    assert len(plan.removed) == 1  # b
+    assert not plan.unchanged
+    assert [e.title for e in index.diff([entry(1, "a")], "bestaudio").new] == ["title a"]  # Other format
+
+
+def test_renumber_swaps_files_in_place(tmp_path):
+    index = populate(tmp_path, [entry(1, "a"), entry(2, "b")])
+    assert index.renumber([entry(1, "b"), entry(2, "a")], prefixed) == 2
+    assert (tmp_path / "01 - title b.mp4").read_text() == "title b"
+    assert (tmp_path / "02 - title a.mp4").read_text() == "title a"
+    assert index.diff([entry(1, "b"), entry(2, "a")], "best").unchanged
+
+
+def write_feed(server, name, videos):
+    items = "".join(
+        f'<item><title>{video}</title><link>{server.base_url}/{name}/{video}.mp4</link>'
+        f'<enclosure url="{server.base_url}/{name}/{video}.mp4" type="video/mp4" length="1"/></item>'
+        for video in videos
+    )
+    return server.add_text(f"{name}/feed.xml", f'<?xml version="1.0"?><rss version="2.0"><channel><title>{name}</title>'
+                                               f'{items}</channel></rss>')
+
+
+def test_sync_downloads_only_new_entries_and_renumbers(fixture_server, tmp_path):
+    url = fixture_server.add_playlist("channel", entries=2, size=1024)
+    downloader = YouTubeDownloader(str(tmp_path), prefix_index=True, noprogress=True)
+    assert downloader.sync_playlist(url, "best")[0]
+    assert len(downloader.sync_plan.new) == 2
+
+    # A video is added at the top of the playlist: one download, two renames
+    fixture_server.add_file("channel/video0.mp4", 1024)
+    write_feed(fixture_server, "channel", ["video0", "video1", "video2"])
+    downloader = YouTubeDownloader(str(tmp_path), prefix_index=True, noprogress=True)
+    assert downloader.sync_playlist(url, "best")[0]
+    plan = downloader.sync_plan
+    assert (len(plan.new), len(plan.moved), plan.renamed) == (1, 2, 2)
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".mp4")) == [
+        downloader.index_prefix(position) + f"video{position - 1}.mp4" for position in (1, 2, 3)
+    ]
+
+    downloader = YouTubeDownloader(str(tmp_path), prefix_index=True, noprogress=True)
+    assert downloader.sync_playlist(url, "best")[0]
+    assert downloader.sync_plan.unchanged